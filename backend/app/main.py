@@ -3,13 +3,16 @@ Backend Principal - Análisis Predictivo de Tendencias con IA
 AsgardStore
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import uvicorn
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
+import asyncio
+import hmac
 import logging
+import os
 
 # Importar modelos y servicios
 from models.trend_models import (
@@ -17,13 +20,46 @@ from models.trend_models import (
     TrendAnalysisResponse,
     ProductRecommendation,
     PromotionStrategy,
+    SimilarProduct,
+    UserRecommendation,
+    BundleRule,
+    StockUpdateRequest,
+    StockLevel,
     SalesMetrics,
-    SentimentAnalysis
+    SentimentAnalysis,
+    TextSentimentRequest,
+    BatchSentimentRequest,
+    JobRequest,
+    JobInfo,
+    ProfileRequest,
+    ProfileCallRequest
 )
 from services.trend_analyzer import TrendAnalyzer
 from services.sentiment_analyzer import SentimentAnalyzer
-from services.prediction_engine import PredictionEngine
-from services.recommendation_system import RecommendationSystem
+from services.prediction_engine import (
+    FEATURE_HORIZON_DAYS,
+    PredictionEngine,
+    predict_demand_task,
+    predict_product_task,
+    predict_trends_task
+)
+from services.recommendation_system import STORE_FEATURES, RecommendationSystem
+from services.collaborative_filtering import train_collaborative_task
+from services.feature_store import ProductFeatureStore
+from utils.cache import TTLCache
+from utils.columnar import ColumnarFormatUnavailableError, check_format, columnar_response
+from utils.response_cache import ResponseCache, ResponseCacheMiddleware
+from utils.responses import FastJSONResponse, dumps
+from utils.singleflight import SingleFlight
+from utils.jobs import FINISHED_STATES, QUEUED, RUNNING, JobKind, JobManager, JobStore
+from utils.metrics import REGISTRY, MetricsMiddleware
+from utils.profiling import Profiler, ProfilingMiddleware
+from utils.executor import (
+    BoundedExecutor,
+    ExecutionLayer,
+    ExecutionTimeoutError,
+    ExecutorOverloadedError
+)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -47,11 +83,279 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inicializar servicios
-trend_analyzer = TrendAnalyzer()
+# Inicializar servicios: tendencias y predicciones publican features que leen las recomendaciones
+feature_store = ProductFeatureStore()
+trend_analyzer = TrendAnalyzer(feature_store=feature_store)
 sentiment_analyzer = SentimentAnalyzer()
-prediction_engine = PredictionEngine()
-recommendation_system = RecommendationSystem()
+prediction_engine = PredictionEngine(feature_store=feature_store)
+recommendation_system = RecommendationSystem(
+    ann_probes=int(os.getenv("ASGARD_ANN_PROBES", "8")),
+    interactions_path=os.getenv("ASGARD_INTERACTIONS_LOG"),
+    orders_path=os.getenv("ASGARD_ORDERS_LOG"),
+    feature_store=feature_store
+)
+
+# Pools acotados para trabajo CPU-bound: el scoring de textos no compite con la analítica,
+# y el entrenamiento de modelos corre en procesos para no retener el GIL del servidor
+execution = ExecutionLayer(
+    {
+        "nlp": BoundedExecutor(
+            "nlp",
+            max_workers=int(os.getenv("ASGARD_NLP_WORKERS", "2")),
+            max_queue=int(os.getenv("ASGARD_NLP_QUEUE", "32"))
+        ),
+        "analytics": BoundedExecutor(
+            "analytics",
+            max_workers=int(os.getenv("ASGARD_ANALYTICS_WORKERS", "4")),
+            max_queue=int(os.getenv("ASGARD_ANALYTICS_QUEUE", "64"))
+        ),
+        "modeling": BoundedExecutor(
+            "modeling",
+            max_workers=int(os.getenv("ASGARD_MODEL_WORKERS", "2")),
+            max_queue=int(os.getenv("ASGARD_MODEL_QUEUE", "8")),
+            kind="process"
+        ),
+    },
+    default_timeout=float(os.getenv("ASGARD_REQUEST_TIMEOUT", "30"))
+)
+
+# Rutas costosas: concurrencia máxima y timeout propios (el resto usa el timeout por defecto)
+MODEL_TIMEOUT = float(os.getenv("ASGARD_MODEL_TIMEOUT", "120"))
+execution.configure_route("/api/trends/prediction", max_concurrency=2, timeout=MODEL_TIMEOUT)
+# Un trabajo por producto: como mucho uno por proceso, el resto espera su turno en la ruta
+execution.configure_route(
+    "/api/trends/prediction/stream",
+    max_concurrency=int(os.getenv("ASGARD_MODEL_WORKERS", "2")),
+    timeout=MODEL_TIMEOUT
+)
+execution.configure_route("/api/recommendations/collaborative/train", max_concurrency=1, timeout=MODEL_TIMEOUT)
+execution.configure_route("features:predicted_growth", max_concurrency=1, timeout=MODEL_TIMEOUT)
+execution.configure_route("/api/reports/trends", max_concurrency=4)
+execution.configure_route("/api/reports/competition", max_concurrency=4)
+execution.configure_route("/api/sentiment/analyze/batch", max_concurrency=4)
+
+# Las peticiones idénticas simultáneas a las rutas más costosas comparten un solo cálculo
+report_flights = SingleFlight("/api/reports/trends")
+prediction_flights = SingleFlight("/api/trends/prediction")
+
+# Recomendaciones personalizadas memoizadas por petición canónica y versión del catálogo
+custom_recommendations_cache = TTLCache(
+    "custom_recommendations",
+    ttl_seconds=float(os.getenv("ASGARD_CUSTOM_CACHE_TTL", "300")),
+    max_entries=int(os.getenv("ASGARD_CUSTOM_CACHE_SIZE", "1024"))
+)
+# Ancho de los tramos de presupuesto: 5000 y 5040 comparten entrada. La recomendación se
+# calcula con el presupuesto redondeado al tramo, no con el que envió el cliente
+CUSTOM_BUDGET_BUCKET = float(os.getenv("ASGARD_CUSTOM_BUDGET_BUCKET", "100"))
+
+def collaborative_model_version() -> int:
+    model = recommendation_system.collaborative.model
+    return model.version if model is not None else 0
+
+def route_data_version(route: str):
+    """Versión de los datos que lee cada ruta cacheada
+
+    Cada ruta solo depende de lo que lee: la actualización periódica de predicted_growth
+    invalida las recomendaciones pero no las demás rutas.
+    Tendencias, predicciones y métricas de ventas se calculan sobre el histórico, que no cambia
+    en caliente, y solo caducan por TTL.
+    """
+    if route == "/api/recommendations/":
+        return (
+            feature_store.version_of(STORE_FEATURES),
+            recommendation_system.data_version,
+            recommendation_system.basket_miner.version,
+            collaborative_model_version()
+        )
+    if route == "/api/metrics/sentiment":
+        return sentiment_analyzer.data_version
+    return 0
+
+# Perfilado bajo demanda, solo para administradores. Sin ASGARD_ADMIN_TOKEN no se instala el
+# middleware; va por dentro de la caché, así que los aciertos no consumen peticiones de la sesión
+ADMIN_TOKEN = os.getenv("ASGARD_ADMIN_TOKEN")
+profiler = Profiler(
+    os.getenv("ASGARD_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles"))
+)
+if ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler, routes_app=app)
+
+# Respuestas GET deterministas cacheadas por ruta, query canónica y versión de los datos
+response_cache = ResponseCache(
+    route_ttls={
+        "/api/trends/current": float(os.getenv("ASGARD_CACHE_TTL_TRENDS", "60")),
+        "/api/trends/prediction": float(os.getenv("ASGARD_CACHE_TTL_PREDICTION", "600")),
+        "/api/metrics/sales": float(os.getenv("ASGARD_CACHE_TTL_METRICS", "300")),
+        "/api/metrics/sentiment": float(os.getenv("ASGARD_CACHE_TTL_METRICS", "300")),
+        "/api/recommendations/": float(os.getenv("ASGARD_CACHE_TTL_RECOMMENDATIONS", "60")),
+    },
+    version_provider=route_data_version,
+    exclude=["/api/recommendations/custom/cache", "/api/trends/prediction/stream"],
+    max_bytes=int(os.getenv("ASGARD_RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024))),
+    disk_dir=os.getenv("ASGARD_RESPONSE_CACHE_DIR")
+)
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
+# Análisis pesados como trabajos asíncronos: estado y resultados persistidos en SQLite
+jobs = JobManager(
+    JobStore(os.getenv("ASGARD_JOBS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.sqlite3"))),
+    execution,
+    max_concurrent=int(os.getenv("ASGARD_JOB_CONCURRENCY", "2")),
+    max_pending=int(os.getenv("ASGARD_JOB_MAX_PENDING", "100")),
+    ttl_seconds=float(os.getenv("ASGARD_JOB_TTL", "3600")),
+    timeout=float(os.getenv("ASGARD_JOB_TIMEOUT", "600"))
+)
+
+def _required(params: Dict[str, Any], name: str) -> Any:
+    if params.get(name) in (None, "", []):
+        raise ValueError(f"Falta el parámetro {name}")
+    return params[name]
+
+jobs.register("trend_analysis", JobKind(
+    "analytics", trend_analyzer.analyze_custom_trends,
+    lambda params: (TrendAnalysisRequest(**params),),
+    "Análisis de tendencias personalizado (parámetros de TrendAnalysisRequest)"
+))
+jobs.register("trends_report", JobKind(
+    "analytics", trend_analyzer.generate_trends_report,
+    lambda params: (str(params.get("format", "json")), bool(params.get("include_predictions", True))),
+    "Reporte completo de tendencias (format, include_predictions)"
+))
+jobs.register("demand_prediction", JobKind(
+    "modeling", predict_demand_task,
+    lambda params: (str(_required(params, "product_id")), int(params.get("days_ahead", 30))),
+    "Predicción de demanda con intervalos de confianza (product_id, days_ahead)",
+    reports_progress=True
+))
+jobs.register("competition_report", JobKind(
+    "analytics", trend_analyzer.generate_competition_report,
+    lambda params: (list(_required(params, "competitors")),
+                    list(params.get("metrics", ["price", "trends", "sentiment"]))),
+    "Reporte de análisis competitivo (competitors, metrics)"
+))
+
+# Métricas para Prometheus: los histogramas se alimentan solos; estos valores se leen en cada scrape
+def _pool_metric(field: str):
+    return lambda: [((name,), stats[field]) for name, stats in execution.stats()['pools'].items()]
+
+def _pool_latency_metric(field: str):
+    return lambda: [((name,), pool.latency.summary()[field]) for name, pool in execution.pools.items()]
+
+def _cache_stats() -> Dict[str, Dict[str, float]]:
+    """Aciertos y fallos de las cachés de resultados, con el mismo criterio que su hit_rate"""
+    responses_stats = response_cache.stats()
+    custom_stats = custom_recommendations_cache.stats()
+    return {
+        "responses": {
+            "hits": responses_stats['hits'] + responses_stats['disk_hits'],
+            "misses": responses_stats['misses'],
+            "hit_rate": responses_stats['hit_rate'],
+            "entries": responses_stats['entries'],
+        },
+        custom_stats['name']: {
+            "hits": custom_stats['hits'] + custom_stats['coalesced'],
+            "misses": custom_stats['misses'],
+            "hit_rate": custom_stats['hit_rate'],
+            "entries": custom_stats['entries'],
+        },
+    }
+
+def _cache_metric(field: str):
+    return lambda: [((name,), stats[field]) for name, stats in _cache_stats().items()]
+
+def _flight_metric(field: str):
+    return lambda: [((flights.name,), flights.stats()[field]) for flights in (report_flights, prediction_flights)]
+
+def dataset_rows() -> Dict[str, int]:
+    """Filas de cada conjunto de datos en memoria"""
+    return {
+        "sales": len(trend_analyzer.sample_data),
+        "prediction_history": len(prediction_engine.sample_data),
+        "reviews": len(sentiment_analyzer.sample_reviews),
+        "catalog": len(recommendation_system.sample_data),
+        "interactions": len(recommendation_system.interactions),
+        "product_features": len(feature_store),
+    }
+
+REGISTRY.gauge("asgard_executor_in_flight", "Trabajos en ejecución o en cola por pool", ("pool",),
+               _pool_metric('in_flight'))
+REGISTRY.gauge("asgard_executor_queue_depth", "Trabajos esperando un worker libre por pool", ("pool",),
+               _pool_metric('queued'))
+REGISTRY.gauge("asgard_executor_workers", "Workers configurados por pool", ("pool",),
+               _pool_metric('max_workers'))
+REGISTRY.counter("asgard_executor_completed_total", "Trabajos terminados por pool", ("pool",),
+                 _pool_metric('completed'))
+REGISTRY.counter("asgard_executor_failed_total", "Trabajos terminados con error por pool", ("pool",),
+                 _pool_metric('failed'))
+REGISTRY.counter("asgard_executor_rejected_total", "Trabajos rechazados por pool saturado", ("pool",),
+                 _pool_metric('rejected'))
+REGISTRY.counter("asgard_executor_restarts_total", "Pools de procesos recreados tras morir un worker", ("pool",),
+                 _pool_metric('restarts'))
+REGISTRY.counter("asgard_executor_timeouts_total", "Trabajos que excedieron el timeout de su ruta", ("pool",),
+                 _pool_latency_metric('timeouts'))
+REGISTRY.gauge("asgard_route_waiting", "Peticiones esperando el límite de concurrencia de su ruta", ("route",),
+               lambda: [((route,), stats['waiting']) for route, stats in execution.stats()['routes'].items()])
+REGISTRY.counter("asgard_cache_hits_total", "Aciertos de las cachés de resultados", ("cache",),
+                 _cache_metric('hits'))
+REGISTRY.counter("asgard_cache_misses_total", "Fallos de las cachés de resultados", ("cache",),
+                 _cache_metric('misses'))
+REGISTRY.gauge("asgard_cache_hit_ratio", "Proporción de aciertos de las cachés de resultados", ("cache",),
+               _cache_metric('hit_rate'))
+REGISTRY.gauge("asgard_cache_entries", "Entradas en memoria de las cachés de resultados", ("cache",),
+               _cache_metric('entries'))
+REGISTRY.counter("asgard_coalesced_requests_total", "Peticiones que compartieron un cálculo en curso", ("route",),
+                 _flight_metric('coalesced'))
+REGISTRY.counter("asgard_coalescing_executions_total", "Cálculos ejecutados en las rutas con single-flight",
+                 ("route",), _flight_metric('executions'))
+REGISTRY.gauge("asgard_collaborative_model_version", "Versión del modelo de filtrado colaborativo publicado (0 = ninguno)",
+               (), lambda: [((), collaborative_model_version())])
+REGISTRY.gauge("asgard_jobs", "Trabajos asíncronos pendientes por estado", ("status",),
+               lambda: [((status,), jobs.store.count((status,))) for status in (QUEUED, RUNNING)])
+REGISTRY.gauge("asgard_dataset_rows", "Filas de los conjuntos de datos en memoria", ("dataset",),
+               lambda: [((name,), rows) for name, rows in dataset_rows().items()])
+
+# Último middleware añadido = el más externo: la latencia incluye los aciertos de la caché de respuestas
+app.add_middleware(MetricsMiddleware, routes_app=app)
+
+# predicted_growth se publica a un horizonte fijo al arrancar y cada cierto tiempo (0 = solo al
+# arrancar); los GET de predicciones son de solo lectura y no cambian lo que ven las recomendaciones
+PREDICTION_REFRESH_SECONDS = float(os.getenv("ASGARD_PREDICTION_REFRESH_SECONDS", "3600"))
+prediction_refresh_task: Optional[asyncio.Task] = None
+
+async def refresh_prediction_features():
+    """Predecir todos los productos a FEATURE_HORIZON_DAYS en un proceso y publicar el crecimiento"""
+    predictions = await execution.run(
+        "modeling", predict_trends_task, FEATURE_HORIZON_DAYS, None, route="features:predicted_growth"
+    )
+    prediction_engine.publish_predictions(predictions)
+
+async def prediction_refresh_loop():
+    while True:
+        try:
+            await refresh_prediction_features()
+        except Exception as e:
+            logger.error(f"Error actualizando el crecimiento previsto: {e}")
+        if PREDICTION_REFRESH_SECONDS <= 0:
+            return
+        await asyncio.sleep(PREDICTION_REFRESH_SECONDS)
+
+@app.on_event("startup")
+async def warm_up_services():
+    """Precargar recursos pesados antes de atender tráfico"""
+    global prediction_refresh_task
+    await jobs.start()
+    if os.getenv("ASGARD_WARM_UP", "1") == "1":
+        sentiment_analyzer.warm_up()
+        await trend_analyzer.refresh_features()
+        prediction_refresh_task = asyncio.create_task(prediction_refresh_loop())
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """Liberar los pools de trabajo"""
+    if prediction_refresh_task is not None:
+        prediction_refresh_task.cancel()
+    await jobs.stop()
+    execution.shutdown(wait=False)
 
 @app.get("/")
 async def root():
@@ -70,21 +374,73 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Verificación de salud del sistema"""
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "services": {
-            "trend_analyzer": "active",
-            "sentiment_analyzer": "active", 
-            "prediction_engine": "active",
-            "recommendation_system": "active"
-        }
+    """Verificación de salud del sistema
+
+    unhealthy (503) si faltan datos o la base de trabajos no responde; degraded si algún pool
+    está saturado o el feature store aún no se ha poblado.
+    """
+    checks: Dict[str, Dict[str, Any]] = {}
+
+    rows = dataset_rows()
+    services_data = {
+        "trend_analyzer": rows["sales"],
+        "sentiment_analyzer": rows["reviews"],
+        "prediction_engine": rows["prediction_history"],
+        "recommendation_system": rows["catalog"],
+    }
+    for name, count in services_data.items():
+        checks[name] = {"status": "healthy" if count > 0 else "unhealthy", "rows": count}
+
+    checks["feature_store"] = {
+        "status": "healthy" if rows["product_features"] > 0 else "degraded",
+        "products": rows["product_features"],
+        "version": feature_store.version,
     }
 
+    for name, pool in execution.pools.items():
+        stats = pool.stats()
+        checks[f"executor:{name}"] = {
+            "status": "degraded" if stats['in_flight'] >= pool.capacity else "healthy",
+            "in_flight": stats['in_flight'],
+            "capacity": pool.capacity,
+        }
+
+    try:
+        checks["jobs_store"] = {"status": "healthy", "pending": jobs.store.count((QUEUED, RUNNING))}
+    except Exception as e:
+        logger.error(f"Base de trabajos no disponible: {e}")
+        checks["jobs_store"] = {"status": "unhealthy", "error": str(e)}
+
+    statuses = {check["status"] for check in checks.values()}
+    status = "unhealthy" if "unhealthy" in statuses else "degraded" if "degraded" in statuses else "healthy"
+    return JSONResponse(
+        status_code=503 if status == "unhealthy" else 200,
+        content={"status": status, "timestamp": datetime.now().isoformat(), "checks": checks}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/system/execution", response_model=Dict[str, Any])
+async def get_execution_stats():
+    """Estado de los pools de trabajo y latencias (cola y ejecución) por ruta"""
+    return execution.stats()
+
+@app.get("/api/system/response-cache", response_model=Dict[str, Any])
+async def get_response_cache_stats():
+    """Aciertos, tamaño y versión de datos por ruta de la caché de respuestas GET"""
+    return response_cache.stats()
+
+@app.get("/api/system/coalescing", response_model=List[Dict[str, Any]])
+async def get_coalescing_stats():
+    """Peticiones que compartieron un cálculo en curso en las rutas con single-flight"""
+    return [report_flights.stats(), prediction_flights.stats()]
+
 # ==================== ENDPOINTS DE TENDENCIAS ====================
 
-@app.get("/api/trends/current", response_model=List[Dict[str, Any]])
+@app.get("/api/trends/current", response_model=List[Dict[str, Any]], response_class=FastJSONResponse)
 async def get_current_trends(
     category: Optional[str] = None,
     limit: int = 10
@@ -93,13 +449,30 @@ async def get_current_trends(
     Obtener tendencias actuales del mercado
     """
     try:
-        trends = await trend_analyzer.get_current_trends(category, limit)
-        return trends
+        trends = await execution.run(
+            "analytics", trend_analyzer.get_current_trends, category, limit,
+            route="/api/trends/current"
+        )
+        return FastJSONResponse(trends)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo tendencias actuales: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/trends/prediction", response_model=List[Dict[str, Any]])
+async def predict_trends(days_ahead: int, category: Optional[str]) -> List[Dict[str, Any]]:
+    """Predicciones compartidas entre peticiones idénticas simultáneas (no se publican en el almacén)"""
+    async def compute():
+        # El entrenamiento corre en un proceso aparte
+        return await execution.run(
+            "modeling", predict_trends_task, days_ahead, category, route="/api/trends/prediction"
+        )
+
+    return await prediction_flights.do((days_ahead, category), compute)
+
+@app.get("/api/trends/prediction", response_model=List[Dict[str, Any]], response_class=FastJSONResponse)
 async def get_trend_predictions(
     days_ahead: int = 30,
     category: Optional[str] = None
@@ -108,20 +481,82 @@ async def get_trend_predictions(
     Obtener predicciones de tendencias futuras
     """
     try:
-        predictions = await prediction_engine.predict_trends(days_ahead, category)
-        return predictions
+        return FastJSONResponse(await predict_trends(days_ahead, category))
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo predicciones: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/trends/prediction/stream")
+async def stream_trend_predictions(
+    days_ahead: int = 30,
+    category: Optional[str] = None,
+    format: str = "ndjson"
+):
+    """
+    Predicciones por producto enviadas a medida que terminan (format: ndjson o sse)
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format}. Use ndjson o sse")
+
+    product_ids = prediction_engine.product_ids(category)
+
+    async def predict(product_id: str):
+        try:
+            prediction = await execution.run(
+                "modeling", predict_product_task, product_id, days_ahead,
+                route="/api/trends/prediction/stream"
+            )
+            return product_id, prediction, None
+        except Exception as e:
+            logger.error(f"Error prediciendo producto {product_id}: {e}")
+            return product_id, None, str(e)
+
+    def encode(payload: Dict[str, Any], event: str) -> bytes:
+        if format == "sse":
+            return b"event: " + event.encode() + b"\ndata: " + dumps(payload) + b"\n\n"
+        return dumps(payload) + b"\n"
+
+    async def events():
+        # Todos los productos se encolan a la vez; cada uno se envía en cuanto termina
+        tasks = [asyncio.ensure_future(predict(product_id)) for product_id in product_ids]
+        sent = failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                product_id, prediction, error = await next_done
+                if error is not None:
+                    failed += 1
+                    yield encode({"product_id": product_id, "error": error}, "error")
+                elif prediction is not None:
+                    sent += 1
+                    yield encode(prediction, "prediction")
+            if format == "sse":
+                yield encode({"products": sent, "failed": failed}, "end")
+        finally:
+            # El cliente se desconectó: no seguir esperando a los productos pendientes
+            for task in tasks:
+                task.cancel()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
 @app.post("/api/trends/analyze", response_model=TrendAnalysisResponse)
 async def analyze_trends(request: TrendAnalysisRequest):
     """
     Análisis personalizado de tendencias
     """
     try:
-        analysis = await trend_analyzer.analyze_custom_trends(request)
+        analysis = await execution.run(
+            "analytics", trend_analyzer.analyze_custom_trends, request, route="/api/trends/analyze"
+        )
         return analysis
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error en análisis de tendencias: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -131,16 +566,25 @@ async def analyze_trends(request: TrendAnalysisRequest):
 @app.get("/api/recommendations/products", response_model=List[ProductRecommendation])
 async def get_product_recommendations(
     category: Optional[str] = None,
-    limit: int = 10
+    limit: int = 10,
+    similar_to: Optional[str] = None,
+    profile: Optional[str] = None
 ):
     """
     Obtener recomendaciones de productos basadas en tendencias
     """
     try:
-        recommendations = await recommendation_system.get_product_recommendations(
-            category, limit
+        recommendations = await execution.run(
+            "analytics", recommendation_system.get_product_recommendations,
+            category, limit, similar_to, profile, route="/api/recommendations/products"
         )
         return recommendations
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo recomendaciones de productos: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -154,14 +598,107 @@ async def get_promotion_strategies(
     Obtener estrategias de promoción recomendadas
     """
     try:
-        strategies = await recommendation_system.get_promotion_strategies(
-            budget, target_category
+        strategies = await execution.run(
+            "analytics", recommendation_system.get_promotion_strategies,
+            budget, target_category, route="/api/recommendations/promotions"
         )
         return strategies
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo estrategias de promoción: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/recommendations/similar/{product_id}", response_model=List[SimilarProduct])
+async def get_similar_products(product_id: str, limit: int = 5):
+    """
+    Obtener productos similares por contenido
+    """
+    try:
+        similar = await execution.run(
+            "analytics", recommendation_system.get_similar_products, product_id, limit,
+            route="/api/recommendations/similar"
+        )
+        return similar
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error obteniendo productos similares: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/recommendations/users/{user_id}", response_model=List[UserRecommendation])
+async def get_user_recommendations(user_id: str, limit: int = 10):
+    """
+    Obtener recomendaciones por filtrado colaborativo para un usuario
+    """
+    try:
+        recommendations = await execution.run(
+            "analytics", recommendation_system.get_user_recommendations, user_id, limit,
+            route="/api/recommendations/users"
+        )
+        return recommendations
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error obteniendo recomendaciones de usuario: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/recommendations/collaborative/train", response_model=Dict[str, Any])
+async def train_collaborative_model():
+    """
+    Reentrenar y publicar una nueva versión de los factores de filtrado colaborativo
+    """
+    try:
+        # La factorización corre en un proceso aparte; aquí solo se publica la versión nueva
+        factors = await execution.run(
+            "modeling", train_collaborative_task, *recommendation_system.collaborative_training_inputs(),
+            route="/api/recommendations/collaborative/train"
+        )
+        return recommendation_system.publish_collaborative_model(*factors)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error entrenando el filtrado colaborativo: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/recommendations/bundles", response_model=List[BundleRule])
+async def get_bundle_rules(
+    window_days: int = 30,
+    size: int = 2,
+    limit: int = 20,
+    min_support: float = 0.005,
+    min_confidence: float = 0.05
+):
+    """
+    Obtener productos que se compran juntos (pares o tríos) con soporte, confianza y lift
+    """
+    try:
+        rules = await execution.run(
+            "analytics", recommendation_system.get_bundle_rules,
+            window_days, size, limit, min_support, min_confidence,
+            route="/api/recommendations/bundles"
+        )
+        return rules
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error obteniendo reglas de bundles: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/recommendations/custom", response_model=Dict[str, Any])
 async def get_custom_recommendations(
     categories: List[str],
@@ -172,17 +709,55 @@ async def get_custom_recommendations(
     Obtener recomendaciones personalizadas
     """
     try:
-        recommendations = await recommendation_system.get_custom_recommendations(
-            categories, budget, timeframe
+        key = RecommendationSystem.normalize_custom_request(
+            categories, budget, timeframe, CUSTOM_BUDGET_BUCKET
+        )
+        canonical_categories, bucketed_budget, timeframe = key
+        recommendations = await custom_recommendations_cache.get_or_compute(
+            key,
+            lambda: execution.run(
+                "analytics", recommendation_system.get_custom_recommendations,
+                list(canonical_categories), bucketed_budget, timeframe,
+                route="/api/recommendations/custom"
+            ),
+            version=recommendation_system.catalog_version
         )
         return recommendations
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo recomendaciones personalizadas: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/recommendations/custom/cache", response_model=Dict[str, Any])
+async def get_custom_recommendations_cache_stats():
+    """
+    Estadísticas de la caché de recomendaciones personalizadas
+    """
+    return custom_recommendations_cache.stats()
+
+# ==================== ENDPOINTS DE INVENTARIO ====================
+
+@app.post("/api/inventory/stock", response_model=List[StockLevel])
+async def update_stock(request: StockUpdateRequest):
+    """
+    Actualizar el stock de uno o varios productos (nivel absoluto o variación)
+    """
+    try:
+        return recommendation_system.update_stock(
+            [update.model_dump() for update in request.updates]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error actualizando stock: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== ENDPOINTS DE MÉTRICAS ====================
 
-@app.get("/api/metrics/sales", response_model=SalesMetrics)
+@app.get("/api/metrics/sales", response_model=SalesMetrics, response_class=FastJSONResponse)
 async def get_sales_metrics(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -192,13 +767,20 @@ async def get_sales_metrics(
     Obtener métricas de ventas
     """
     try:
-        metrics = await trend_analyzer.get_sales_metrics(start_date, end_date, category)
-        return metrics
+        metrics = await execution.run(
+            "analytics", trend_analyzer.get_sales_metrics, start_date, end_date, category,
+            route="/api/metrics/sales"
+        )
+        return FastJSONResponse(metrics)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo métricas de ventas: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/metrics/sentiment", response_model=List[SentimentAnalysis])
+@app.get("/api/metrics/sentiment", response_model=List[SentimentAnalysis], response_class=FastJSONResponse)
 async def get_sentiment_metrics(
     product_id: Optional[str] = None,
     category: Optional[str] = None,
@@ -208,31 +790,181 @@ async def get_sentiment_metrics(
     Obtener análisis de sentimientos
     """
     try:
-        sentiment_data = await sentiment_analyzer.get_sentiment_metrics(
-            product_id, category, limit
+        sentiment_data = await execution.run(
+            "analytics", sentiment_analyzer.get_sentiment_metrics,
+            product_id, category, limit, route="/api/metrics/sentiment"
         )
-        return sentiment_data
+        return FastJSONResponse(sentiment_data)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo métricas de sentimiento: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== ENDPOINTS DE SENTIMIENTO ====================
+
+@app.post("/api/sentiment/analyze", response_model=Dict[str, Any])
+async def analyze_text_sentiment(request: TextSentimentRequest):
+    """
+    Analizar el sentimiento de un texto
+    """
+    try:
+        analysis = await execution.run(
+            "nlp", sentiment_analyzer.analyze_text_sentiment, request.text,
+            route="/api/sentiment/analyze"
+        )
+        return analysis
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error analizando sentimiento de texto: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/sentiment/analyze/batch", response_model=List[Dict[str, Any]])
+async def analyze_texts_sentiment(request: BatchSentimentRequest):
+    """
+    Analizar el sentimiento de un lote de textos
+    """
+    try:
+        analyses = await execution.run(
+            "nlp", sentiment_analyzer.analyze_texts_sentiment, request.texts,
+            route="/api/sentiment/analyze/batch"
+        )
+        return analyses
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error analizando lote de textos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/sentiment/trends", response_model=Dict[str, Any], response_class=FastJSONResponse)
+async def get_sentiment_trends(
+    days: int = 30,
+    category: Optional[str] = None,
+    deduplicate: bool = False
+):
+    """
+    Obtener tendencias de sentimiento en el tiempo
+    """
+    try:
+        trends = await execution.run(
+            "analytics", sentiment_analyzer.get_sentiment_trends, days, category, deduplicate,
+            route="/api/sentiment/trends"
+        )
+        return FastJSONResponse(trends)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error obteniendo tendencias de sentimiento: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== ENDPOINTS DE REPORTES ====================
 
-@app.get("/api/reports/trends")
+@app.get("/api/reports/trends", response_class=FastJSONResponse)
 async def generate_trends_report(
     format: str = "json",
     include_predictions: bool = True
 ):
     """
-    Generar reporte completo de tendencias
+    Generar reporte completo de tendencias (format: json, arrow o parquet)
     """
     try:
-        report = await trend_analyzer.generate_trends_report(format, include_predictions)
-        return report
+        if check_format(format) != "json":
+            frame = await report_flights.do(
+                (format, include_predictions),
+                lambda: execution.run(
+                    "analytics", trend_analyzer.get_trends_report_frame, include_predictions,
+                    route="/api/reports/trends"
+                )
+            )
+            return columnar_response(frame, format, "trends_report")
+
+        report = await report_flights.do(
+            (format, include_predictions),
+            lambda: execution.run(
+                "analytics", trend_analyzer.generate_trends_report, format, include_predictions,
+                route="/api/reports/trends"
+            )
+        )
+        return FastJSONResponse(report)
+    except ColumnarFormatUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error generando reporte de tendencias: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/reports/sales")
+async def export_sales_series(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    format: str = "arrow"
+):
+    """
+    Exportar la serie diaria de ventas por producto (format: arrow, parquet o json)
+    """
+    try:
+        check_format(format)
+        series = await execution.run(
+            "analytics", trend_analyzer.get_sales_series, start_date, end_date, category,
+            route="/api/reports/sales"
+        )
+        if format == "json":
+            return FastJSONResponse(series.to_dict(orient="records"))
+        return columnar_response(series, format, "sales_series")
+    except ColumnarFormatUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error exportando serie de ventas: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/reports/predictions")
+async def export_predictions(
+    days_ahead: int = 30,
+    category: Optional[str] = None,
+    format: str = "arrow"
+):
+    """
+    Exportar las predicciones por producto y día (format: arrow, parquet o json)
+    """
+    try:
+        check_format(format)
+        frame = prediction_engine.predictions_frame(await predict_trends(days_ahead, category))
+        if format == "json":
+            return FastJSONResponse(frame.to_dict(orient="records"))
+        return columnar_response(frame, format, "predictions")
+    except ColumnarFormatUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error exportando predicciones: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/reports/competition")
 async def generate_competition_report(
     competitors: List[str],
@@ -242,12 +974,187 @@ async def generate_competition_report(
     Generar reporte de análisis competitivo
     """
     try:
-        report = await trend_analyzer.generate_competition_report(competitors, metrics)
+        report = await execution.run(
+            "analytics", trend_analyzer.generate_competition_report, competitors, metrics,
+            route="/api/reports/competition"
+        )
         return report
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error generando reporte de competencia: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== ENDPOINTS DE TRABAJOS ====================
+
+@app.post("/api/jobs", response_model=JobInfo, status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Crear un trabajo asíncrono; la respuesta llega antes de que empiece el cálculo
+    """
+    try:
+        return jobs.submit(request.kind, request.params)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/jobs", response_model=List[JobInfo])
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """
+    Listar los trabajos más recientes, opcionalmente por estado
+    """
+    return jobs.store.list(status, limit)
+
+@app.get("/api/jobs/stats", response_model=Dict[str, Any])
+async def get_jobs_stats():
+    """Tipos de trabajo disponibles, límites y trabajos por estado"""
+    return jobs.stats()
+
+@app.get("/api/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str, wait: float = 0):
+    """
+    Estado de un trabajo; con wait > 0 espera hasta ese número de segundos a que termine
+    """
+    job = await jobs.wait(job_id, min(wait, 60)) if wait > 0 else jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado o expirado: {job_id}")
+    return job
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Resultado de un trabajo terminado, tal como se guardó
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado o expirado: {job_id}")
+    if job["status"] != "succeeded":
+        detail = job["error"] or f"El trabajo está en estado {job['status']}"
+        raise HTTPException(status_code=409, detail=detail)
+    return Response(content=jobs.result(job_id), media_type="application/json")
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Cambios de estado del trabajo como Server-Sent Events hasta que termina
+    """
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado o expirado: {job_id}")
+
+    async def events():
+        last = None
+        while True:
+            job = await jobs.wait(job_id, 1.0)
+            if job is None:
+                yield b"event: error\ndata: " + dumps({"detail": "Trabajo eliminado o expirado"}) + b"\n\n"
+                return
+            state = (job["status"], job["progress"])
+            if state != last:
+                last = state
+                yield b"event: status\ndata: " + dumps(job) + b"\n\n"
+            if job["status"] in FINISHED_STATES:
+                return
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancelar un trabajo pendiente o borrar uno terminado junto con su resultado
+    """
+    if not jobs.cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado: {job_id}")
+    return {"id": job_id, "deleted": True}
+
+# ==================== ENDPOINTS DE PERFILADO ====================
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Acceso con X-Admin-Token igual a ASGARD_ADMIN_TOKEN; sin token configurado las rutas no existen"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+def _profile_session(session_id: str):
+    session = profiler.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Sesión de perfilado no encontrada: {session_id}")
+    return session
+
+@app.post("/api/system/profiles", response_model=Dict[str, Any], status_code=201,
+          dependencies=[Depends(require_admin)])
+async def start_profile(request: ProfileRequest):
+    """
+    Perfilar las próximas peticiones a una ruta; las pilas se guardan al completar la última
+    """
+    if request.route not in {getattr(route, "path", None) for route in app.routes}:
+        raise HTTPException(status_code=400, detail=f"Ruta desconocida: {request.route}")
+    try:
+        return profiler.create(request.route, request.requests, request.mode, request.interval).to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/system/profiles/calls", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def profile_service_call(request: ProfileCallRequest):
+    """
+    Ejecutar y perfilar una llamada a un servicio (los mismos tipos que los trabajos asíncronos)
+    """
+    job_kind = jobs.kinds.get(request.kind)
+    if job_kind is None:
+        raise HTTPException(status_code=400, detail=f"Tipo desconocido: {request.kind}. Disponibles: {', '.join(jobs.kinds)}")
+    try:
+        args = job_kind.build_args(request.params)
+        session = profiler.create(f"call:{request.kind}", 1, request.mode, request.interval, arm=False)
+        await profiler.run(session, lambda: execution.run(
+            job_kind.pool, job_kind.func, *args, route=f"/api/jobs/{request.kind}"
+        ))
+        return session.to_dict()
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error perfilando {request.kind}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/system/profiles", response_model=List[Dict[str, Any]], dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Sesiones de perfilado recientes"""
+    return profiler.list()
+
+@app.get("/api/system/profiles/{session_id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def get_profile(session_id: str):
+    """Estado de una sesión de perfilado"""
+    return _profile_session(session_id).to_dict()
+
+@app.get("/api/system/profiles/{session_id}/collapsed", dependencies=[Depends(require_admin)])
+async def get_profile_collapsed(session_id: str):
+    """
+    Pilas en formato colapsado (flamegraph.pl, speedscope, inferno) de una sesión terminada
+    """
+    session = _profile_session(session_id)
+    if session.status == "active":
+        raise HTTPException(
+            status_code=409,
+            detail=f"La sesión sigue activa ({len(session.log)}/{session.requests} peticiones)"
+        )
+    return Response(
+        content=session.collapsed(),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{session.id}.folded"'}
+    )
+
+@app.delete("/api/system/profiles/{session_id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def stop_profile(session_id: str):
+    """Terminar una sesión antes de tiempo guardando lo recogido"""
+    _profile_session(session_id)
+    return profiler.stop(session_id).to_dict()
+
 # ==================== MANEJO DE ERRORES ====================
 
 @app.exception_handler(Exception)
@@ -2,7 +2,7 @@
 Modelos de datos para el análisis de tendencias
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -143,6 +143,34 @@ class ProductRecommendation(BaseModel):
             }
         }
 
+class SimilarProduct(BaseModel):
+    """Producto similar por contenido"""
+    product_id: str = Field(..., description="ID del producto")
+    product_name: str = Field(..., description="Nombre del producto")
+    category: str = Field(..., description="Categoría del producto")
+    price: float = Field(..., description="Precio del producto")
+    similarity_score: float = Field(..., description="Similitud de coseno TF-IDF (0-1)")
+
+class UserRecommendation(BaseModel):
+    """Recomendación de producto para un usuario por filtrado colaborativo"""
+    product_id: str = Field(..., description="ID del producto")
+    product_name: str = Field(..., description="Nombre del producto")
+    category: str = Field(..., description="Categoría del producto")
+    score: float = Field(..., description="Puntuación del modelo")
+    source: str = Field(..., description="collaborative o popular (usuario sin historial)")
+    model_version: int = Field(..., description="Versión de los factores usados")
+
+class BundleRule(BaseModel):
+    """Regla de asociación entre productos comprados juntos"""
+    antecedent: List[str] = Field(..., description="Productos del lado izquierdo de la regla")
+    consequent: str = Field(..., description="Producto que se compra junto con el antecedente")
+    product_names: List[str] = Field(..., description="Nombres de todos los productos de la regla")
+    support: float = Field(..., description="Fracción de pedidos con todos los productos")
+    confidence: float = Field(..., description="P(consecuente | antecedente)")
+    lift: float = Field(..., description="Confianza dividida por la frecuencia del consecuente")
+    orders: int = Field(..., description="Pedidos que contienen todos los productos")
+    window_days: int = Field(..., description="Ventana temporal analizada (días)")
+
 class PromotionStrategy(BaseModel):
     """Estrategia de promoción"""
     strategy_id: str = Field(..., description="ID de la estrategia")
@@ -155,6 +183,7 @@ class PromotionStrategy(BaseModel):
     implementation_steps: List[str] = Field(..., description="Pasos de implementación")
     risk_level: str = Field(..., description="Nivel de riesgo")
     success_metrics: List[str] = Field(..., description="Métricas de éxito")
+    target_products: List[Dict[str, Any]] = Field(default_factory=list, description="Productos, descuento y coste asignados")
     
     class Config:
         schema_extra = {
@@ -247,4 +276,106 @@ class SentimentAnalysis(BaseModel):
                 "sentiment_trend": "rising",
                 "last_updated": "2024-01-15T10:30:00Z"
             }
-        } 
\ No newline at end of file
+        }
+
+class TextSentimentRequest(BaseModel):
+    """Solicitud de análisis de sentimiento de un texto"""
+    text: str = Field(..., min_length=1, description="Texto a analizar")
+
+class BatchSentimentRequest(BaseModel):
+    """Solicitud de análisis de sentimiento por lotes"""
+    texts: List[str] = Field(..., min_length=1, max_length=500, description="Textos a analizar")
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "texts": [
+                    "Excelente producto, muy buena calidad",
+                    "Envío tardío y producto defectuoso"
+                ]
+            }
+        }
+
+
+class StockUpdate(BaseModel):
+    """Cambio de inventario de un producto: nivel absoluto o variación"""
+    product_id: str = Field(..., description="ID del producto")
+    stock_level: Optional[int] = Field(None, ge=0, description="Nuevo nivel de stock")
+    delta: Optional[int] = Field(None, description="Unidades a sumar (positivo) o restar (negativo)")
+    
+    @model_validator(mode='after')
+    def check_single_change(self):
+        if (self.stock_level is None) == (self.delta is None):
+            raise ValueError("Indicar stock_level o delta, pero no ambos")
+        return self
+
+class StockUpdateRequest(BaseModel):
+    """Lote de cambios de inventario aplicados de forma atómica"""
+    updates: List[StockUpdate] = Field(..., min_length=1, max_length=10000, description="Cambios de stock")
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "updates": [
+                    {"product_id": "prod_001", "delta": -3},
+                    {"product_id": "prod_007", "stock_level": 120}
+                ]
+            }
+        }
+
+class StockLevel(BaseModel):
+    """Nivel de inventario resultante de un producto"""
+    product_id: str = Field(..., description="ID del producto")
+    stock_level: int = Field(..., description="Unidades en inventario")
+    stock_status: str = Field(..., description="low, medium o high")
+
+class JobRequest(BaseModel):
+    """Solicitud de un trabajo asíncrono"""
+    kind: str = Field(..., description="trend_analysis, trends_report, demand_prediction o competition_report")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parámetros del análisis")
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "kind": "demand_prediction",
+                "params": {"product_id": "prod_001", "days_ahead": 30}
+            }
+        }
+
+class ProfileRequest(BaseModel):
+    """Sesión de perfilado para las próximas peticiones a una ruta"""
+    route: str = Field(..., description="Plantilla de la ruta, p. ej. /api/trends/prediction")
+    requests: int = Field(10, ge=1, le=1000, description="Número de peticiones a perfilar")
+    mode: str = Field("sampling", description="sampling (muestreo de pila) o cprofile")
+    interval: float = Field(0.005, ge=0.001, le=1.0, description="Segundos entre muestras (modo sampling)")
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "route": "/api/trends/prediction",
+                "requests": 5,
+                "mode": "sampling",
+                "interval": 0.005
+            }
+        }
+
+class ProfileCallRequest(BaseModel):
+    """Perfilado de una llamada a un servicio, con los mismos tipos y parámetros que los trabajos"""
+    kind: str = Field(..., description="trend_analysis, trends_report, demand_prediction o competition_report")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parámetros del análisis")
+    mode: str = Field("sampling", description="sampling (muestreo de pila) o cprofile")
+    interval: float = Field(0.005, ge=0.001, le=1.0, description="Segundos entre muestras (modo sampling)")
+
+class JobInfo(BaseModel):
+    """Estado de un trabajo asíncrono"""
+    id: str = Field(..., description="ID del trabajo")
+    kind: str = Field(..., description="Tipo de trabajo")
+    params: Dict[str, Any] = Field(..., description="Parámetros recibidos")
+    status: str = Field(..., description="queued, running, succeeded, failed o cancelled")
+    progress: float = Field(..., ge=0, le=1, description="Progreso (0-1)")
+    message: Optional[str] = Field(None, description="Descripción del estado")
+    error: Optional[str] = Field(None, description="Error si el trabajo falló")
+    created_at: float = Field(..., description="Creación (epoch)")
+    started_at: Optional[float] = Field(None, description="Inicio de la ejecución (epoch)")
+    finished_at: Optional[float] = Field(None, description="Fin de la ejecución (epoch)")
+    expires_at: Optional[float] = Field(None, description="Momento en que se borra el resultado (epoch)")
\ No newline at end of file
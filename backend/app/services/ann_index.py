@@ -0,0 +1,110 @@
+"""
+Índice de Vecinos Aproximados (IVF)
+Particiona los vectores con KMeans y en cada consulta solo explora las listas más cercanas
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.cluster import KMeans
+
+
+class IVFIndex:
+    """Índice de listas invertidas sobre vectores normalizados (similitud de coseno)"""
+
+    def __init__(self, clustering_model: KMeans, n_lists: Optional[int] = None,
+                 n_probe: int = 8, train_size: int = 20000, seed: int = 42):
+        self.clustering_model = clustering_model
+        # Número de particiones; por defecto ~sqrt(n)
+        self.n_lists = n_lists
+        # Listas exploradas por consulta: más listas = más recall y más latencia
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.seed = seed
+
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int64)
+        self.lists: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def build(self, vectors: np.ndarray):
+        """Entrenar las particiones sobre una muestra y asignar todos los vectores"""
+        self.vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+        n = len(self.vectors)
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(n))), n)
+
+        rng = np.random.RandomState(self.seed)
+        sample = self.vectors
+        if n > self.train_size:
+            sample = self.vectors[rng.choice(n, self.train_size, replace=False)]
+
+        # Copia propia: el modelo recibido puede ser el que el servicio usa para segmentar
+        model = clone(self.clustering_model).set_params(n_clusters=n_lists, n_init=1)
+        model.fit(sample)
+        self.centroids = self._normalize(model.cluster_centers_.astype(np.float32))
+
+        self.assignments = self._assign(self.vectors)
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+
+    def update(self, rows: np.ndarray, vectors: np.ndarray):
+        """Reemplazar o añadir vectores (filas nuevas = posiciones consecutivas al final)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+
+        n_new = int(rows.max()) + 1 - len(self.vectors) if len(rows) else 0
+        if n_new > 0:
+            self.vectors = np.vstack([self.vectors, np.zeros((n_new, self.vectors.shape[1]), dtype=np.float32)])
+            self.assignments = np.concatenate([self.assignments, np.full(n_new, -1, dtype=np.int64)])
+
+        new_assignments = self._assign(vectors)
+        for row, vector, assignment in zip(rows, vectors, new_assignments):
+            old = self.assignments[row]
+            if old != assignment:
+                if old >= 0:
+                    self.lists[old] = self.lists[old][self.lists[old] != row]
+                self.lists[assignment] = np.append(self.lists[assignment], row)
+                self.assignments[row] = assignment
+            self.vectors[row] = vector
+
+    def probe(self, query: np.ndarray, n_probe: Optional[int] = None,
+              exclude: Optional[int] = None) -> np.ndarray:
+        """Posiciones de los vectores en las n_probe listas más cercanas a la consulta"""
+        query = self._normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        n_probe = min(n_probe or self.n_probe, len(self.lists))
+
+        centroid_scores = self.centroids @ query
+        nearest = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        candidates = np.concatenate([self.lists[i] for i in nearest])
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        return candidates
+
+    def search(self, query: np.ndarray, k: int, n_probe: Optional[int] = None,
+               exclude: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Posiciones y similitudes aproximadas de los k vectores más cercanos a la consulta"""
+        query = self._normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        candidates = self.probe(query, n_probe, exclude)
+
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self.vectors[candidates] @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return candidates[top], scores[top]
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Lista más cercana (mayor coseno con el centroide) de cada vector"""
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int64)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
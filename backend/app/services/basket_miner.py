@@ -0,0 +1,281 @@
+"""
+Minería de Cestas de Compra
+Co-ocurrencias de productos por día en matrices dispersas, con totales por ventana
+temporal que se actualizan de forma incremental, y reglas de asociación para pares y tríos
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class _DayBucket:
+    """Pedidos de un día: matriz pedidos x productos y conteos agregados"""
+
+    def __init__(self, n_items: int):
+        self.baskets: List[np.ndarray] = []
+        self.item_counts = np.zeros(n_items)
+        self.pair_counts = sparse.csr_matrix((n_items, n_items))
+
+    def add(self, baskets: List[np.ndarray], n_items: int):
+        orders = _basket_matrix(baskets, n_items)
+        self.resize(n_items)
+        self.baskets.extend(baskets)
+        self.item_counts += np.asarray(orders.sum(axis=0)).ravel()
+        self.pair_counts = self.pair_counts + _pair_counts(orders)
+        return orders
+
+    def resize(self, n_items: int):
+        if len(self.item_counts) < n_items:
+            self.item_counts = np.concatenate([self.item_counts, np.zeros(n_items - len(self.item_counts))])
+            self.pair_counts = _resized(self.pair_counts, n_items)
+
+
+class _WindowTotals:
+    """Totales acumulados de una ventana [start, end] de días (ordinales)"""
+
+    def __init__(self, start: int, end: int, n_items: int):
+        self.start = start
+        self.end = end
+        self.n_orders = 0
+        self.item_counts = np.zeros(n_items)
+        self.pair_counts = sparse.csr_matrix((n_items, n_items))
+        self.rules: Dict[Tuple[int, float, float], List[Dict[str, Any]]] = {}
+
+    def apply(self, n_orders: int, item_counts: np.ndarray, pair_counts: sparse.csr_matrix, sign: int = 1):
+        n_items = max(len(item_counts), len(self.item_counts))
+        if len(self.item_counts) < n_items:
+            self.item_counts = np.concatenate([self.item_counts, np.zeros(n_items - len(self.item_counts))])
+            self.pair_counts = _resized(self.pair_counts, n_items)
+        self.n_orders += sign * n_orders
+        self.item_counts[:len(item_counts)] += sign * item_counts
+        self.pair_counts = self.pair_counts + sign * _resized(pair_counts, n_items)
+        self.pair_counts.eliminate_zeros()
+        self.rules = {}
+
+
+def _resized(matrix: sparse.csr_matrix, n_items: int) -> sparse.csr_matrix:
+    """Copia de una matriz cuadrada ampliada a n_items x n_items"""
+    if matrix.shape == (n_items, n_items):
+        return matrix
+    resized = matrix.tocsr(copy=True)
+    resized.resize((n_items, n_items))
+    return resized
+
+
+def _basket_matrix(baskets: Sequence[np.ndarray], n_items: int) -> sparse.csr_matrix:
+    """Matriz binaria pedidos x productos"""
+    lengths = np.fromiter((len(basket) for basket in baskets), dtype=np.int64, count=len(baskets))
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    indices = np.concatenate(baskets) if len(baskets) else np.empty(0, dtype=np.int64)
+    return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(baskets), n_items))
+
+
+def _pair_counts(orders: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Pedidos que contienen cada par (i, j), i < j, en una sola multiplicación dispersa"""
+    return sparse.triu(orders.T @ orders, k=1).tocsr()
+
+
+class BasketMiner:
+    """Reglas de asociación de productos comprados juntos, cacheadas por ventana temporal"""
+
+    def __init__(self, item_ids: Sequence[str], max_triple_pairs: int = 200, max_windows: int = 8):
+        self.item_ids: List[str] = list(item_ids)
+        self.item_index: Dict[str, int] = {item_id: i for i, item_id in enumerate(self.item_ids)}
+        # Pares frecuentes a partir de los que se cuentan tríos (poda tipo apriori)
+        self.max_triple_pairs = max_triple_pairs
+        # El tamaño de ventana llega de la petición: solo se conservan las usadas más recientemente
+        self.max_windows = max_windows
+
+        self.days: Dict[int, _DayBucket] = {}
+        self.windows: "OrderedDict[Tuple[int, int], _WindowTotals]" = OrderedDict()
+        self._triples: Dict[Tuple[int, int, float], List[Dict[str, Any]]] = {}
+        self.version = 0
+        # Las consultas también modifican las cachés (LRU de ventanas, reglas): todo bajo un lock
+        self._lock = threading.Lock()
+
+    @property
+    def last_day(self) -> Optional[date]:
+        return date.fromordinal(max(self.days)) if self.days else None
+
+    def add_order_lines(self, lines: pd.DataFrame):
+        """Ingerir líneas de pedido (order_id, product_id, timestamp) y actualizar ventanas afectadas"""
+        with self._lock:
+            for product_id in pd.unique(lines['product_id']):
+                if product_id not in self.item_index:
+                    self.item_index[product_id] = len(self.item_ids)
+                    self.item_ids.append(product_id)
+            n_items = len(self.item_ids)
+
+            frame = pd.DataFrame({
+                'order_id': lines['order_id'].to_numpy(),
+                'item': lines['product_id'].map(self.item_index).to_numpy(dtype=np.int64),
+                'day': pd.to_datetime(lines['timestamp']).dt.normalize().map(pd.Timestamp.toordinal).to_numpy(),
+            }).drop_duplicates(['order_id', 'item'])
+
+            # Un pedido pertenece al día de su primera línea
+            frame['day'] = frame.groupby('order_id')['day'].transform('min')
+            for day, day_lines in frame.groupby('day', sort=True):
+                baskets = [np.sort(group.to_numpy()) for _, group in day_lines.groupby('order_id')['item']]
+                bucket = self.days.setdefault(int(day), _DayBucket(n_items))
+                orders = bucket.add(baskets, n_items)
+
+                delta_items = np.asarray(orders.sum(axis=0)).ravel()
+                delta_pairs = _pair_counts(orders)
+                for (start, end), totals in self.windows.items():
+                    if start <= day <= end:
+                        totals.apply(len(baskets), delta_items, delta_pairs)
+
+            self._triples = {}
+            self.version += 1
+
+    def pair_rules(self, window_days: int = 30, end: Optional[date] = None, min_support: float = 0.005,
+                   min_confidence: float = 0.05, limit: Optional[int] = 50) -> List[Dict[str, Any]]:
+        """Reglas A -> B de la ventana ordenadas por lift"""
+        with self._lock:
+            totals = self._window(window_days, end)
+            key = (window_days, min_support, min_confidence)
+            if key not in totals.rules:
+                totals.rules[key] = self._pair_rules(totals, min_support, min_confidence)
+            rules = totals.rules[key]
+            return rules[:limit] if limit else rules
+
+    def triple_rules(self, window_days: int = 30, end: Optional[date] = None, min_support: float = 0.005,
+                     min_confidence: float = 0.05, limit: Optional[int] = 50) -> List[Dict[str, Any]]:
+        """Reglas {A, B} -> C a partir de los pares frecuentes de la ventana"""
+        with self._lock:
+            totals = self._window(window_days, end)
+            key = (totals.start, totals.end, min_support)
+            if key not in self._triples:
+                self._triples[key] = self._triple_rules(totals, min_support)
+            rules = [rule for rule in self._triples[key] if rule['confidence'] >= min_confidence]
+            return rules[:limit] if limit else rules
+
+    def best_partners(self, window_days: int = 30, min_support: float = 0.005,
+                      min_confidence: float = 0.05) -> Dict[str, Dict[str, Any]]:
+        """Mejor compañero de bundle (mayor lift) de cada producto"""
+        partners = {}
+        for rule in self.pair_rules(window_days, None, min_support, min_confidence, limit=None):
+            antecedent = rule['antecedent'][0]
+            if antecedent not in partners:
+                partners[antecedent] = rule
+        return partners
+
+    def _window(self, window_days: int, end: Optional[date]) -> _WindowTotals:
+        """Totales de la ventana, deslizando la última calculada si comparte tamaño"""
+        n_items = len(self.item_ids)
+        end_day = end.toordinal() if end else (max(self.days) if self.days else date.today().toordinal())
+        start_day = end_day - window_days + 1
+
+        totals = self.windows.get((start_day, end_day))
+        if totals is not None:
+            self.windows.move_to_end((start_day, end_day))
+            return totals
+
+        # Reutilizar una ventana del mismo tamaño: sumar días nuevos y restar los que salen
+        previous = next((key for key in self.windows if key[1] - key[0] == end_day - start_day), None)
+        if previous is not None:
+            totals = self.windows.pop(previous)
+            self._evict(*previous)
+            old_days = set(range(totals.start, totals.end + 1))
+        else:
+            totals = _WindowTotals(start_day, end_day, n_items)
+            old_days = set()
+        new_days = set(range(start_day, end_day + 1))
+
+        for day in old_days - new_days:
+            if day in self.days:
+                bucket = self.days[day]
+                totals.apply(len(bucket.baskets), bucket.item_counts, bucket.pair_counts, sign=-1)
+        for day in new_days - old_days:
+            if day in self.days:
+                bucket = self.days[day]
+                totals.apply(len(bucket.baskets), bucket.item_counts, bucket.pair_counts)
+
+        totals.start, totals.end = start_day, end_day
+        self.windows[(start_day, end_day)] = totals
+        while len(self.windows) > self.max_windows:
+            self._evict(*self.windows.popitem(last=False)[0])
+        return totals
+
+    def _evict(self, start: int, end: int):
+        """Olvidar los tríos cacheados de una ventana descartada"""
+        for key in [key for key in self._triples if key[:2] == (start, end)]:
+            del self._triples[key]
+
+    def _pair_rules(self, totals: _WindowTotals, min_support: float,
+                    min_confidence: float) -> List[Dict[str, Any]]:
+        if totals.n_orders == 0:
+            return []
+
+        pairs = totals.pair_counts.tocoo()
+        keep = pairs.data / totals.n_orders >= min_support
+        first, second, counts = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+
+        # Cada par genera las dos direcciones A -> B y B -> A
+        antecedents = np.concatenate([first, second])
+        consequents = np.concatenate([second, first])
+        counts = np.concatenate([counts, counts])
+
+        support = counts / totals.n_orders
+        confidence = counts / totals.item_counts[antecedents]
+        lift = confidence / (totals.item_counts[consequents] / totals.n_orders)
+
+        keep = confidence >= min_confidence
+        order = np.flatnonzero(keep)[np.argsort(-lift[keep], kind='stable')]
+        return [
+            {
+                'antecedent': [self.item_ids[antecedents[i]]],
+                'consequent': self.item_ids[consequents[i]],
+                'support': round(float(support[i]), 4),
+                'confidence': round(float(confidence[i]), 4),
+                'lift': round(float(lift[i]), 4),
+                'count': int(counts[i])
+            }
+            for i in order
+        ]
+
+    def _triple_rules(self, totals: _WindowTotals, min_support: float) -> List[Dict[str, Any]]:
+        if totals.n_orders == 0:
+            return []
+
+        pairs = totals.pair_counts.tocoo()
+        frequent = np.flatnonzero(pairs.data / totals.n_orders >= min_support)
+        frequent = frequent[np.argsort(-pairs.data[frequent], kind='stable')][:self.max_triple_pairs]
+        if len(frequent) == 0:
+            return []
+
+        baskets = [
+            basket
+            for day in range(totals.start, totals.end + 1) if day in self.days
+            for basket in self.days[day].baskets
+        ]
+        orders = _basket_matrix(baskets, len(self.item_ids)).tocsc()
+
+        rules = []
+        for index in frequent:
+            a, b, pair_count = pairs.row[index], pairs.col[index], pairs.data[index]
+            # Pedidos con A y B, y cuántos de ellos contienen cada C
+            both = orders[:, a].multiply(orders[:, b])
+            triple_counts = np.asarray((orders.T @ both).todense()).ravel()
+            triple_counts[[a, b]] = 0
+
+            for c in np.flatnonzero(triple_counts / totals.n_orders >= min_support):
+                count = triple_counts[c]
+                confidence = count / pair_count
+                rules.append({
+                    'antecedent': [self.item_ids[a], self.item_ids[b]],
+                    'consequent': self.item_ids[c],
+                    'support': round(float(count / totals.n_orders), 4),
+                    'confidence': round(float(confidence), 4),
+                    'lift': round(float(confidence / (totals.item_counts[c] / totals.n_orders)), 4),
+                    'count': int(count)
+                })
+
+        rules.sort(key=lambda rule: rule['lift'], reverse=True)
+        return rules
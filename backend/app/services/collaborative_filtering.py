@@ -0,0 +1,276 @@
+"""
+Filtrado Colaborativo
+Matriz dispersa usuario-producto a partir del log de interacciones, factorización ALS
+implícita y publicación de factores versionados para servir recomendaciones
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Directorio donde se publican las versiones de factores (v1, v2, ...)
+FACTORS_DIR = os.getenv(
+    "ASGARD_CF_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cf")
+)
+
+# Peso de cada tipo de interacción en la matriz de preferencias
+EVENT_WEIGHTS = {
+    'view': 1.0,
+    'cart': 3.0,
+    'purchase': 5.0
+}
+
+
+class InteractionMatrix:
+    """Matriz CSR usuarios x productos con la suma de pesos de sus interacciones"""
+
+    def __init__(self, user_ids: List[str], item_ids: List[str], matrix: sparse.csr_matrix):
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.item_index = {item_id: i for i, item_id in enumerate(item_ids)}
+        self.matrix = matrix
+
+    @classmethod
+    def from_log(cls, log: pd.DataFrame, item_ids: Sequence[str]) -> 'InteractionMatrix':
+        """Agregar un log (user_id, product_id, event) sobre el catálogo indicado"""
+        item_ids = list(item_ids)
+        log = log[log['product_id'].isin(item_ids) & log['event'].isin(EVENT_WEIGHTS.keys())]
+
+        users = pd.Categorical(log['user_id'])
+        items = pd.Categorical(log['product_id'], categories=item_ids)
+        weights = log['event'].map(EVENT_WEIGHTS).to_numpy(dtype=np.float32)
+
+        matrix = sparse.csr_matrix(
+            (weights, (users.codes, items.codes)),
+            shape=(len(users.categories), len(item_ids)), dtype=np.float32
+        )
+        matrix.sum_duplicates()
+        return cls(list(users.categories), item_ids, matrix)
+
+
+class ImplicitALS:
+    """ALS para feedback implícito: preferencia binaria con confianza 1 + alpha * peso"""
+
+    def __init__(self, factors: int = 32, regularization: float = 0.1,
+                 alpha: float = 10.0, iterations: int = 10, seed: int = 42):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.seed = seed
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            'factors': self.factors,
+            'regularization': self.regularization,
+            'alpha': self.alpha,
+            'iterations': self.iterations
+        }
+
+    def fit(self, matrix: sparse.csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """Devolver los factores de usuarios y de productos"""
+        rng = np.random.RandomState(self.seed)
+        n_users, n_items = matrix.shape
+        user_factors = rng.normal(0, 0.01, (n_users, self.factors))
+        item_factors = rng.normal(0, 0.01, (n_items, self.factors))
+
+        by_user = matrix.tocsr()
+        by_item = matrix.T.tocsr()
+        for _ in range(self.iterations):
+            self._solve(by_user, item_factors, user_factors)
+            self._solve(by_item, user_factors, item_factors)
+
+        return user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+    def _solve(self, interactions: sparse.csr_matrix, fixed: np.ndarray, target: np.ndarray):
+        """Resolver cada fila de target por mínimos cuadrados ponderados con fixed constante"""
+        gram = fixed.T @ fixed + self.regularization * np.eye(self.factors)
+
+        for row in range(interactions.shape[0]):
+            start, end = interactions.indptr[row], interactions.indptr[row + 1]
+            if start == end:
+                target[row] = 0.0
+                continue
+
+            columns = interactions.indices[start:end]
+            confidence = 1.0 + self.alpha * interactions.data[start:end]
+            factors = fixed[columns]
+
+            # (YtY + Yu^T (Cu - I) Yu + λI) x = Yu^T Cu p(u), con p(u) = 1 en los observados
+            a = gram + (factors.T * (confidence - 1.0)) @ factors
+            b = factors.T @ confidence
+            target[row] = np.linalg.solve(a, b)
+
+
+class FactorModel:
+    """Versión publicada de factores: inmutable una vez creada"""
+
+    def __init__(self, version: int, user_ids: List[str], item_ids: List[str],
+                 user_factors: np.ndarray, item_factors: np.ndarray,
+                 seen: sparse.csr_matrix, trained_at: str, params: Dict[str, Any]):
+        self.version = version
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.seen = seen
+        self.trained_at = trained_at
+        self.params = params
+
+        # Popularidad para usuarios sin historial (cold start)
+        popularity = np.asarray(seen.sum(axis=0)).ravel()
+        self.popular_items = np.argsort(-popularity, kind='stable')
+        self.popularity = popularity / max(popularity.max(), 1.0) if len(popularity) else popularity
+
+    def recommend(self, user_ids: Sequence[str], k: int = 10,
+                  batch_size: int = 1024) -> Dict[str, List[Tuple[str, float]]]:
+        """Top-k de productos no vistos para varios usuarios, puntuados por lotes"""
+        results = {}
+        known = [user_id for user_id in user_ids if user_id in self.user_index]
+        for user_id in user_ids:
+            if user_id not in self.user_index:
+                results[user_id] = [
+                    (self.item_ids[i], float(self.popularity[i])) for i in self.popular_items[:k]
+                ]
+
+        k = min(k, len(self.item_ids))
+        for start in range(0, len(known), batch_size):
+            batch = known[start:start + batch_size]
+            rows = np.array([self.user_index[user_id] for user_id in batch])
+            scores = self.user_factors[rows] @ self.item_factors.T
+
+            # Excluir los productos con los que el usuario ya interactuó
+            seen = self.seen[rows]
+            scores[np.repeat(np.arange(len(rows)), np.diff(seen.indptr)), seen.indices] = -np.inf
+
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k else np.empty((len(rows), 0), dtype=int)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            for user_id, items, item_scores in zip(batch, top, top_scores):
+                results[user_id] = [
+                    (self.item_ids[i], float(score))
+                    for i, score in zip(items, item_scores) if np.isfinite(score)
+                ]
+        return results
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'trained_at': self.trained_at,
+            'n_users': len(self.user_ids),
+            'n_items': len(self.item_ids),
+            'n_interactions': int(self.seen.nnz),
+            'params': self.params
+        }
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(
+            os.path.join(directory, 'factors.npz'),
+            user_factors=self.user_factors, item_factors=self.item_factors,
+            seen_data=self.seen.data, seen_indices=self.seen.indices, seen_indptr=self.seen.indptr
+        )
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({**self.metadata(), 'user_ids': self.user_ids, 'item_ids': self.item_ids}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> 'FactorModel':
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = np.load(os.path.join(directory, 'factors.npz'))
+        seen = sparse.csr_matrix(
+            (arrays['seen_data'], arrays['seen_indices'], arrays['seen_indptr']),
+            shape=(len(meta['user_ids']), len(meta['item_ids']))
+        )
+        return cls(
+            meta['version'], meta['user_ids'], meta['item_ids'],
+            arrays['user_factors'], arrays['item_factors'], seen,
+            meta['trained_at'], meta['params']
+        )
+
+
+class CollaborativeFilteringEngine:
+    """Entrena, publica y sirve versiones de factores de filtrado colaborativo"""
+
+    def __init__(self, factors_dir: str = FACTORS_DIR, als: Optional[ImplicitALS] = None):
+        self.factors_dir = factors_dir
+        self.als = als or ImplicitALS()
+        self.model: Optional[FactorModel] = None
+        self._publish_lock = threading.Lock()
+
+    def train(self, log: pd.DataFrame, item_ids: Sequence[str]) -> FactorModel:
+        """Construir la matriz desde el log, factorizarla y publicar una versión nueva"""
+        return self.publish_factors(*train_collaborative_task(log, item_ids, self.als))
+
+    def publish_factors(self, interactions: InteractionMatrix, user_factors: np.ndarray,
+                        item_factors: np.ndarray) -> FactorModel:
+        """Publicar como versión nueva unos factores entrenados (aquí o en otro proceso)"""
+        with self._publish_lock:
+            model = FactorModel(
+                self._latest_version() + 1, interactions.user_ids, interactions.item_ids,
+                user_factors, item_factors, interactions.matrix,
+                datetime.now().isoformat(), self.als.params()
+            )
+            self.publish(model)
+        return model
+
+    def publish(self, model: FactorModel):
+        """Guardar la versión y apuntar CURRENT a ella; las consultas en curso usan la anterior"""
+        try:
+            model.save(os.path.join(self.factors_dir, f"v{model.version}"))
+            pointer = os.path.join(self.factors_dir, 'CURRENT')
+            with open(pointer + '.tmp', 'w') as f:
+                f.write(str(model.version))
+            os.replace(pointer + '.tmp', pointer)
+        except OSError as e:
+            logger.warning(f"No se pudieron guardar los factores v{model.version}: {e}")
+        self.model = model
+        logger.info(f"Factores de filtrado colaborativo v{model.version} publicados")
+
+    def load_latest(self) -> Optional[FactorModel]:
+        """Cargar la versión publicada en CURRENT, si existe"""
+        try:
+            with open(os.path.join(self.factors_dir, 'CURRENT')) as f:
+                version = int(f.read().strip())
+            self.model = FactorModel.load(os.path.join(self.factors_dir, f"v{version}"))
+        except (OSError, ValueError, KeyError) as e:
+            logger.info(f"No hay factores publicados que cargar: {e}")
+            return None
+        return self.model
+
+    def recommend(self, user_ids: Sequence[str], k: int = 10) -> Dict[str, List[Tuple[str, float]]]:
+        model = self.model
+        if model is None:
+            raise ValueError("El modelo de filtrado colaborativo no está entrenado")
+        return model.recommend(user_ids, k)
+
+    def _latest_version(self) -> int:
+        current = self.model.version if self.model else 0
+        if os.path.isdir(self.factors_dir):
+            for name in os.listdir(self.factors_dir):
+                if name.startswith('v') and name[1:].isdigit():
+                    current = max(current, int(name[1:]))
+        return current
+
+
+def train_collaborative_task(log: pd.DataFrame, item_ids: Sequence[str],
+                             als: ImplicitALS) -> Tuple[InteractionMatrix, np.ndarray, np.ndarray]:
+    """Matriz de interacciones y factores ALS en un proceso del pool; quien llama los publica"""
+    interactions = InteractionMatrix.from_log(log, item_ids)
+    user_factors, item_factors = als.fit(interactions.matrix)
+    return interactions, user_factors, item_factors
@@ -0,0 +1,162 @@
+"""
+Almacén de Features de Productos
+Tabla columnar en arrays de NumPy indexada por posición de producto, compartida entre
+los servicios: tendencias y predicciones escriben sus resultados y las recomendaciones
+los leen sin recalcularlos
+"""
+
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Features conocidas y su significado
+PRODUCT_FEATURES = {
+    'sales_volume': 'Unidades vendidas recientes',
+    'trend_score': 'Puntuación de tendencia (0-1) calculada por TrendAnalyzer',
+    'profit_margin': 'Margen de ganancia (0-1)',
+    'stock_level': 'Unidades en inventario',
+    'predicted_growth': 'Crecimiento de ventas previsto (%) calculado por PredictionEngine'
+}
+
+
+class ProductFeatureStore:
+    """Columnas float64 por feature; NaN = valor aún no publicado para ese producto"""
+
+    def __init__(self, features: Iterable[str] = PRODUCT_FEATURES, capacity: int = 256,
+                 change_log_size: int = 4096):
+        self.features = list(features)
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._columns = {feature: np.full(capacity, np.nan) for feature in self.features}
+        self._updated_at: Dict[str, Optional[str]] = {feature: None for feature in self.features}
+        self._lock = threading.Lock()
+        # Se incrementa con cada escritura; los lectores lo comparan para saber si hay cambios
+        self.version = 0
+        # Lo mismo por feature, para quien solo depende de algunas
+        self.feature_versions: Dict[str, int] = {feature: 0 for feature in self.features}
+        # (versión, feature, posiciones) de las últimas escrituras para actualizaciones parciales
+        self._changes = deque(maxlen=change_log_size)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, product_ids: Sequence[str], create: bool = False) -> np.ndarray:
+        """Posición de cada producto en las columnas (-1 si no existe y create=False)"""
+        if create:
+            with self._lock:
+                for product_id in product_ids:
+                    if product_id not in self.index:
+                        self._append(product_id)
+        return np.fromiter(
+            (self.index.get(product_id, -1) for product_id in product_ids),
+            dtype=np.int64, count=len(product_ids)
+        )
+
+    def write(self, feature: str, product_ids: Sequence[str], values: Sequence[float],
+              relative: Optional[Sequence[bool]] = None, minimum: Optional[float] = None) -> np.ndarray:
+        """Publicar los valores de una feature para varios productos (los nuevos se registran)
+
+        Con relative, los valores marcados se suman al actual en lugar de reemplazarlo (primero
+        se aplican los absolutos y después los incrementos). Lectura y escritura ocurren bajo
+        el mismo lock, así que ningún incremento concurrente se pierde. Devuelve los valores
+        resultantes.
+        """
+        if feature not in self._columns:
+            raise ValueError(f"Feature desconocida: {feature}")
+
+        positions = self.positions(product_ids, create=True)
+        values = np.asarray(values, dtype=float)
+        relative = np.zeros(len(positions), dtype=bool) if relative is None else np.asarray(relative, dtype=bool)
+        with self._lock:
+            column = self._columns[feature]
+            previous = column[positions].copy()
+            column[positions[~relative]] = values[~relative]
+            if relative.any():
+                increments = positions[relative]
+                column[increments] = np.nan_to_num(column[increments])
+                np.add.at(column, increments, values[relative])
+            if minimum is not None:
+                column[positions] = np.maximum(column[positions], minimum)
+
+            # Republicar los mismos valores no cuenta como cambio (no invalida a los lectores)
+            current = column[positions]
+            changed = ~((current == previous) | (np.isnan(current) & np.isnan(previous)))
+            if changed.any():
+                self._updated_at[feature] = datetime.now().isoformat()
+                self.version += 1
+                self.feature_versions[feature] += 1
+                self._changes.append((self.version, feature, positions[changed]))
+            return current.copy()
+
+    def fill_missing(self, feature: str, product_ids: Sequence[str], values: Sequence[float]):
+        """Publicar valores solo donde la feature aún no tiene uno (p. ej. datos semilla)"""
+        positions = self.positions(product_ids, create=True)
+        values = np.asarray(values, dtype=float)
+        with self._lock:
+            column = self._columns[feature]
+            missing = np.isnan(column[positions])
+            if missing.any():
+                column[positions[missing]] = values[missing]
+                self._updated_at[feature] = datetime.now().isoformat()
+                self.version += 1
+                self.feature_versions[feature] += 1
+                self._changes.append((self.version, feature, positions[missing]))
+
+    def changes_since(self, version: int) -> Optional[Dict[str, np.ndarray]]:
+        """Posiciones modificadas por feature desde version, o None si el registro ya no la cubre"""
+        with self._lock:
+            if version == self.version:
+                return {}
+            if not self._changes or self._changes[0][0] > version + 1:
+                return None
+            changed: Dict[str, Set[int]] = {}
+            for change_version, feature, positions in self._changes:
+                if change_version > version:
+                    changed.setdefault(feature, set()).update(positions.tolist())
+        return {feature: np.array(sorted(positions), dtype=np.int64) for feature, positions in changed.items()}
+
+    def version_of(self, features: Iterable[str]) -> Tuple[int, ...]:
+        """Versión de un subconjunto de features: no cambia con escrituras de las demás"""
+        return tuple(self.feature_versions[feature] for feature in features)
+
+    def column(self, feature: str) -> np.ndarray:
+        """Vista de solo lectura de la columna completa, alineada con self.ids"""
+        view = self._columns[feature][:len(self.ids)]
+        view.flags.writeable = False
+        return view
+
+    def read(self, feature: str, product_ids: Sequence[str]) -> np.ndarray:
+        """Valores de la feature para los productos indicados (NaN si no hay valor)"""
+        positions = self.positions(product_ids)
+        values = self._columns[feature][np.maximum(positions, 0)]
+        return np.where(positions >= 0, values, np.nan)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'products': len(self.ids),
+            'version': self.version,
+            'features': {
+                feature: {
+                    'available': int(np.count_nonzero(~np.isnan(self.column(feature)))),
+                    'updated_at': self._updated_at[feature]
+                }
+                for feature in self.features
+            }
+        }
+
+    def _append(self, product_id: str):
+        position = len(self.ids)
+        capacity = len(next(iter(self._columns.values()))) if self._columns else 0
+        if position >= capacity:
+            # Crecimiento geométrico; los lectores que tengan una vista de la columna anterior
+            # siguen viendo un array válido
+            new_capacity = max(2 * capacity, 1)
+            for feature, column in self._columns.items():
+                grown = np.full(new_capacity, np.nan)
+                grown[:capacity] = column
+                self._columns[feature] = grown
+        self.ids.append(product_id)
+        self.index[product_id] = position
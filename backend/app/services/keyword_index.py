@@ -0,0 +1,136 @@
+"""
+Índice Invertido de Palabras Clave
+Mantiene frecuencias de términos y postings de reseñas por producto, categoría y día
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Iterable
+
+
+class _TermStats:
+    """Frecuencias de términos y totales de tokens agregados por ámbito"""
+
+    def __init__(self):
+        self.global_tf: Counter = Counter()
+        self.product_tf: Dict[str, Counter] = defaultdict(Counter)
+        self.category_tf: Dict[str, Counter] = defaultdict(Counter)
+        self.day_tf: Dict[date, Counter] = defaultdict(Counter)
+        self.category_day_tf: Dict[Tuple[str, date], Counter] = defaultdict(Counter)
+
+        # Total de tokens procesados por ámbito (denominador de los porcentajes)
+        self.token_totals: Counter = Counter()
+
+    def add(self, product_id: str, category: str, day: date, review_tf: Counter, n_tokens: int):
+        self.global_tf.update(review_tf)
+        self.product_tf[product_id].update(review_tf)
+        self.category_tf[category].update(review_tf)
+        self.day_tf[day].update(review_tf)
+        self.category_day_tf[(category, day)].update(review_tf)
+
+        self.token_totals[('all', None)] += n_tokens
+        self.token_totals[('product', product_id)] += n_tokens
+        self.token_totals[('category', category)] += n_tokens
+        self.token_totals[('day', day)] += n_tokens
+        self.token_totals[('category_day', (category, day))] += n_tokens
+
+
+class KeywordIndex:
+    """Índice invertido construido de forma incremental durante la ingesta de reseñas"""
+
+    def __init__(self, min_term_length: int = 4):
+        # Longitud mínima para contar un término como palabra clave
+        self.min_term_length = min_term_length
+
+        # término -> {review_id: frecuencia en la reseña}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        # review_id -> (product_id, category, día)
+        self.reviews: Dict[str, Tuple[str, str, date]] = {}
+
+        # Frecuencias de todas las reseñas y solo de textos únicos (sin casi duplicados)
+        self.stats = _TermStats()
+        self.unique_stats = _TermStats()
+        self.days: List[date] = []
+
+    def __len__(self) -> int:
+        return len(self.reviews)
+
+    def add_review(self, review_id: str, product_id: str, category: str,
+                   day: date, tokens: List[str], is_duplicate: bool = False):
+        """Indexar una reseña ya preprocesada"""
+        if review_id in self.reviews:
+            return
+
+        self.reviews[review_id] = (product_id, category, day)
+        index = bisect_left(self.days, day)
+        if index == len(self.days) or self.days[index] != day:
+            self.days.insert(index, day)
+
+        review_tf = Counter(token for token in tokens if len(token) >= self.min_term_length)
+        for term, freq in review_tf.items():
+            self.postings[term][review_id] = freq
+
+        self.stats.add(product_id, category, day, review_tf, len(tokens))
+        if not is_duplicate:
+            self.unique_stats.add(product_id, category, day, review_tf, len(tokens))
+
+    def top_keywords(self, n: int = 10, product_id: Optional[str] = None,
+                     category: Optional[str] = None, start: Optional[date] = None,
+                     end: Optional[date] = None, unique: bool = False) -> Tuple[List[Tuple[str, int]], int]:
+        """Términos más frecuentes en un ámbito y el total de tokens del ámbito"""
+        stats = self.unique_stats if unique else self.stats
+
+        if product_id:
+            counts = stats.product_tf.get(product_id, Counter())
+            return counts.most_common(n), stats.token_totals[('product', product_id)]
+
+        if start is None and end is None:
+            if category:
+                return (stats.category_tf.get(category, Counter()).most_common(n),
+                        stats.token_totals[('category', category)])
+            return stats.global_tf.most_common(n), stats.token_totals[('all', None)]
+
+        counts = Counter()
+        total = 0
+        for day in self._days_in_range(start, end):
+            if category:
+                counts.update(stats.category_day_tf.get((category, day), Counter()))
+                total += stats.token_totals[('category_day', (category, day))]
+            else:
+                counts.update(stats.day_tf.get(day, Counter()))
+                total += stats.token_totals[('day', day)]
+        return counts.most_common(n), total
+
+    def term_over_time(self, term: str, product_id: Optional[str] = None,
+                       category: Optional[str] = None) -> List[Tuple[date, int]]:
+        """Frecuencia diaria de un término usando solo sus postings"""
+        by_day = Counter()
+        for review_id, freq in self.postings.get(term, {}).items():
+            review_product, review_category, day = self.reviews[review_id]
+            if product_id and review_product != product_id:
+                continue
+            if category and review_category != category:
+                continue
+            by_day[day] += freq
+        return sorted(by_day.items())
+
+    def reviews_mentioning(self, term: str, product_id: Optional[str] = None,
+                           category: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """IDs de reseñas que contienen el término, de la más reciente a la más antigua"""
+        matches = []
+        for review_id in self.postings.get(term, {}):
+            review_product, review_category, day = self.reviews[review_id]
+            if product_id and review_product != product_id:
+                continue
+            if category and review_category != category:
+                continue
+            matches.append((day, review_id))
+        matches.sort(reverse=True)
+        review_ids = [review_id for _, review_id in matches]
+        return review_ids[:limit] if limit else review_ids
+
+    def _days_in_range(self, start: Optional[date], end: Optional[date]) -> Iterable[date]:
+        lo = bisect_left(self.days, start) if start else 0
+        hi = bisect_right(self.days, end) if end else len(self.days)
+        return self.days[lo:hi]
@@ -0,0 +1,129 @@
+"""
+Detección de Reseñas Casi Duplicadas
+MinHash + locality-sensitive hashing para agrupar textos repetidos o generados por bots
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Primo mayor que 2^32 para las permutaciones universales (a * x + b) mod p
+_MERSENNE_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+class NearDuplicateDetector:
+    """Agrupa textos casi idénticos consultando solo los candidatos que comparten banda LSH
+
+    Cada texto se compara solo con los de su mismo ámbito (p. ej. el producto): una plantilla
+    repetida en otro producto no convierte sus reseñas en duplicados.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3,
+                 threshold: float = 0.8, seed: int = 42):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        rng = np.random.RandomState(seed)
+        # a < 2^31 y x < 2^32 evitan desbordar uint64 en a * x + b
+        self._a = rng.randint(1, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+
+        self._band_buckets: List[Dict[Tuple[Hashable, bytes], List[str]]] = [
+            defaultdict(list) for _ in range(bands)
+        ]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._exact: Dict[Tuple[Hashable, str], str] = {}
+
+        # doc_id -> id del clúster (el primer documento visto) y miembros de cada clúster
+        self.cluster_of: Dict[str, str] = {}
+        self.clusters: Dict[str, List[str]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.cluster_of)
+
+    def add(self, doc_id: str, text: str, scope: Hashable = None) -> Tuple[str, bool]:
+        """Registrar un texto en su ámbito; devuelve (clúster, es_duplicado)"""
+        if doc_id in self.cluster_of:
+            cluster_id = self.cluster_of[doc_id]
+            return cluster_id, cluster_id != doc_id
+
+        normalized = self._normalize(text)
+        cluster_id = self._exact.get((scope, normalized))
+
+        signature = None
+        if cluster_id is None:
+            signature = self.signature(normalized)
+            cluster_id = self._find_cluster(signature, scope)
+
+        is_duplicate = cluster_id is not None
+        if not is_duplicate:
+            cluster_id = doc_id
+            self._exact[(scope, normalized)] = doc_id
+            self._signatures[doc_id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                self._band_buckets[band][(scope, key)].append(doc_id)
+
+        self.cluster_of[doc_id] = cluster_id
+        self.clusters[cluster_id].append(doc_id)
+        return cluster_id, is_duplicate
+
+    def query(self, text: str, scope: Hashable = None) -> Optional[str]:
+        """Clúster existente al que pertenecería un texto, sin registrarlo"""
+        normalized = self._normalize(text)
+        if (scope, normalized) in self._exact:
+            return self._exact[(scope, normalized)]
+        return self._find_cluster(self.signature(normalized), scope)
+
+    def signature(self, normalized_text: str) -> np.ndarray:
+        """Firma MinHash de un texto normalizado"""
+        tokens = normalized_text.split()
+        if len(tokens) < self.shingle_size:
+            shingles = {normalized_text}
+        else:
+            shingles = {
+                ' '.join(tokens[i:i + self.shingle_size])
+                for i in range(len(tokens) - self.shingle_size + 1)
+            }
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def cluster_sizes(self) -> Dict[str, int]:
+        return {cluster_id: len(members) for cluster_id, members in self.clusters.items()}
+
+    def _find_cluster(self, signature: np.ndarray, scope: Hashable = None) -> Optional[str]:
+        """Mejor candidato LSH del ámbito cuya similitud de Jaccard estimada supera el umbral"""
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._band_buckets[band].get((scope, key), ()))
+
+        best_id, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate, similarity
+        return best_id
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return ' '.join(_TOKEN_PATTERN.findall(str(text).lower()))
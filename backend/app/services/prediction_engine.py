@@ -3,11 +3,13 @@ Motor de Predicciones
 Implementa algoritmos de machine learning para predecir tendencias futuras
 """
 
+import asyncio
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 import logging
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
@@ -16,12 +18,19 @@ from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import uuid
 
+from services.feature_store import ProductFeatureStore
+from utils.metrics import timed
+
 logger = logging.getLogger(__name__)
 
+# Horizonte fijo del crecimiento previsto que se publica en el almacén de features: las
+# predicciones que piden los clientes (a cualquier horizonte) no lo modifican
+FEATURE_HORIZON_DAYS = 30
+
 class PredictionEngine:
     """Motor de predicciones con algoritmos de ML"""
     
-    def __init__(self):
+    def __init__(self, feature_store: Optional[ProductFeatureStore] = None):
         self.models = {
             'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
             'gradient_boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
@@ -30,6 +39,8 @@ class PredictionEngine:
         self.scaler = StandardScaler()
         self.trained_models = {}
         self.sample_data = self._generate_sample_data()
+        # El crecimiento previsto se publica aquí para el resto de servicios
+        self.feature_store = feature_store
         
     def _generate_sample_data(self) -> pd.DataFrame:
         """Generar datos de ejemplo para entrenamiento"""
@@ -107,7 +118,7 @@ class PredictionEngine:
                 # Features para ML
                 data.append({
                     'date': date,
-                    'product_id': f'prod_{i:03d}',
+                    'product_id': f'prod_{i + 1:03d}',
                     'product_name': product,
                     'category': category,
                     'sales': max(0, sales),
@@ -140,46 +151,9 @@ class PredictionEngine:
             
             # Predecir para cada producto
             for product_id in data['product_id'].unique():
-                product_data = data[data['product_id'] == product_id]
-                
-                if len(product_data) < 60:  # Necesitamos al menos 2 meses de datos
-                    continue
-                
-                # Entrenar modelo para este producto
-                model = await self._train_product_model(product_data)
-                
-                if model is None:
-                    continue
-                
-                # Generar features para predicción
-                future_features = self._generate_future_features(product_data, days_ahead)
-                
-                # Hacer predicciones
-                predicted_sales = model.predict(future_features)
-                
-                # Calcular métricas de confianza
-                confidence = self._calculate_prediction_confidence(model, product_data)
-                
-                # Generar análisis de la predicción
-                prediction_analysis = self._analyze_prediction(product_data, predicted_sales, days_ahead)
-                
-                product_info = product_data.iloc[0]
-                
-                predictions.append({
-                    'product_id': product_id,
-                    'product_name': product_info['product_name'],
-                    'category': product_info['category'],
-                    'prediction_period': days_ahead,
-                    'predicted_sales': [max(0, int(sale)) for sale in predicted_sales],
-                    'confidence_level': round(confidence, 3),
-                    'predicted_growth': round(prediction_analysis['growth_rate'], 2),
-                    'trend_direction': prediction_analysis['trend_direction'],
-                    'seasonal_factors': prediction_analysis['seasonal_factors'],
-                    'risk_factors': prediction_analysis['risk_factors'],
-                    'recommendations': prediction_analysis['recommendations'],
-                    'model_used': model.__class__.__name__,
-                    'prediction_date': datetime.now().isoformat()
-                })
+                prediction = await self.predict_product(data[data['product_id'] == product_id], days_ahead)
+                if prediction is not None:
+                    predictions.append(prediction)
             
             # Ordenar por confianza y crecimiento esperado
             predictions.sort(key=lambda x: (x['confidence_level'], x['predicted_growth']), reverse=True)
@@ -190,8 +164,97 @@ class PredictionEngine:
             logger.error(f"Error prediciendo tendencias: {e}")
             raise
     
-    async def predict_demand(self, product_id: str, days_ahead: int = 30) -> Dict[str, Any]:
-        """Predecir demanda específica para un producto"""
+    def product_ids(self, category: Optional[str] = None) -> List[str]:
+        """Productos con historial, opcionalmente de una sola categoría"""
+        data = self.sample_data if not category else self.sample_data[self.sample_data['category'] == category]
+        return data['product_id'].unique().tolist()
+    
+    async def predict_product(self, product_data: pd.DataFrame, days_ahead: int = 30) -> Optional[Dict[str, Any]]:
+        """Entrenar y predecir un solo producto; None si no hay datos suficientes
+        
+        El modelo y el escalador son copias propias del producto, así que varias predicciones
+        pueden correr a la vez sin compartir estado.
+        """
+        if len(product_data) < 60:  # Necesitamos al menos 2 meses de datos
+            return None
+        
+        # Entrenar modelo para este producto
+        model = await self._train_product_model(product_data)
+        
+        if model is None:
+            return None
+        
+        # Generar features para predicción
+        future_features = self._generate_future_features(product_data, days_ahead)
+        
+        # Hacer predicciones
+        predicted_sales = model.predict(future_features)
+        
+        # Calcular métricas de confianza
+        confidence = self._calculate_prediction_confidence(model, product_data)
+        
+        # Generar análisis de la predicción
+        prediction_analysis = self._analyze_prediction(product_data, predicted_sales, days_ahead)
+        
+        product_info = product_data.iloc[0]
+        
+        return {
+            'product_id': product_info['product_id'],
+            'product_name': product_info['product_name'],
+            'category': product_info['category'],
+            'prediction_period': days_ahead,
+            'predicted_sales': [max(0, int(sale)) for sale in predicted_sales],
+            'confidence_level': round(confidence, 3),
+            'predicted_growth': round(prediction_analysis['growth_rate'], 2),
+            'trend_direction': prediction_analysis['trend_direction'],
+            'seasonal_factors': prediction_analysis['seasonal_factors'],
+            'risk_factors': prediction_analysis['risk_factors'],
+            'recommendations': prediction_analysis['recommendations'],
+            'model_used': model.__class__.__name__,
+            'prediction_date': datetime.now().isoformat()
+        }
+    
+    async def refresh_features(self, days_ahead: int = FEATURE_HORIZON_DAYS):
+        """Predecir todos los productos al horizonte fijo y publicar su crecimiento previsto"""
+        self.publish_predictions(await self.predict_trends(days_ahead))
+    
+    def publish_predictions(self, predictions: List[Dict[str, Any]]):
+        """Publicar el crecimiento previsto de cada producto en el almacén de features"""
+        if self.feature_store is not None and predictions:
+            self.feature_store.write(
+                'predicted_growth',
+                [prediction['product_id'] for prediction in predictions],
+                [prediction['predicted_growth'] for prediction in predictions]
+            )
+    
+    @staticmethod
+    def predictions_frame(predictions: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Predicciones en formato largo: una fila por producto y día previsto"""
+        columns = ['product_id', 'product_name', 'category', 'day', 'date', 'predicted_sales',
+                   'confidence_level', 'predicted_growth', 'trend_direction', 'model_used']
+        if not predictions:
+            return pd.DataFrame(columns=columns)
+        
+        lengths = np.array([len(prediction['predicted_sales']) for prediction in predictions])
+        repeat = lambda key: np.repeat([prediction[key] for prediction in predictions], lengths)  # noqa: E731
+        day = np.concatenate([np.arange(1, length + 1) for length in lengths])
+        today = pd.Timestamp(datetime.now().date())
+        return pd.DataFrame({
+            'product_id': repeat('product_id'),
+            'product_name': repeat('product_name'),
+            'category': repeat('category'),
+            'day': day,
+            'date': today + pd.to_timedelta(day, unit='D'),
+            'predicted_sales': np.concatenate([prediction['predicted_sales'] for prediction in predictions]).astype(np.int64),
+            'confidence_level': repeat('confidence_level').astype(float),
+            'predicted_growth': repeat('predicted_growth').astype(float),
+            'trend_direction': repeat('trend_direction'),
+            'model_used': repeat('model_used'),
+        }, columns=columns)
+    
+    async def predict_demand(self, product_id: str, days_ahead: int = 30,
+                             progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """Predecir demanda específica para un producto; progress(fracción, mensaje) informa del avance"""
         try:
             product_data = self.sample_data[self.sample_data['product_id'] == product_id].copy()
             
@@ -207,6 +270,9 @@ class PredictionEngine:
             if model is None:
                 raise ValueError("No se pudo entrenar el modelo para este producto")
             
+            if progress:
+                progress(0.2, 'Modelo entrenado')
+            
             # Generar features futuras
             future_features = self._generate_future_features(product_data, days_ahead)
             
@@ -218,7 +284,8 @@ class PredictionEngine:
             analysis = self._analyze_demand_prediction(product_data, predicted_sales, days_ahead)
             
             # Calcular intervalos de confianza
-            confidence_intervals = self._calculate_confidence_intervals(predicted_sales, model, product_data)
+            confidence_intervals = self._calculate_confidence_intervals(predicted_sales, model, product_data,
+                                                                       progress=progress)
             
             product_info = product_data.iloc[0]
             
@@ -296,6 +363,7 @@ class PredictionEngine:
             logger.error(f"Error prediciendo tendencias de mercado: {e}")
             raise
     
+    @timed("PredictionEngine._train_product_model")
     async def _train_product_model(self, product_data: pd.DataFrame) -> Optional[object]:
         """Entrenar modelo para un producto específico"""
         try:
@@ -314,15 +382,17 @@ class PredictionEngine:
                 X, y, test_size=0.2, random_state=42
             )
             
-            # Escalar features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Escalar features (escalador propio del producto)
+            scaler = clone(self.scaler)
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
             
-            # Entrenar múltiples modelos y seleccionar el mejor
+            # Entrenar múltiples modelos y seleccionar el mejor; self.models son solo plantillas
             best_model = None
             best_score = -float('inf')
             
-            for name, model in self.models.items():
+            for name, template in self.models.items():
+                model = clone(template)
                 model.fit(X_train_scaled, y_train)
                 score = model.score(X_test_scaled, y_test)
                 
@@ -334,7 +404,7 @@ class PredictionEngine:
             product_id = product_data['product_id'].iloc[0]
             self.trained_models[product_id] = {
                 'model': best_model,
-                'scaler': self.scaler,
+                'scaler': scaler,
                 'features': features,
                 'score': best_score
             }
@@ -449,8 +519,10 @@ class PredictionEngine:
             X = product_data[features].values
             y = product_data['sales'].values
             
-            # Escalar features
-            X_scaled = self.scaler.transform(X)
+            # Escalar features con el escalador con el que se entrenó el producto
+            product_id = product_data['product_id'].iloc[0]
+            scaler = self.trained_models[product_id]['scaler'] if product_id in self.trained_models else self.scaler
+            X_scaled = scaler.transform(X)
             
             # Calcular R²
             r2 = model.score(X_scaled, y)
@@ -641,13 +713,13 @@ class PredictionEngine:
     def _analyze_seasonal_patterns(self, predicted_sales: List[int], days_ahead: int) -> Dict[str, Any]:
         """Analizar patrones estacionales en las predicciones"""
         # Identificar ciclos semanales
+        averages = [np.mean(predicted_sales[i::7]) for i in range(0, min(days_ahead, 7))]
         weekly_pattern = []
-        for i in range(0, min(days_ahead, 7)):
-            week_days = predicted_sales[i::7]
+        for i, average in enumerate(averages):
             weekly_pattern.append({
                 'day_of_week': i + 1,
-                'average_sales': round(np.mean(week_days), 2),
-                'peak_day': i + 1 if np.mean(week_days) == max(weekly_pattern) else None
+                'average_sales': round(average, 2),
+                'peak_day': i + 1 if average == max(averages) else None
             })
         
         # Identificar tendencias dentro del período
@@ -730,16 +802,18 @@ class PredictionEngine:
             logger.error(f"Error evaluando rendimiento del modelo: {e}")
             return {}
     
+    @timed("PredictionEngine._calculate_confidence_intervals")
     def _calculate_confidence_intervals(self, predicted_sales: List[int], 
                                       model: object, 
-                                      product_data: pd.DataFrame) -> Dict[str, List[float]]:
+                                      product_data: pd.DataFrame,
+                                      progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, List[float]]:
         """Calcular intervalos de confianza para las predicciones"""
         try:
             # Simular múltiples predicciones para calcular intervalos
             n_simulations = 100
             all_predictions = []
             
-            for _ in range(n_simulations):
+            for simulation in range(n_simulations):
                 # Añadir ruido a los datos de entrenamiento
                 noisy_data = product_data.copy()
                 noise = np.random.normal(0, product_data['sales'].std() * 0.1, len(product_data))
@@ -762,6 +836,11 @@ class PredictionEngine:
                 future_features = self._generate_future_features(noisy_data, len(predicted_sales))
                 temp_predictions = temp_model.predict(future_features)
                 all_predictions.append(temp_predictions)
+                
+                # Los reentrenamientos son casi todo el coste: ocupan el tramo 0.2-0.95 del progreso
+                if progress:
+                    progress(0.2 + 0.75 * (simulation + 1) / n_simulations,
+                             f'Intervalos de confianza: {simulation + 1}/{n_simulations} simulaciones')
             
             # Calcular intervalos de confianza
             all_predictions = np.array(all_predictions)
@@ -951,4 +1030,33 @@ class PredictionEngine:
             
         except Exception as e:
             logger.error(f"Error calculando confianza del mercado: {e}")
-            return 0.5 
\ No newline at end of file
+            return 0.5
+
+
+# Motor propio de cada proceso del pool de entrenamiento (se crea en su primera tarea)
+_worker_engine: Optional[PredictionEngine] = None
+
+
+def _engine_for_worker() -> PredictionEngine:
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = PredictionEngine()
+    return _worker_engine
+
+
+def predict_trends_task(days_ahead: int = 30, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """predict_trends en un proceso del pool; quien llama publica el resultado en su almacén"""
+    return asyncio.run(_engine_for_worker().predict_trends(days_ahead, category))
+
+
+def predict_product_task(product_id: str, days_ahead: int = 30) -> Optional[Dict[str, Any]]:
+    """predict_product de un solo producto en un proceso del pool"""
+    engine = _engine_for_worker()
+    product_data = engine.sample_data[engine.sample_data['product_id'] == product_id]
+    return asyncio.run(engine.predict_product(product_data, days_ahead))
+
+
+def predict_demand_task(product_id: str, days_ahead: int = 30,
+                        progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+    """predict_demand en un proceso del pool; progress es el JobProgress del trabajo, si lo hay"""
+    return asyncio.run(_engine_for_worker().predict_demand(product_id, days_ahead, progress))
@@ -0,0 +1,260 @@
+"""
+Optimizador de Promociones
+Elige productos, estrategia y nivel de descuento para todo el presupuesto a la vez
+como una mochila de elección múltiple resuelta por su relajación lineal (dual lagrangiano)
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Plantillas de estrategia: nivel de descuento de referencia, unidades afectadas
+# ('stock' = todo el inventario), multiplicador de retorno y probabilidad de éxito
+PROMOTION_TEMPLATES = {
+    'volume_discount': {
+        'id_prefix': 'vol_disc',
+        'name': 'Descuentos por Volumen',
+        'description': 'Descuentos en compras de 10+ unidades de productos con alto stock',
+        'discount_levels': (0.10, 0.15, 0.20),
+        'reference_discount': 0.15,
+        'units': 10,
+        'return_multiplier': 1.8,
+        'success_probability': 0.75,
+        'duration_days': 14,
+        'risk_level': 'low',
+        'implementation_steps': [
+            'Configurar descuentos escalonados por cantidad',
+            'Comunicar la promoción a clientes mayoristas',
+            'Monitorear la rotación de inventario'
+        ],
+        'success_metrics': ['Unidades por pedido', 'Reducción de stock', 'Margen por pedido']
+    },
+    'product_bundle': {
+        'id_prefix': 'bundle',
+        'name': 'Bundles de Productos',
+        'description': 'Descuento al comprar juntos productos que los clientes suelen combinar',
+        'discount_levels': (0.15, 0.20, 0.25),
+        'reference_discount': 0.20,
+        'units': 5,
+        'return_multiplier': 2.0,
+        'success_probability': 0.70,
+        'duration_days': 21,
+        'risk_level': 'medium',
+        'implementation_steps': [
+            'Definir combinaciones de productos complementarios',
+            'Crear fichas de bundle en la tienda',
+            'Promocionar los bundles en redes sociales'
+        ],
+        'success_metrics': ['Bundles vendidos', 'Valor promedio por pedido', 'Venta cruzada']
+    },
+    'category_discount': {
+        'id_prefix': 'cat_disc',
+        'name': 'Descuentos por Categoría',
+        'description': 'Descuento general en las categorías seleccionadas',
+        'discount_levels': (0.05, 0.10, 0.15),
+        'reference_discount': 0.10,
+        'units': 15,
+        'return_multiplier': 1.6,
+        'success_probability': 0.80,
+        'duration_days': 10,
+        'risk_level': 'low',
+        'implementation_steps': [
+            'Aplicar el descuento a los productos seleccionados de la categoría',
+            'Destacar la categoría en la página principal',
+            'Enviar campaña de email segmentada'
+        ],
+        'success_metrics': ['Ventas de la categoría', 'Tasa de conversión', 'Nuevos clientes']
+    },
+    'trending_promotion': {
+        'id_prefix': 'trend',
+        'name': 'Promoción de Productos en Tendencia',
+        'description': 'Descuento moderado en productos con alta tendencia',
+        'discount_levels': (0.03, 0.05, 0.08),
+        'reference_discount': 0.05,
+        'units': 20,
+        'return_multiplier': 1.4,
+        'success_probability': 0.85,
+        'duration_days': 7,
+        'risk_level': 'very_low',
+        'implementation_steps': [
+            'Identificar productos con mayor tendencia',
+            'Lanzar campaña en redes sociales',
+            'Asegurar stock suficiente para la demanda'
+        ],
+        'success_metrics': ['Incremento en ventas', 'Engagement en redes sociales', 'Búsquedas del producto']
+    },
+    'clearance': {
+        'id_prefix': 'clear',
+        'name': 'Liquidación de Inventario',
+        'description': 'Descuento en productos con stock limitado y baja tendencia',
+        'discount_levels': (0.20, 0.30, 0.40),
+        'reference_discount': 0.30,
+        'units': 'stock',
+        'return_multiplier': 1.2,
+        'success_probability': 0.90,
+        'duration_days': 5,
+        'risk_level': 'very_low',
+        'implementation_steps': [
+            'Seleccionar productos de baja rotación',
+            'Publicar sección de liquidación',
+            'Retirar la promoción al agotar el stock'
+        ],
+        'success_metrics': ['Stock liquidado', 'Capital liberado', 'Días para agotar inventario']
+    }
+}
+
+
+def eligible_products(data: pd.DataFrame, strategy: str, bundle_lift: Optional[np.ndarray] = None) -> np.ndarray:
+    """Máscara de productos a los que se puede aplicar cada estrategia"""
+    stock = data['stock_level'].to_numpy()
+    trend = data['trend_score'].to_numpy()
+
+    if strategy == 'volume_discount':
+        return stock > 50
+    if strategy == 'product_bundle':
+        # Con datos de cestas solo productos con un compañero que se compra junto más de lo esperado
+        if bundle_lift is not None:
+            return bundle_lift > 1
+        # Sin ellos, categorías con al menos dos productos para formar el bundle
+        return data.groupby('category')['id'].transform('size').to_numpy() >= 2
+    if strategy == 'trending_promotion':
+        return trend > 0.7
+    if strategy == 'clearance':
+        return (stock < 30) & (trend < 0.5)
+    return np.ones(len(data), dtype=bool)
+
+
+def product_response(data: pd.DataFrame, strategy: str, product_scores: np.ndarray,
+                     bundle_lift: Optional[np.ndarray] = None) -> np.ndarray:
+    """Respuesta esperada (0.5-1) de cada producto a la estrategia según sus métricas"""
+    if strategy == 'volume_discount':
+        signal = np.minimum(data['stock_level'].to_numpy(dtype=float) / 100, 1.0)
+    elif strategy == 'product_bundle' and bundle_lift is not None:
+        signal = np.clip(1.0 - 1.0 / np.maximum(bundle_lift, 1e-9), 0.0, 1.0)
+    elif strategy == 'product_bundle':
+        signal = data['rating'].to_numpy(dtype=float) / 5.0
+    elif strategy == 'trending_promotion':
+        signal = data['trend_score'].to_numpy(dtype=float)
+    elif strategy == 'clearance':
+        signal = 1.0 - data['trend_score'].to_numpy(dtype=float)
+    else:
+        signal = product_scores
+    return 0.5 + 0.5 * signal
+
+
+class PromotionOptimizer:
+    """Asignación de presupuesto de promociones por programación lineal"""
+
+    def __init__(self, templates: Dict[str, Dict[str, Any]] = PROMOTION_TEMPLATES,
+                 elasticity: float = 0.5, bisection_steps: int = 50):
+        self.templates = templates
+        self.bisection_steps = bisection_steps
+        # Rendimientos decrecientes: el retorno por unidad de descuento cae con (ref / d) ** elasticity
+        self.elasticity = elasticity
+
+    def candidates(self, data: pd.DataFrame, product_scores: np.ndarray,
+                   bundle_lift: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Arrays de candidatos (producto, estrategia, nivel) con su coste y retorno esperado"""
+        prices = data['price'].to_numpy(dtype=float)
+        stock = data['stock_level'].to_numpy(dtype=float)
+
+        rows, strategies, discounts, units_affected, costs, returns = [], [], [], [], [], []
+        for strategy_index, (strategy, template) in enumerate(self.templates.items()):
+            positions = np.flatnonzero(eligible_products(data, strategy, bundle_lift))
+            if len(positions) == 0:
+                continue
+
+            response = product_response(data, strategy, product_scores, bundle_lift)[positions]
+            units = stock[positions] if template['units'] == 'stock' else np.full(len(positions), float(template['units']))
+            for discount in template['discount_levels']:
+                cost = prices[positions] * discount * units
+                efficiency = (template['reference_discount'] / discount) ** self.elasticity
+                expected = (cost * template['return_multiplier'] * template['success_probability']
+                            * response * efficiency)
+
+                rows.append(positions)
+                strategies.append(np.full(len(positions), strategy_index))
+                discounts.append(np.full(len(positions), discount))
+                units_affected.append(units)
+                costs.append(cost)
+                returns.append(expected)
+
+        if not rows:
+            empty = np.empty(0)
+            return {'rows': empty.astype(int), 'strategies': empty.astype(int),
+                    'discounts': empty, 'units': empty, 'costs': empty, 'returns': empty}
+
+        return {
+            'rows': np.concatenate(rows),
+            'strategies': np.concatenate(strategies),
+            'discounts': np.concatenate(discounts),
+            'units': np.concatenate(units_affected),
+            'costs': np.concatenate(costs),
+            'returns': np.concatenate(returns)
+        }
+
+    def optimize(self, data: pd.DataFrame, product_scores: np.ndarray, budget: float,
+                 bundle_lift: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Candidatos elegidos: máximo beneficio neto, coste total <= presupuesto, una promoción por producto"""
+        candidates = self.candidates(data, product_scores, bundle_lift)
+        net = candidates['returns'] - candidates['costs']
+
+        # Solo vale la pena considerar candidatos rentables que caben en el presupuesto
+        keep = (net > 0) & (candidates['costs'] <= budget)
+        candidates = {key: values[keep] for key, values in candidates.items()}
+        net = net[keep]
+        if len(net) == 0:
+            return candidates
+
+        # Agrupar los candidatos por producto (como mucho una promoción por producto)
+        order = np.argsort(candidates['rows'], kind='stable')
+        candidates = {key: values[order] for key, values in candidates.items()}
+        net = net[order]
+        product_rows, product_of = np.unique(candidates['rows'], return_inverse=True)
+        starts = np.flatnonzero(np.r_[True, np.diff(product_of) != 0])
+
+        # Relajación lineal resuelta por su dual: con precio λ por unidad de presupuesto cada
+        # producto elige su candidato de mayor net - λ·coste; se busca el menor λ factible
+        chosen = self._select(net, candidates['costs'], product_of, starts, 0.0)
+        if candidates['costs'][chosen].sum() > budget:
+            low, high = 0.0, float((net / candidates['costs']).max())
+            for _ in range(self.bisection_steps):
+                middle = (low + high) / 2
+                if candidates['costs'][self._select(net, candidates['costs'], product_of, starts, middle)].sum() > budget:
+                    low = middle
+                else:
+                    high = middle
+            chosen = self._select(net, candidates['costs'], product_of, starts, high)
+
+        # El presupuesto sobrante se completa con los mejores candidatos de productos libres
+        spent = candidates['costs'][chosen].sum()
+        used_products = np.zeros(len(product_rows), dtype=bool)
+        used_products[product_of[chosen]] = True
+
+        min_cost = candidates['costs'].min()
+        for i in np.argsort(-net / candidates['costs'], kind='stable'):
+            if budget - spent < min_cost:
+                break
+            if chosen[i] or used_products[product_of[i]]:
+                continue
+            if spent + candidates['costs'][i] <= budget:
+                chosen[i] = True
+                used_products[product_of[i]] = True
+                spent += candidates['costs'][i]
+
+        return {key: values[chosen] for key, values in candidates.items()}
+
+    @staticmethod
+    def _select(net: np.ndarray, costs: np.ndarray, product_of: np.ndarray,
+                starts: np.ndarray, price: float) -> np.ndarray:
+        """Mejor candidato de cada producto para un precio dado del presupuesto"""
+        adjusted = net - price * costs
+        best = np.maximum.reduceat(adjusted, starts)[product_of]
+        candidates = np.flatnonzero((adjusted == best) & (adjusted > 0))
+
+        # En caso de empate solo se queda el primer candidato del producto
+        _, first = np.unique(product_of[candidates], return_index=True)
+        chosen = np.zeros(len(net), dtype=bool)
+        chosen[candidates[first]] = True
+        return chosen
@@ -6,29 +6,106 @@ Implementa algoritmos de recomendación personalizada y estrategias de promoció
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 import json
+import os
+import threading
 import uuid
 
-from ..models.trend_models import (
+from models.trend_models import (
     ProductRecommendation,
-    PromotionStrategy
+    PromotionStrategy,
+    SimilarProduct,
+    UserRecommendation,
+    BundleRule,
+    StockLevel
 )
+from services.basket_miner import BasketMiner
+from services.collaborative_filtering import (
+    CollaborativeFilteringEngine,
+    FACTORS_DIR,
+    ImplicitALS,
+    InteractionMatrix
+)
+from services.feature_store import ProductFeatureStore
+from services.promotion_optimizer import PromotionOptimizer
+from services.similarity_index import SimilarityIndex
 
 logger = logging.getLogger(__name__)
 
+# Factores de la puntuación de recomendación y su ponderación por defecto
+SCORE_FACTORS = ('sales', 'trend', 'rating', 'profit', 'stock')
+DEFAULT_SCORE_WEIGHTS = {
+    'sales': 0.25,
+    'trend': 0.30,
+    'rating': 0.20,
+    'profit': 0.15,
+    'stock': 0.10
+}
+
+# Columnas del catálogo que se leen del almacén de features compartido
+STORE_FEATURES = ('sales_volume', 'trend_score', 'profit_margin', 'stock_level', 'predicted_growth')
+
+# Fracción de productos modificados a partir de la cual se recalculan todos los rankings
+RESCORE_RATIO = 0.2
+
+# Peso de cada señal de afinidad con un perfil de usuario
+PROFILE_AFFINITY_WEIGHTS = {
+    'interest': 0.5,
+    'price': 0.3,
+    'brand': 0.2
+}
+
 class RecommendationSystem:
     """Sistema de recomendaciones con algoritmos de IA"""
     
-    def __init__(self):
+    def __init__(self, score_weights: Optional[Dict[str, float]] = None, ann_probes: int = 8,
+                 interactions_path: Optional[str] = None, factors_dir: str = FACTORS_DIR,
+                 orders_path: Optional[str] = None, bundle_window_days: int = 30,
+                 feature_store: Optional[ProductFeatureStore] = None):
+        self.score_weights = {**DEFAULT_SCORE_WEIGHTS, **(score_weights or {})}
         self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
         self.clustering_model = KMeans(n_clusters=8, random_state=42)
         self.sample_data = self._generate_sample_data()
+        # Se incrementa con cada cambio del catálogo; invalida resultados cacheados
+        self.data_version = 0
+        
+        # Features compartidas con tendencias y predicciones; los valores de ejemplo solo
+        # cubren lo que ningún otro servicio ha publicado todavía
+        self.feature_store = feature_store if feature_store is not None else ProductFeatureStore()
+        # Reentrante: upsert_products sustituye el catálogo y sincroniza con el lock tomado
+        self._feature_lock = threading.RLock()
+        self._feature_version: Optional[int] = None
+        self._rows_by_position = np.empty(0, dtype=np.int64)
+        self._publish_catalog_features(self.sample_data)
         self.user_profiles = self._generate_user_profiles()
+        self.promotion_optimizer = PromotionOptimizer()
+        
+        # Vecinos por contenido (features + tags) precalculados al arrancar; en catálogos
+        # grandes el KMeans particiona el espacio para la búsqueda aproximada
+        self.similarity_index = SimilarityIndex(
+            self.vectorizer, clustering_model=self.clustering_model, n_probe=ann_probes
+        )
+        self.similarity_index.fit(self.sample_data['id'].tolist(), self._product_documents(self.sample_data))
+        
+        # Rankings precalculados por (perfil, categoría); None = sin perfil / todas las categorías
+        self.rankings: Dict[Tuple[Optional[str], Optional[str]], Tuple[np.ndarray, np.ndarray]] = {}
+        self._sync_features(force=True)
+        
+        # Filtrado colaborativo: log de interacciones (views, carts, purchases) y factores ALS
+        self.interactions = self._load_interactions(interactions_path)
+        self.collaborative = CollaborativeFilteringEngine(factors_dir)
+        if self.collaborative.load_latest() is None:
+            self.collaborative.train(self.interactions, self.sample_data['id'].tolist())
+        
+        # Cestas de compra: reglas de asociación por ventana para sugerir bundles
+        self.bundle_window_days = bundle_window_days
+        self.basket_miner = BasketMiner(self.sample_data['id'].tolist())
+        self.basket_miner.add_order_lines(self._load_order_lines(orders_path))
         
     def _generate_sample_data(self) -> pd.DataFrame:
         """Generar datos de ejemplo para el sistema de recomendaciones"""
@@ -146,9 +223,80 @@ class RecommendationSystem:
         df['trend_score'] = np.random.uniform(0.3, 0.9, len(df))
         df['profit_margin'] = np.random.uniform(0.15, 0.45, len(df))
         df['stock_level'] = np.random.randint(10, 100, len(df))
+        df['predicted_growth'] = np.nan
         
         return df
     
+    def _load_interactions(self, path: Optional[str]) -> pd.DataFrame:
+        """Leer el log de interacciones (CSV user_id, product_id, event, timestamp) o generar uno de ejemplo"""
+        if path and os.path.exists(path):
+            return pd.read_csv(path, parse_dates=['timestamp'])
+        return self._generate_sample_interactions()
+    
+    def _generate_sample_interactions(self, n_users: int = 300) -> pd.DataFrame:
+        """Generar interacciones de ejemplo: cada usuario sigue los gustos de un perfil"""
+        rng = np.random.RandomState(42)
+        profiles = list(self.user_profiles)
+        product_ids = self.sample_data['id'].to_numpy()
+        
+        # Probabilidad de interactuar con cada producto según la afinidad del perfil
+        probabilities = {}
+        for profile in profiles:
+            eligible, affinity = self._profile_affinity(self.sample_data, self.user_profiles[profile])
+            weights = np.where(eligible, affinity, 0.05)
+            probabilities[profile] = weights / weights.sum()
+        
+        records = []
+        now = datetime.now()
+        for user in range(n_users):
+            profile = profiles[user % len(profiles)]
+            n_events = rng.randint(5, 20)
+            products = rng.choice(product_ids, n_events, p=probabilities[profile])
+            events = rng.choice(['view', 'cart', 'purchase'], n_events, p=[0.7, 0.2, 0.1])
+            offsets = rng.randint(0, 90 * 24 * 60, n_events)
+            for product_id, event, offset in zip(products, events, offsets):
+                records.append({
+                    'user_id': f"user_{user:04d}",
+                    'product_id': product_id,
+                    'event': event,
+                    'timestamp': now - timedelta(minutes=int(offset))
+                })
+        
+        return pd.DataFrame(records)
+    
+    def _load_order_lines(self, path: Optional[str]) -> pd.DataFrame:
+        """Leer las líneas de pedido (CSV order_id, product_id, timestamp) o generar unas de ejemplo"""
+        if path and os.path.exists(path):
+            return pd.read_csv(path, parse_dates=['timestamp'])
+        return self._generate_sample_order_lines()
+    
+    def _generate_sample_order_lines(self, n_orders: int = 3000, days: int = 90) -> pd.DataFrame:
+        """Generar pedidos de ejemplo donde los productos similares suelen comprarse juntos"""
+        rng = np.random.RandomState(42)
+        product_ids = self.sample_data['id'].to_numpy()
+        popularity = self.sample_data['sales_volume'].to_numpy(dtype=float)
+        popularity = popularity / popularity.sum()
+        
+        records = []
+        now = datetime.now()
+        for order in range(n_orders):
+            timestamp = now - timedelta(minutes=int(rng.randint(0, days * 24 * 60)))
+            basket = [rng.choice(product_ids, p=popularity)]
+            
+            # Complementos: vecinos por contenido del primer producto y, a veces, un tercero
+            neighbors = [neighbor_id for neighbor_id, _ in self.similarity_index.neighbors(basket[0], 3)]
+            if neighbors and rng.rand() < 0.5:
+                basket.append(neighbors[rng.randint(len(neighbors))])
+                if len(neighbors) > 1 and rng.rand() < 0.3:
+                    basket.append(neighbors[0] if basket[-1] != neighbors[0] else neighbors[1])
+            if rng.rand() < 0.2:
+                basket.append(rng.choice(product_ids))
+            
+            for product_id in dict.fromkeys(basket):
+                records.append({'order_id': f"ord_{order:06d}", 'product_id': product_id, 'timestamp': timestamp})
+        
+        return pd.DataFrame(records)
+    
     def _generate_user_profiles(self) -> Dict[str, Dict[str, Any]]:
         """Generar perfiles de usuario para recomendaciones personalizadas"""
         profiles = {
@@ -185,94 +333,353 @@ class RecommendationSystem:
         }
         return profiles
     
-    async def get_product_recommendations(self, category: Optional[str] = None, limit: int = 10) -> List[ProductRecommendation]:
+    async def get_product_recommendations(self, category: Optional[str] = None, limit: int = 10,
+                                          similar_to: Optional[str] = None,
+                                          profile: Optional[str] = None) -> List[ProductRecommendation]:
         """Obtener recomendaciones de productos basadas en tendencias y análisis de IA"""
         try:
+            self._sync_features()
+            if profile and profile not in self.user_profiles:
+                raise ValueError(f"Perfil no encontrado: {profile}")
+            
+            catalog = self.sample_data
+            
+            # Sin producto de referencia basta con leer el ranking precalculado
+            if not similar_to:
+                positions, scores = self.rankings.get((profile, category), (np.empty(0, dtype=int), np.empty(0)))
+                return [
+                    self._build_product_recommendation(catalog.iloc[i], score)
+                    for i, score in zip(positions[:limit], scores[:limit])
+                ]
+            
             # Filtrar por categoría si se especifica
             if category:
-                data = self.sample_data[self.sample_data['category'] == category].copy()
+                data = catalog[catalog['category'] == category]
             else:
-                data = self.sample_data.copy()
-            
-            # Calcular puntuación de recomendación para cada producto
-            recommendations = []
-            for _, product in data.iterrows():
-                # Calcular puntuación basada en múltiples factores
-                recommendation_score = self._calculate_recommendation_score(product)
-                
-                # Generar razones de recomendación
-                reasons = self._generate_recommendation_reasons(product)
-                
-                # Crear objeto de recomendación
-                recommendation = ProductRecommendation(
-                    product_id=product['id'],
+                data = catalog
+            
+            # Restringir a los vecinos por contenido de un producto de referencia
+            if similar_to not in self.similarity_index.positions:
+                raise ValueError(f"Producto no encontrado: {similar_to}")
+            neighbors = self.similarity_index.query(similar_to, max(limit * 5, 50))
+            data = data[data['id'].isin([neighbor_id for neighbor_id, _ in neighbors])]
+            
+            # Puntuación de todos los productos como un único producto matriz-vector
+            scores = self._calculate_recommendation_scores(data)
+            if profile:
+                eligible, affinity = self._profile_affinity(data, self.user_profiles[profile])
+                scores = np.where(eligible, scores * (0.5 + 0.5 * affinity), -np.inf)
+            
+            # Seleccionar los k mejores sin ordenar todo el catálogo
+            top_indices = [i for i in self._top_k_indices(scores, limit) if np.isfinite(scores[i])]
+            
+            # Construir razones y objetos de respuesta solo para los ganadores
+            return [
+                self._build_product_recommendation(data.iloc[i], scores[i])
+                for i in top_indices
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo recomendaciones de productos: {e}")
+            raise
+    
+    async def get_user_recommendations(self, user_id: str, limit: int = 10) -> List[UserRecommendation]:
+        """Obtener recomendaciones por filtrado colaborativo para un usuario"""
+        try:
+            model = self.collaborative.model
+            if model is None:
+                raise ValueError("El modelo de filtrado colaborativo no está entrenado")
+            
+            source = 'collaborative' if user_id in model.user_index else 'popular'
+            recommendations = model.recommend([user_id], limit)[user_id]
+            catalog = self.sample_data.set_index('id')
+            
+            return [
+                UserRecommendation(
+                    product_id=product_id,
+                    product_name=catalog.at[product_id, 'name'],
+                    category=catalog.at[product_id, 'category'],
+                    score=round(score, 4),
+                    source=source,
+                    model_version=model.version
+                )
+                for product_id, score in recommendations if product_id in catalog.index
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo recomendaciones de usuario: {e}")
+            raise
+    
+    async def get_bundle_rules(self, window_days: int = 30, size: int = 2, limit: int = 20,
+                               min_support: float = 0.005, min_confidence: float = 0.05) -> List[BundleRule]:
+        """Obtener reglas de asociación de productos comprados juntos en una ventana"""
+        try:
+            if size not in (2, 3):
+                raise ValueError("size debe ser 2 (pares) o 3 (tríos)")
+            if window_days < 1:
+                raise ValueError("window_days debe ser al menos 1")
+            
+            mine = self.basket_miner.pair_rules if size == 2 else self.basket_miner.triple_rules
+            rules = mine(window_days, None, min_support, min_confidence, limit)
+            names = self.sample_data.set_index('id')['name']
+            
+            return [
+                BundleRule(
+                    antecedent=rule['antecedent'],
+                    consequent=rule['consequent'],
+                    product_names=[names.get(product_id, product_id) for product_id in [*rule['antecedent'], rule['consequent']]],
+                    support=rule['support'],
+                    confidence=rule['confidence'],
+                    lift=rule['lift'],
+                    orders=rule['count'],
+                    window_days=window_days
+                )
+                for rule in rules
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo reglas de bundles: {e}")
+            raise
+    
+    def add_order_lines(self, records: List[Dict[str, Any]]):
+        """Añadir líneas de pedido; solo se actualizan los días y ventanas afectados"""
+        lines = pd.DataFrame(records)
+        if 'timestamp' not in lines:
+            lines['timestamp'] = datetime.now()
+        self.basket_miner.add_order_lines(lines)
+    
+    def add_interactions(self, records: List[Dict[str, Any]]):
+        """Añadir interacciones al log; se incorporan en el siguiente entrenamiento"""
+        new = pd.DataFrame(records)
+        if 'timestamp' not in new:
+            new['timestamp'] = datetime.now()
+        self.interactions = pd.concat([self.interactions, new], ignore_index=True)
+    
+    def train_collaborative_model(self) -> Dict[str, Any]:
+        """Reentrenar los factores con el log actual y publicar una versión nueva"""
+        model = self.collaborative.train(self.interactions, self.sample_data['id'].tolist())
+        return model.metadata()
+    
+    def collaborative_training_inputs(self) -> Tuple[pd.DataFrame, List[str], ImplicitALS]:
+        """Argumentos de train_collaborative_task para entrenar en otro proceso"""
+        return self.interactions, self.sample_data['id'].tolist(), self.collaborative.als
+    
+    def publish_collaborative_model(self, interactions: InteractionMatrix, user_factors: np.ndarray,
+                                    item_factors: np.ndarray) -> Dict[str, Any]:
+        """Publicar factores entrenados en otro proceso como versión nueva"""
+        return self.collaborative.publish_factors(interactions, user_factors, item_factors).metadata()
+    
+    async def get_similar_products(self, product_id: str, limit: int = 5) -> List[SimilarProduct]:
+        """Obtener productos similares por contenido a partir del índice precalculado"""
+        try:
+            if product_id not in self.similarity_index.positions:
+                raise ValueError(f"Producto no encontrado: {product_id}")
+            
+            neighbors = self.similarity_index.neighbors(product_id, limit)
+            products = self.sample_data.set_index('id').loc[[neighbor_id for neighbor_id, _ in neighbors]]
+            
+            return [
+                SimilarProduct(
+                    product_id=neighbor_id,
                     product_name=product['name'],
                     category=product['category'],
-                    price=product['price'],
-                    recommendation_score=round(recommendation_score, 2),
-                    reasons=reasons,
-                    estimated_demand=round(product['sales_volume'] * (1 + product['trend_score']), 0),
-                    profit_potential=round(product['price'] * product['profit_margin'], 2),
-                    stock_status=self._get_stock_status(product['stock_level']),
-                    last_updated=datetime.now().isoformat()
+                    price=round(float(product['price']), 2),
+                    similarity_score=round(score, 4)
                 )
-                
-                recommendations.append(recommendation)
-            
-            # Ordenar por puntuación de recomendación y limitar resultados
-            recommendations.sort(key=lambda x: x.recommendation_score, reverse=True)
-            return recommendations[:limit]
+                for (neighbor_id, score), (_, product) in zip(neighbors, products.iterrows())
+            ]
             
         except Exception as e:
-            logger.error(f"Error obteniendo recomendaciones de productos: {e}")
+            logger.error(f"Error obteniendo productos similares: {e}")
             raise
     
+    def upsert_products(self, products: List[Dict[str, Any]]):
+        """Añadir o actualizar productos del catálogo y su entrada en el índice de similitud"""
+        updates = pd.DataFrame(products).set_index('id')
+        with self._feature_lock:
+            catalog = self.sample_data.set_index('id')
+            
+            new_ids = updates.index.difference(catalog.index)
+            catalog = pd.concat([catalog, updates.loc[new_ids].reindex(columns=catalog.columns)])
+            catalog.update(updates.drop(index=new_ids).reindex(columns=catalog.columns))
+            catalog = catalog.reset_index()
+            
+            changed = catalog[catalog['id'].isin(updates.index)]
+            self.similarity_index.upsert(changed['id'].tolist(), self._product_documents(changed))
+            
+            # Las features enviadas explícitamente se publican; los productos nuevos siembran el resto
+            for feature in STORE_FEATURES:
+                if feature in updates.columns:
+                    provided = updates[feature].dropna()
+                    self.feature_store.write(feature, provided.index.tolist(), provided.to_numpy())
+            self._publish_catalog_features(changed)
+            self.sample_data = catalog
+            self._sync_features(force=True)
+            self.data_version += 1
+    
+    @property
+    def catalog_version(self) -> Tuple[int, int]:
+        """Versión del catálogo y de las features compartidas que usan las recomendaciones"""
+        return self.data_version, self.feature_store.version
+    
+    def _publish_catalog_features(self, data: pd.DataFrame):
+        """Sembrar en el almacén las features del catálogo que aún no tienen valor"""
+        product_ids = data['id'].tolist()
+        for feature in STORE_FEATURES:
+            self.feature_store.fill_missing(feature, product_ids, data[feature].to_numpy(dtype=float))
+    
+    def update_stock(self, updates: List[Dict[str, Any]]) -> List[StockLevel]:
+        """Aplicar cambios de stock (absolutos o variaciones) en una sola escritura atómica"""
+        product_ids = [update['product_id'] for update in updates]
+        unknown = sorted(set(product_ids) - set(self.sample_data['id']))
+        if unknown:
+            raise ValueError(f"Productos no encontrados: {', '.join(unknown)}")
+        
+        relative = [update.get('delta') is not None for update in updates]
+        values = [update['delta'] if is_delta else update['stock_level']
+                  for update, is_delta in zip(updates, relative)]
+        levels = self.feature_store.write('stock_level', product_ids, values, relative, minimum=0)
+        
+        # Los rankings se actualizan en la siguiente lectura, solo para los productos cambiados
+        final_levels = dict(zip(product_ids, levels))
+        return [
+            StockLevel(product_id=product_id, stock_level=int(level), stock_status=self._get_stock_status(level))
+            for product_id, level in final_levels.items()
+        ]
+    
+    def _sync_features(self, force: bool = False):
+        """Leer del almacén las features publicadas desde la última sincronización"""
+        if not force and self._feature_version == self.feature_store.version:
+            return
+        
+        with self._feature_lock:
+            store_version = self.feature_store.version
+            if not force and self._feature_version == store_version:
+                return
+            
+            changes = None
+            if not force and self._feature_version is not None:
+                changes = self.feature_store.changes_since(self._feature_version)
+            
+            # Las lecturas concurrentes siguen usando el catálogo anterior: los cambios se
+            # escriben en una copia que sustituye a sample_data de una sola vez
+            if changes is None:
+                data = self._load_all_features(self.sample_data)
+                self._refresh_rankings(data)
+            else:
+                data, rows = self._load_changed_features(self.sample_data, changes)
+                if len(rows) > RESCORE_RATIO * len(data):
+                    self._refresh_rankings(data)
+                elif len(rows):
+                    self._rescore_rows(data, rows)
+            self.sample_data = data
+            self._feature_version = store_version
+    
+    def _load_all_features(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Copia del catálogo con todas las features publicadas"""
+        data = data.copy(deep=False)
+        positions = self.feature_store.positions(data['id'].tolist())
+        known = positions >= 0
+        for feature in STORE_FEATURES:
+            values = data[feature].to_numpy(dtype=float, copy=True)
+            published = self.feature_store.column(feature)[positions[known]]
+            values[known] = np.where(np.isnan(published), values[known], published)
+            data[feature] = values
+        
+        self._rows_by_position = np.full(len(self.feature_store), -1, dtype=np.int64)
+        self._rows_by_position[positions[known]] = np.flatnonzero(known)
+        return data
+    
+    def _load_changed_features(self, data: pd.DataFrame,
+                               changes: Dict[str, np.ndarray]) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Copia del catálogo con los valores modificados y las filas afectadas
+        
+        Solo se copian las columnas que cambian; el resto se comparte con el catálogo anterior.
+        """
+        data = data.copy(deep=False)
+        affected = []
+        for feature, positions in changes.items():
+            if feature not in STORE_FEATURES:
+                continue
+            positions = positions[positions < len(self._rows_by_position)]
+            rows = self._rows_by_position[positions]
+            positions, rows = positions[rows >= 0], rows[rows >= 0]
+            
+            values = data[feature].to_numpy(dtype=float, copy=True)
+            published = self.feature_store.column(feature)[positions]
+            values[rows] = np.where(np.isnan(published), values[rows], published)
+            data[feature] = values
+            affected.append(rows)
+        rows = np.unique(np.concatenate(affected)) if affected else np.empty(0, dtype=np.int64)
+        return data, rows
+    
+    def _product_documents(self, data: pd.DataFrame) -> List[str]:
+        """Texto de cada producto usado para TF-IDF"""
+        return (data['features'].fillna('') + ', ' + data['tags'].fillna('')).tolist()
+    
     async def get_promotion_strategies(self, budget: Optional[float] = None, target_category: Optional[str] = None) -> List[PromotionStrategy]:
         """Obtener estrategias de promoción recomendadas basadas en análisis de IA"""
         try:
+            self._sync_features()
             # Filtrar productos por categoría si se especifica
+            catalog = self.sample_data
             if target_category:
-                data = self.sample_data[self.sample_data['category'] == target_category].copy()
+                data = catalog[catalog['category'] == target_category]
             else:
-                data = self.sample_data.copy()
+                data = catalog
             
             # Si no se especifica presupuesto, usar uno por defecto
             if not budget:
                 budget = 5000.0
             
-            strategies = []
+            # Los bundles salen de productos que los clientes compran juntos en la ventana reciente
+            bundle_partners = self.basket_miner.best_partners(self.bundle_window_days)
+            bundle_lift = data['id'].map(
+                lambda product_id: bundle_partners[product_id]['lift'] if product_id in bundle_partners else 0.0
+            ).to_numpy(dtype=float)
             
-            # Estrategia 1: Descuentos por volumen
-            volume_discount_strategy = self._create_volume_discount_strategy(data, budget)
-            strategies.append(volume_discount_strategy)
+            # Elegir productos, estrategia y nivel de descuento para todo el presupuesto a la vez
+            selection = self.promotion_optimizer.optimize(
+                data, self._calculate_recommendation_scores(data), budget, bundle_lift
+            )
             
-            # Estrategia 2: Bundle de productos
-            bundle_strategy = self._create_bundle_strategy(data, budget)
-            strategies.append(bundle_strategy)
-            
-            # Estrategia 3: Descuentos por categoría
-            category_discount_strategy = self._create_category_discount_strategy(data, budget)
-            strategies.append(category_discount_strategy)
-            
-            # Estrategia 4: Promoción de productos en tendencia
-            trending_strategy = self._create_trending_promotion_strategy(data, budget)
-            strategies.append(trending_strategy)
-            
-            # Estrategia 5: Liquidación de inventario
-            clearance_strategy = self._create_clearance_strategy(data, budget)
-            strategies.append(clearance_strategy)
+            strategies = []
+            for strategy_index, template in enumerate(self.promotion_optimizer.templates.values()):
+                mask = selection['strategies'] == strategy_index
+                if mask.any():
+                    strategies.append(self._build_promotion_strategy(
+                        template, data, {key: values[mask] for key, values in selection.items()},
+                        bundle_partners
+                    ))
             
+            strategies.sort(key=lambda strategy: strategy.expected_roi, reverse=True)
             return strategies
             
         except Exception as e:
             logger.error(f"Error obteniendo estrategias de promoción: {e}")
             raise
     
+    @staticmethod
+    def normalize_custom_request(categories: List[str], budget: float, timeframe: int = 30,
+                                 budget_bucket: float = 100.0) -> Tuple[Tuple[str, ...], float, int]:
+        """Forma canónica de una petición personalizada: categorías únicas ordenadas y presupuesto por tramos
+        
+        Un presupuesto positivo nunca se redondea a cero: como mínimo queda en el primer tramo.
+        """
+        canonical_categories = tuple(sorted({category.strip() for category in categories if category.strip()}))
+        buckets = round(budget / budget_bucket)
+        if budget > 0:
+            buckets = max(buckets, 1)
+        bucketed_budget = round(buckets * budget_bucket, 2)
+        return canonical_categories, bucketed_budget, int(timeframe)
+    
     async def get_custom_recommendations(self, categories: List[str], budget: float, timeframe: int = 30) -> Dict[str, Any]:
         """Obtener recomendaciones personalizadas basadas en categorías y presupuesto"""
         try:
+            self._sync_features()
             # Filtrar productos por categorías especificadas
-            data = self.sample_data[self.sample_data['category'].isin(categories)].copy()
+            catalog = self.sample_data
+            data = catalog[catalog['category'].isin(categories)].copy()
             
             # Analizar productos por categoría
             category_analysis = {}
@@ -310,33 +717,135 @@ class RecommendationSystem:
             logger.error(f"Error obteniendo recomendaciones personalizadas: {e}")
             raise
     
-    def _calculate_recommendation_score(self, product: pd.Series) -> float:
-        """Calcular puntuación de recomendación basada en múltiples factores"""
-        # Factores de puntuación
-        sales_factor = min(product['sales_volume'] / 1000, 1.0)  # Normalizar ventas
-        trend_factor = product['trend_score']
-        rating_factor = product['rating'] / 5.0
-        profit_factor = product['profit_margin']
-        stock_factor = min(product['stock_level'] / 100, 1.0)  # Normalizar stock
-        
-        # Ponderación de factores
-        weights = {
-            'sales': 0.25,
-            'trend': 0.30,
-            'rating': 0.20,
-            'profit': 0.15,
-            'stock': 0.10
-        }
+    def _score_factor_matrix(self, data: pd.DataFrame) -> np.ndarray:
+        """Matriz (productos x factores) con los factores normalizados a 0-1"""
+        return np.column_stack([
+            np.minimum(data['sales_volume'].to_numpy(dtype=float) / 1000, 1.0),  # Normalizar ventas
+            data['trend_score'].to_numpy(dtype=float),
+            data['rating'].to_numpy(dtype=float) / 5.0,
+            data['profit_margin'].to_numpy(dtype=float),
+            np.minimum(data['stock_level'].to_numpy(dtype=float) / 100, 1.0)  # Normalizar stock
+        ])
+    
+    def _score_weight_vector(self) -> np.ndarray:
+        """Vector de ponderaciones en el orden de SCORE_FACTORS"""
+        return np.array([self.score_weights[factor] for factor in SCORE_FACTORS])
+    
+    def _calculate_recommendation_scores(self, data: pd.DataFrame) -> np.ndarray:
+        """Calcular la puntuación de recomendación (0-1) de todos los productos"""
+        if data.empty:
+            return np.empty(0)
+        return self._score_factor_matrix(data) @ self._score_weight_vector()
+    
+    def _profile_affinity(self, data: pd.DataFrame, profile: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """Productos elegibles para un perfil (coinciden con sus intereses) y su afinidad (0-1)"""
+        text = (data['name'] + ' ' + data['tags']).str.lower()
+        tags = data['tags'].str.lower().str.split(r',\s*')
+        
+        interests = {interest.lower() for interest in profile['interests']}
+        interest_match = (
+            data['category'].isin(interests).to_numpy()
+            | tags.apply(lambda product_tags: bool(interests.intersection(product_tags))).to_numpy()
+        )
+        
+        # Dentro del rango de precios vale 1; fuera decae con la distancia relativa al rango
+        low, high = profile['price_range']
+        prices = data['price'].to_numpy(dtype=float)
+        distance = np.maximum(low - prices, 0) + np.maximum(prices - high, 0)
+        price_fit = np.exp(-distance / max(high - low, 1.0))
+        
+        brand_pattern = '|'.join(rf"\b{brand.lower()}\b" for brand in profile['preferred_brands'])
+        brand_match = text.str.contains(brand_pattern, regex=True).to_numpy()
         
-        score = (
-            sales_factor * weights['sales'] +
-            trend_factor * weights['trend'] +
-            rating_factor * weights['rating'] +
-            profit_factor * weights['profit'] +
-            stock_factor * weights['stock']
+        affinity = (
+            PROFILE_AFFINITY_WEIGHTS['interest'] * interest_match
+            + PROFILE_AFFINITY_WEIGHTS['price'] * price_fit
+            + PROFILE_AFFINITY_WEIGHTS['brand'] * brand_match
         )
+        return interest_match, affinity
+    
+    def _refresh_rankings(self, data: pd.DataFrame):
+        """Recalcular los rankings de cada perfil y categoría tras cambios en el catálogo"""
+        base_scores = self._calculate_recommendation_scores(data)
+        categories = data['category'].to_numpy()
+        
+        # Elegibilidad y multiplicador de cada perfil: no dependen de las features que cambian
+        # (stock, tendencia...) y se reutilizan al reordenar solo algunos productos
+        profile_weights = {None: (np.ones(len(data), dtype=bool), np.ones(len(data)))}
+        for profile in self.user_profiles:
+            eligible, affinity = self._profile_affinity(data, self.user_profiles[profile])
+            profile_weights[profile] = (eligible, 0.5 + 0.5 * affinity)
+        
+        rankings = {}
+        for profile, (eligible, multiplier) in profile_weights.items():
+            scores = base_scores * multiplier
+            for segment in [None, *np.unique(categories)]:
+                mask = eligible if segment is None else eligible & (categories == segment)
+                positions = np.flatnonzero(mask)
+                order = np.argsort(-scores[positions], kind='stable')
+                rankings[(profile, segment)] = (positions[order], scores[positions][order])
+        
+        self._base_scores = base_scores
+        self._categories = categories
+        self._profile_weights = profile_weights
+        self.rankings = rankings
+    
+    def _rescore_rows(self, data: pd.DataFrame, rows: np.ndarray):
+        """Recalcular la puntuación de unas filas y recolocarlas en los rankings existentes"""
+        new_base = self._calculate_recommendation_scores(data.iloc[rows])
+        base_scores = self._base_scores.copy()
+        base_scores[rows] = new_base
+        
+        rankings = {}
+        for (profile, segment), (positions, scores) in self.rankings.items():
+            eligible, multiplier = self._profile_weights[profile]
+            member = eligible[rows] if segment is None else eligible[rows] & (self._categories[rows] == segment)
+            
+            keep = ~np.isin(positions, rows)
+            positions, scores = positions[keep], scores[keep]
+            
+            moved = rows[member]
+            moved_scores = new_base[member] * multiplier[moved]
+            order = np.argsort(-moved_scores, kind='stable')
+            moved, moved_scores = moved[order], moved_scores[order]
+            
+            # Inserción en el ranking ya ordenado (descendente) sin reordenarlo completo
+            at = np.searchsorted(-scores, -moved_scores, side='right')
+            rankings[(profile, segment)] = (np.insert(positions, at, moved), np.insert(scores, at, moved_scores))
+        
+        self._base_scores = base_scores
+        self.rankings = rankings
+    
+    def _top_k_indices(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Posiciones de las k mayores puntuaciones, en orden descendente"""
+        k = min(max(k, 0), len(scores))
+        if k == 0:
+            return np.empty(0, dtype=int)
+        
+        candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind='stable')]
+    
+    def _build_product_recommendation(self, product: pd.Series, score: float) -> ProductRecommendation:
+        """Crear el objeto de recomendación de un producto seleccionado"""
+        sales_factor = min(product['sales_volume'] / 1000, 1.0)
         
-        return score
+        return ProductRecommendation(
+            product_id=product['id'],
+            product_name=product['name'],
+            category=product['category'],
+            recommendation_score=round(float(score) * 100, 2),
+            confidence_level=round((product['rating'] / 5.0 + sales_factor) / 2, 2),
+            reasoning=self._generate_recommendation_reasons(product),
+            expected_growth=round(float(self._expected_growth(product)), 2),
+            optimal_price=round(float(product['price']), 2),
+            promotion_suggestions=self._generate_promotion_suggestions(product)
+        )
+    
+    def _expected_growth(self, product: pd.Series) -> float:
+        """Crecimiento previsto por el motor de predicciones o, si no lo hay, la tendencia actual"""
+        if pd.notna(product.get('predicted_growth')):
+            return product['predicted_growth']
+        return product['trend_score'] * 100
     
     def _generate_recommendation_reasons(self, product: pd.Series) -> List[str]:
         """Generar razones para la recomendación del producto"""
@@ -362,6 +871,22 @@ class RecommendationSystem:
         
         return reasons
     
+    def _generate_promotion_suggestions(self, product: pd.Series) -> List[str]:
+        """Generar sugerencias de promoción según stock y tendencia"""
+        stock_status = self._get_stock_status(product['stock_level'])
+        
+        if stock_status == "low":
+            suggestions = ["Destacar disponibilidad limitada", "Priorizar reposición antes de promocionar"]
+        elif stock_status == "medium":
+            suggestions = ["Promoción en redes sociales", "Bundle con productos complementarios"]
+        else:
+            suggestions = ["Descuento por volumen", "Promoción en canales principales"]
+        
+        if product['trend_score'] > 0.7:
+            suggestions.append("Campaña de producto en tendencia")
+        
+        return suggestions
+    
     def _get_stock_status(self, stock_level: int) -> str:
         """Determinar el estado del stock"""
         if stock_level < 20:
@@ -371,200 +896,52 @@ class RecommendationSystem:
         else:
             return "high"
     
-    def _create_volume_discount_strategy(self, data: pd.DataFrame, budget: float) -> PromotionStrategy:
-        """Crear estrategia de descuentos por volumen"""
-        # Seleccionar productos con alto stock
-        high_stock_products = data[data['stock_level'] > 50].copy()
-        
-        if high_stock_products.empty:
-            high_stock_products = data.head(5)
-        
-        discount_products = []
-        total_cost = 0
+    def _build_promotion_strategy(self, template: Dict[str, Any], data: pd.DataFrame,
+                                  selection: Dict[str, np.ndarray],
+                                  bundle_partners: Optional[Dict[str, Dict[str, Any]]] = None) -> PromotionStrategy:
+        """Crear el objeto de estrategia con los productos que el optimizador le asignó"""
+        products = data.iloc[selection['rows']]
+        total_cost = float(selection['costs'].sum())
+        total_return = float(selection['returns'].sum())
         
-        for _, product in high_stock_products.head(3).iterrows():
-            discount_amount = product['price'] * 0.15  # 15% de descuento
-            cost = discount_amount * 10  # Aplicar a 10 unidades
-            
-            if total_cost + cost <= budget * 0.3:  # Usar 30% del presupuesto
-                discount_products.append({
-                    'product_id': product['id'],
-                    'product_name': product['name'],
-                    'discount_percentage': 15,
-                    'units_affected': 10,
-                    'cost': cost
-                })
-                total_cost += cost
+        target_products = [
+            {
+                'product_id': product_id,
+                'product_name': name,
+                'discount_percentage': round(float(discount) * 100, 1),
+                'units_affected': int(units),
+                'cost': round(float(cost), 2),
+                'expected_revenue': round(float(expected), 2)
+            }
+            for product_id, name, discount, units, cost, expected in zip(
+                products['id'], products['name'], selection['discounts'],
+                selection['units'], selection['costs'], selection['returns']
+            )
+        ]
         
-        return PromotionStrategy(
-            strategy_id=f"vol_disc_{uuid.uuid4().hex[:8]}",
-            strategy_name="Descuentos por Volumen",
-            strategy_type="volume_discount",
-            description="Descuentos del 15% en compras de 10+ unidades",
-            target_products=discount_products,
-            estimated_cost=total_cost,
-            expected_revenue=total_cost * 1.8,  # 80% de ganancia
-            duration_days=14,
-            success_probability=0.75,
-            risk_level="low",
-            created_at=datetime.now().isoformat()
-        )
-    
-    def _create_bundle_strategy(self, data: pd.DataFrame, budget: float) -> PromotionStrategy:
-        """Crear estrategia de bundle de productos"""
-        # Agrupar productos por categoría
-        categories = data['category'].unique()
-        bundle_products = []
-        total_cost = 0
-        
-        for category in categories[:2]:  # Máximo 2 categorías
-            category_products = data[data['category'] == category].head(2)
-            
-            for _, product in category_products.iterrows():
-                bundle_discount = product['price'] * 0.20  # 20% de descuento en bundle
-                cost = bundle_discount * 5  # Aplicar a 5 bundles
-                
-                if total_cost + cost <= budget * 0.25:  # Usar 25% del presupuesto
-                    bundle_products.append({
-                        'product_id': product['id'],
-                        'product_name': product['name'],
-                        'discount_percentage': 20,
-                        'bundle_size': 2,
-                        'cost': cost
+        # Indicar con qué producto se arma cada bundle y la fuerza de la asociación
+        if template['id_prefix'] == 'bundle' and bundle_partners:
+            for target in target_products:
+                rule = bundle_partners.get(target['product_id'])
+                if rule:
+                    target.update({
+                        'bundle_with': rule['consequent'],
+                        'confidence': rule['confidence'],
+                        'lift': rule['lift']
                     })
-                    total_cost += cost
-        
-        return PromotionStrategy(
-            strategy_id=f"bundle_{uuid.uuid4().hex[:8]}",
-            strategy_name="Bundles de Productos",
-            strategy_type="product_bundle",
-            description="20% de descuento en compras de 2 productos de la misma categoría",
-            target_products=bundle_products,
-            estimated_cost=total_cost,
-            expected_revenue=total_cost * 2.0,  # 100% de ganancia
-            duration_days=21,
-            success_probability=0.70,
-            risk_level="medium",
-            created_at=datetime.now().isoformat()
-        )
-    
-    def _create_category_discount_strategy(self, data: pd.DataFrame, budget: float) -> PromotionStrategy:
-        """Crear estrategia de descuentos por categoría"""
-        # Encontrar categoría con más productos
-        category_counts = data['category'].value_counts()
-        target_category = category_counts.index[0]
-        
-        category_products = data[data['category'] == target_category]
-        discount_products = []
-        total_cost = 0
-        
-        for _, product in category_products.head(5).iterrows():
-            discount_amount = product['price'] * 0.10  # 10% de descuento
-            cost = discount_amount * 15  # Aplicar a 15 unidades
-            
-            if total_cost + cost <= budget * 0.25:  # Usar 25% del presupuesto
-                discount_products.append({
-                    'product_id': product['id'],
-                    'product_name': product['name'],
-                    'discount_percentage': 10,
-                    'units_affected': 15,
-                    'cost': cost
-                })
-                total_cost += cost
-        
-        return PromotionStrategy(
-            strategy_id=f"cat_disc_{uuid.uuid4().hex[:8]}",
-            strategy_name=f"Descuentos en {target_category.title()}",
-            strategy_type="category_discount",
-            description=f"10% de descuento en toda la categoría {target_category}",
-            target_products=discount_products,
-            estimated_cost=total_cost,
-            expected_revenue=total_cost * 1.6,  # 60% de ganancia
-            duration_days=10,
-            success_probability=0.80,
-            risk_level="low",
-            created_at=datetime.now().isoformat()
-        )
-    
-    def _create_trending_promotion_strategy(self, data: pd.DataFrame, budget: float) -> PromotionStrategy:
-        """Crear estrategia de promoción de productos en tendencia"""
-        # Seleccionar productos con alta tendencia
-        trending_products = data[data['trend_score'] > 0.7].copy()
-        
-        if trending_products.empty:
-            trending_products = data.nlargest(3, 'trend_score')
-        
-        discount_products = []
-        total_cost = 0
-        
-        for _, product in trending_products.head(3).iterrows():
-            discount_amount = product['price'] * 0.05  # 5% de descuento (productos ya populares)
-            cost = discount_amount * 20  # Aplicar a 20 unidades
-            
-            if total_cost + cost <= budget * 0.15:  # Usar 15% del presupuesto
-                discount_products.append({
-                    'product_id': product['id'],
-                    'product_name': product['name'],
-                    'discount_percentage': 5,
-                    'units_affected': 20,
-                    'cost': cost
-                })
-                total_cost += cost
-        
-        return PromotionStrategy(
-            strategy_id=f"trend_{uuid.uuid4().hex[:8]}",
-            strategy_name="Promoción de Productos en Tendencia",
-            strategy_type="trending_promotion",
-            description="5% de descuento en productos con alta tendencia",
-            target_products=discount_products,
-            estimated_cost=total_cost,
-            expected_revenue=total_cost * 1.4,  # 40% de ganancia
-            duration_days=7,
-            success_probability=0.85,
-            risk_level="very_low",
-            created_at=datetime.now().isoformat()
-        )
-    
-    def _create_clearance_strategy(self, data: pd.DataFrame, budget: float) -> PromotionStrategy:
-        """Crear estrategia de liquidación de inventario"""
-        # Seleccionar productos con bajo stock y baja tendencia
-        clearance_products = data[
-            (data['stock_level'] < 30) & 
-            (data['trend_score'] < 0.5)
-        ].copy()
-        
-        if clearance_products.empty:
-            clearance_products = data.nsmallest(3, 'stock_level')
-        
-        discount_products = []
-        total_cost = 0
-        
-        for _, product in clearance_products.head(3).iterrows():
-            discount_amount = product['price'] * 0.30  # 30% de descuento para liquidación
-            cost = discount_amount * product['stock_level']  # Aplicar a todo el stock
-            
-            if total_cost + cost <= budget * 0.05:  # Usar 5% del presupuesto
-                discount_products.append({
-                    'product_id': product['id'],
-                    'product_name': product['name'],
-                    'discount_percentage': 30,
-                    'units_affected': product['stock_level'],
-                    'cost': cost
-                })
-                total_cost += cost
         
         return PromotionStrategy(
-            strategy_id=f"clear_{uuid.uuid4().hex[:8]}",
-            strategy_name="Liquidación de Inventario",
-            strategy_type="clearance",
-            description="30% de descuento en productos con stock limitado",
-            target_products=discount_products,
-            estimated_cost=total_cost,
-            expected_revenue=total_cost * 1.2,  # 20% de ganancia
-            duration_days=5,
-            success_probability=0.90,
-            risk_level="very_low",
-            created_at=datetime.now().isoformat()
+            strategy_id=f"{template['id_prefix']}_{uuid.uuid4().hex[:8]}",
+            name=template['name'],
+            description=template['description'],
+            target_categories=sorted(products['category'].unique().tolist()),
+            budget_required=round(total_cost, 2),
+            expected_roi=round((total_return - total_cost) / total_cost * 100, 2) if total_cost else 0.0,
+            duration_days=template['duration_days'],
+            implementation_steps=template['implementation_steps'],
+            risk_level=template['risk_level'],
+            success_metrics=template['success_metrics'],
+            target_products=target_products
         )
     
     def _get_trending_products(self, data: pd.DataFrame, limit: int) -> List[Dict[str, Any]]:
@@ -5,39 +5,73 @@ Implementa procesamiento de lenguaje natural para analizar sentimientos en rese
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Dict, Any, Optional
+import hashlib
 import logging
 import re
-from textblob import TextBlob
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
+import threading
 import uuid
+from collections import OrderedDict
 
 from models.trend_models import SentimentAnalysis, SentimentScore
+from services.keyword_index import KeywordIndex
+from services.near_duplicates import NearDuplicateDetector
+from services.sentiment_series import SentimentTimeSeriesStore
+from utils.metrics import timed
+from utils.nlp_resources import NLPResources
 
 logger = logging.getLogger(__name__)
 
-# Descargar recursos de NLTK (solo una vez)
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
-
 class SentimentAnalyzer:
     """Analizador de sentimientos con NLP"""
     
+    # Días recientes comparados con el histórico para detectar la tendencia de un producto
+    trend_window_days = 7
+    
+    # Textos distintos cuyos tokens preprocesados se conservan para reindexar repeticiones
+    token_cache_size = 4096
+    
     def __init__(self):
-        self.stop_words = set(stopwords.words('spanish') + stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
-        self.sample_reviews = self._generate_sample_reviews()
-        
+        # Los recursos de NLTK/TextBlob se cargan en el primer uso (o en warm_up)
+        self.nlp = NLPResources()
+        self._keyword_index: Optional[KeywordIndex] = None
+        # Los handlers corren en varios hilos: la ingesta y la construcción perezosa del índice
+        # se serializan; la caché de tokens tiene su propio lock
+        self._ingest_lock = threading.RLock()
+        self._token_cache_lock = threading.Lock()
+        
+        # Agrupación de reseñas casi duplicadas (plantillas, bots) en la ingesta
+        self.duplicate_detector = NearDuplicateDetector()
+        self._token_cache: "OrderedDict[bytes, List[str]]" = OrderedDict()
+        self.sample_reviews = self._mark_duplicates(self._generate_sample_reviews())
+        
+        # Buckets diarios de sentimiento por producto, categoría y total (todas y únicas)
+        self.sentiment_series = SentimentTimeSeriesStore()
+        self.sentiment_series.build(self.sample_reviews)
+        self.unique_sentiment_series = SentimentTimeSeriesStore()
+        self.unique_sentiment_series.build(self.sample_reviews[~self.sample_reviews['is_duplicate']])
+        # Se incrementa con cada ingesta de reseñas; invalida respuestas cacheadas
+        self.data_version = 0
+        
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        """Índice invertido de reseñas, construido en el primer uso"""
+        if self._keyword_index is None:
+            with self._ingest_lock:
+                if self._keyword_index is None:
+                    index = KeywordIndex()
+                    self._index_reviews(index, self.sample_reviews)
+                    self._keyword_index = index
+        return self._keyword_index
+    
+    def warm_up(self) -> Dict[str, str]:
+        """Precargar recursos de NLP antes de atender tráfico"""
+        status = self.nlp.preload()
+        _ = self.keyword_index
+        logger.info(f"Recursos de NLP precargados: {status}")
+        return status
+    
     def _generate_sample_reviews(self) -> pd.DataFrame:
         """Generar reseñas de ejemplo para demostración"""
         np.random.seed(42)
@@ -137,13 +171,72 @@ class SentimentAnalyzer:
         
         return pd.DataFrame(reviews_data)
     
+    def _mark_duplicates(self, reviews: pd.DataFrame) -> pd.DataFrame:
+        """Asignar cada reseña a su clúster de casi duplicados dentro de su producto"""
+        clusters = [
+            self.duplicate_detector.add(review_id, text, scope=product_id)
+            for review_id, product_id, text in zip(reviews['review_id'], reviews['product_id'],
+                                                   reviews['review_text'])
+        ]
+        reviews['duplicate_cluster'] = [cluster_id for cluster_id, _ in clusters]
+        reviews['is_duplicate'] = [is_duplicate for _, is_duplicate in clusters]
+        return reviews
+    
+    def _index_reviews(self, index: KeywordIndex, reviews: pd.DataFrame):
+        """Preprocesar reseñas e incorporarlas al índice invertido"""
+        columns = ['review_id', 'product_id', 'category', 'review_date', 'review_text', 'is_duplicate']
+        for review in reviews[columns].itertuples(index=False):
+            index.add_review(review.review_id, review.product_id, review.category,
+                             review.review_date.date(), self._review_tokens(review.review_text),
+                             review.is_duplicate)
+    
+    def _review_tokens(self, text: str) -> List[str]:
+        """Tokens preprocesados de un texto; los textos idénticos se preprocesan una sola vez
+        
+        La clave es el texto exacto: los casi duplicados pueden diferir en palabras que
+        también deben indexarse.
+        """
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._token_cache_lock:
+            tokens = self._token_cache.get(key)
+            if tokens is not None:
+                self._token_cache.move_to_end(key)
+                return tokens
+        
+        tokens = self._preprocess_text(text).split()
+        with self._token_cache_lock:
+            self._token_cache[key] = tokens
+            if len(self._token_cache) > self.token_cache_size:
+                self._token_cache.popitem(last=False)
+        return tokens
+    
+    def add_reviews(self, reviews: List[Dict[str, Any]]):
+        """Ingerir nuevas reseñas actualizando el índice de forma incremental"""
+        new_reviews = pd.DataFrame(reviews)
+        new_reviews['review_date'] = pd.to_datetime(new_reviews['review_date'])
+        with self._ingest_lock:
+            new_reviews = self._mark_duplicates(new_reviews)
+            self.sample_reviews = pd.concat([self.sample_reviews, new_reviews], ignore_index=True)
+            
+            for review in new_reviews.itertuples(index=False):
+                self.sentiment_series.add(review.product_id, review.category, review.review_date,
+                                          review.sentiment_score, review.rating)
+                if not review.is_duplicate:
+                    self.unique_sentiment_series.add(review.product_id, review.category, review.review_date,
+                                                     review.sentiment_score, review.rating)
+            
+            if self._keyword_index is not None:
+                self._index_reviews(self._keyword_index, new_reviews)
+            self.data_version += 1
+    
     async def get_sentiment_metrics(self, product_id: Optional[str] = None, 
                                    category: Optional[str] = None, 
-                                   limit: int = 20) -> List[SentimentAnalysis]:
+                                   limit: int = 20,
+                                   deduplicate: bool = False) -> List[SentimentAnalysis]:
         """Obtener métricas de sentimiento"""
         try:
             # Filtrar datos según parámetros
-            data = self.sample_reviews.copy()
+            data = self.sample_reviews
             
             if product_id:
                 data = data[data['product_id'] == product_id]
@@ -151,24 +244,22 @@ class SentimentAnalyzer:
             if category:
                 data = data[data['category'] == category]
             
+            if deduplicate:
+                data = data[~data['is_duplicate']]
+            
             if data.empty:
                 raise ValueError("No hay datos disponibles para los filtros especificados")
             
             # Agrupar por producto si no se especifica uno
-            if not product_id:
-                sentiment_analyses = []
+            sentiment_analyses = []
+            for _, product_data in data.groupby('product_id', sort=False):
+                analysis = self._analyze_product_sentiment(product_data, deduplicate)
+                sentiment_analyses.append(analysis)
                 
-                for product_id in data['product_id'].unique()[:limit]:
-                    product_data = data[data['product_id'] == product_id]
-                    
-                    analysis = self._analyze_product_sentiment(product_data)
-                    sentiment_analyses.append(analysis)
-                
-                return sentiment_analyses
-            else:
-                # Análisis para un producto específico
-                analysis = self._analyze_product_sentiment(data)
-                return [analysis]
+                if len(sentiment_analyses) >= limit:
+                    break
+            
+            return sentiment_analyses
                 
         except Exception as e:
             logger.error(f"Error obteniendo métricas de sentimiento: {e}")
@@ -181,7 +272,7 @@ class SentimentAnalyzer:
             processed_text = self._preprocess_text(text)
             
             # Análisis con TextBlob
-            blob = TextBlob(processed_text)
+            blob = self.nlp.textblob(processed_text)
             sentiment_score = blob.sentiment.polarity
             
             # Análisis más detallado
@@ -203,28 +294,44 @@ class SentimentAnalyzer:
             logger.error(f"Error analizando sentimiento de texto: {e}")
             raise
     
-    async def get_sentiment_trends(self, days: int = 30, category: Optional[str] = None) -> Dict[str, Any]:
-        """Obtener tendencias de sentimiento en el tiempo"""
+    async def analyze_texts_sentiment(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Analizar sentimiento de un lote de textos"""
         try:
-            data = self.sample_reviews.copy()
+            # Los textos repetidos dentro del lote se analizan una sola vez
+            unique_results = {}
+            for text in texts:
+                if text not in unique_results:
+                    unique_results[text] = await self.analyze_text_sentiment(text)
             
-            if category:
-                data = data[data['category'] == category]
+            return [dict(unique_results[text]) for text in texts]
             
-            # Filtrar por fecha
+        except Exception as e:
+            logger.error(f"Error analizando lote de textos: {e}")
+            raise
+    
+    async def get_sentiment_trends(self, days: int = 30, category: Optional[str] = None,
+                                   deduplicate: bool = False) -> Dict[str, Any]:
+        """Obtener tendencias de sentimiento en el tiempo"""
+        try:
+            store = self._series_store(deduplicate)
+            series = store.get(('category', category) if category else ('all', None))
+            
+            # Rango de fechas consultado sobre los buckets diarios
             cutoff_date = datetime.now() - timedelta(days=days)
-            data = data[data['review_date'] >= cutoff_date]
+            start, end = cutoff_date.date(), datetime.now().date()
+            totals = series.range_stats(start, end) if series else {'review_count': 0}
             
-            if data.empty:
+            if totals['review_count'] == 0:
                 raise ValueError("No hay datos disponibles para el período especificado")
             
-            # Agrupar por fecha y calcular sentimiento promedio
-            daily_sentiment = data.groupby(data['review_date'].dt.date).agg({
-                'sentiment_score': ['mean', 'count'],
-                'rating': 'mean'
-            }).reset_index()
-            
-            daily_sentiment.columns = ['date', 'avg_sentiment', 'review_count', 'avg_rating']
+            # Sentimiento promedio diario a partir de los buckets
+            bucket_days, buckets = series.buckets(start, end)
+            daily_sentiment = pd.DataFrame({
+                'date': [date.fromordinal(int(day)) for day in bucket_days],
+                'avg_sentiment': buckets['sentiment_sum'] / buckets['review_count'],
+                'review_count': buckets['review_count'].astype(int),
+                'avg_rating': buckets['rating_sum'] / buckets['review_count']
+            })
             
             # Calcular tendencia
             sentiment_trend = self._calculate_sentiment_trend(daily_sentiment['avg_sentiment'].values)
@@ -232,23 +339,27 @@ class SentimentAnalyzer:
             # Análisis por categoría
             category_sentiment = {}
             if not category:
-                for cat in data['category'].unique():
-                    cat_data = data[data['category'] == cat]
-                    category_sentiment[cat] = {
-                        'avg_sentiment': round(cat_data['sentiment_score'].mean(), 3),
-                        'review_count': len(cat_data),
-                        'positive_percentage': round(len(cat_data[cat_data['sentiment_score'] > 0.1]) / len(cat_data) * 100, 1),
-                        'negative_percentage': round(len(cat_data[cat_data['sentiment_score'] < -0.1]) / len(cat_data) * 100, 1)
+                for key in store.keys('category'):
+                    cat_stats = store.get(key).range_stats(start, end)
+                    cat_count = cat_stats['review_count']
+                    if cat_count == 0:
+                        continue
+                    category_sentiment[key[1]] = {
+                        'avg_sentiment': round(cat_stats['sentiment_sum'] / cat_count, 3),
+                        'review_count': int(cat_count),
+                        'positive_percentage': round(cat_stats['positive_count'] / cat_count * 100, 1),
+                        'negative_percentage': round(cat_stats['negative_count'] / cat_count * 100, 1)
                     }
             
             return {
                 'period_days': days,
-                'total_reviews': len(data),
-                'overall_sentiment': round(data['sentiment_score'].mean(), 3),
+                'total_reviews': int(totals['review_count']),
+                'overall_sentiment': round(totals['sentiment_sum'] / totals['review_count'], 3),
                 'sentiment_trend': sentiment_trend,
                 'daily_data': daily_sentiment.to_dict('records'),
                 'category_breakdown': category_sentiment,
-                'top_keywords': self._extract_top_keywords(data['review_text'].tolist()),
+                'top_keywords': self._extract_top_keywords(category=category, start=start, unique=deduplicate),
+                'duplicates_excluded': deduplicate,
                 'generated_at': datetime.now().isoformat()
             }
             
@@ -256,15 +367,108 @@ class SentimentAnalyzer:
             logger.error(f"Error obteniendo tendencias de sentimiento: {e}")
             raise
     
-    def _analyze_product_sentiment(self, product_data: pd.DataFrame) -> SentimentAnalysis:
+    async def get_sentiment_window(self, start_date: str, end_date: str,
+                                   product_id: Optional[str] = None,
+                                   category: Optional[str] = None,
+                                   deduplicate: bool = False) -> Dict[str, Any]:
+        """Obtener el sentimiento agregado de un rango de fechas arbitrario"""
+        try:
+            if product_id:
+                key = ('product', product_id)
+            elif category:
+                key = ('category', category)
+            else:
+                key = ('all', None)
+            
+            series = self._series_store(deduplicate).get(key)
+            if series is None:
+                raise ValueError("No hay datos disponibles para los filtros especificados")
+            
+            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
+            stats = series.range_stats(start, end)
+            count = stats['review_count']
+            
+            return {
+                'start_date': start_date,
+                'end_date': end_date,
+                'product_id': product_id,
+                'category': category,
+                'total_reviews': int(count),
+                'avg_sentiment': round(stats['sentiment_sum'] / count, 3) if count else None,
+                'avg_rating': round(stats['rating_sum'] / count, 2) if count else None,
+                'positive_reviews': int(stats['positive_count']),
+                'negative_reviews': int(stats['negative_count'])
+            }
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo sentimiento por rango: {e}")
+            raise
+    
+    async def get_keyword_trends(self, keyword: str, product_id: Optional[str] = None,
+                                 category: Optional[str] = None) -> Dict[str, Any]:
+        """Obtener la evolución diaria de una palabra clave"""
+        try:
+            term = self._normalize_keyword(keyword)
+            index = self.keyword_index
+            with self._ingest_lock:
+                daily = index.term_over_time(term, product_id, category)
+            
+            return {
+                'keyword': keyword,
+                'term': term,
+                'total_mentions': sum(freq for _, freq in daily),
+                'daily_data': [{'date': day.isoformat(), 'frequency': freq} for day, freq in daily],
+                'generated_at': datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo tendencia de palabra clave: {e}")
+            raise
+    
+    async def search_reviews(self, keyword: str, product_id: Optional[str] = None,
+                             category: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Buscar reseñas que mencionan una palabra clave"""
+        try:
+            term = self._normalize_keyword(keyword)
+            index = self.keyword_index
+            with self._ingest_lock:
+                review_ids = index.reviews_mentioning(term, product_id, category, limit)
+            
+            if not review_ids:
+                return []
+            
+            matches = self.sample_reviews[self.sample_reviews['review_id'].isin(review_ids)]
+            matches = matches.set_index('review_id').loc[review_ids].reset_index()
+            matches['review_date'] = matches['review_date'].dt.strftime('%Y-%m-%d')
+            return matches[['review_id', 'product_id', 'category', 'review_text',
+                            'sentiment_score', 'rating', 'review_date']].to_dict('records')
+            
+        except Exception as e:
+            logger.error(f"Error buscando reseñas: {e}")
+            raise
+    
+    def _series_store(self, deduplicate: bool) -> SentimentTimeSeriesStore:
+        """Series con todas las reseñas o solo con un representante por clúster de duplicados"""
+        return self.unique_sentiment_series if deduplicate else self.sentiment_series
+    
+    def _normalize_keyword(self, keyword: str) -> str:
+        """Llevar una palabra de consulta a la forma en que se indexa"""
+        tokens = self._preprocess_text(keyword).split()
+        return tokens[0] if tokens else keyword.lower()
+    
+    def _analyze_product_sentiment(self, product_data: pd.DataFrame,
+                                   deduplicate: bool = False) -> SentimentAnalysis:
         """Analizar sentimiento de un producto específico"""
-        sentiment_scores = product_data['sentiment_score'].values
-        total_reviews = len(product_data)
-        
-        # Calcular métricas
-        avg_sentiment = np.mean(sentiment_scores)
-        positive_reviews = len(sentiment_scores[sentiment_scores > 0.1])
-        negative_reviews = len(sentiment_scores[sentiment_scores < -0.1])
+        product_info = product_data.iloc[0]
+        series = self._series_store(deduplicate).get(('product', product_info['product_id']))
+        
+        # Calcular métricas desde la serie diaria del producto
+        stats = series.range_stats()
+        total_reviews = int(stats['review_count'])
+        avg_sentiment = stats['sentiment_sum'] / total_reviews
+        positive_reviews = int(stats['positive_count'])
+        negative_reviews = int(stats['negative_count'])
         neutral_reviews = total_reviews - positive_reviews - negative_reviews
         
         # Determinar sentimiento general
@@ -279,25 +483,21 @@ class SentimentAnalyzer:
         all_text = ' '.join(product_data['review_text'].tolist())
         common_keywords = self._extract_key_phrases(all_text)
         
-        # Determinar tendencia del sentimiento
-        if len(sentiment_scores) >= 7:
-            recent_scores = sentiment_scores[-7:]  # Últimos 7 días
-            older_scores = sentiment_scores[:-7] if len(sentiment_scores) > 7 else sentiment_scores
-            
-            recent_avg = np.mean(recent_scores)
-            older_avg = np.mean(older_scores)
-            
-            if recent_avg > older_avg + 0.1:
-                sentiment_trend = "rising"
-            elif recent_avg < older_avg - 0.1:
-                sentiment_trend = "falling"
-            else:
-                sentiment_trend = "stable"
+        # Determinar tendencia del sentimiento: últimos días frente al histórico anterior
+        last_day = series.last_day
+        window_start = last_day - timedelta(days=self.trend_window_days - 1)
+        recent_avg = series.average(window_start, last_day)
+        older_avg = series.average(end=window_start - timedelta(days=1))
+        
+        if recent_avg is None or older_avg is None:
+            sentiment_trend = "stable"
+        elif recent_avg > older_avg + 0.1:
+            sentiment_trend = "rising"
+        elif recent_avg < older_avg - 0.1:
+            sentiment_trend = "falling"
         else:
             sentiment_trend = "stable"
         
-        product_info = product_data.iloc[0]
-        
         return SentimentAnalysis(
             product_id=product_info['product_id'],
             category=product_info['category'],
@@ -312,6 +512,7 @@ class SentimentAnalyzer:
             last_updated=datetime.now()
         )
     
+    @timed("SentimentAnalyzer._preprocess_text")
     def _preprocess_text(self, text: str) -> str:
         """Preprocesar texto para análisis de sentimientos"""
         # Convertir a minúsculas
@@ -320,15 +521,16 @@ class SentimentAnalyzer:
         # Remover caracteres especiales pero mantener acentos
         text = re.sub(r'[^a-zA-ZáéíóúñÁÉÍÓÚÑ\s]', ' ', text)
         
-        # Tokenizar
-        tokens = word_tokenize(text)
+        # Tokenizar (tras la limpieza solo quedan letras y espacios)
+        tokens = text.split()
         
         # Remover stop words y lematizar
+        stop_words = self.nlp.stop_words
+        lemmatize = self.nlp.lemmatize
         processed_tokens = []
         for token in tokens:
-            if token not in self.stop_words and len(token) > 2:
-                lemmatized = self.lemmatizer.lemmatize(token)
-                processed_tokens.append(lemmatized)
+            if token not in stop_words and len(token) > 2:
+                processed_tokens.append(lemmatize(token))
         
         return ' '.join(processed_tokens)
     
@@ -422,26 +624,20 @@ class SentimentAnalyzer:
         else:
             return "stable"
     
-    def _extract_top_keywords(self, texts: List[str]) -> List[Dict[str, Any]]:
-        """Extraer palabras clave más frecuentes"""
-        # Combinar todos los textos
-        all_text = ' '.join(texts)
-        processed_text = self._preprocess_text(all_text)
-        
-        # Contar frecuencia de palabras
-        words = processed_text.split()
-        word_freq = {}
-        
-        for word in words:
-            if len(word) > 3:  # Solo palabras de más de 3 caracteres
-                word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # Ordenar por frecuencia
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+    def _extract_top_keywords(self, category: Optional[str] = None, start=None,
+                              product_id: Optional[str] = None,
+                              unique: bool = False) -> List[Dict[str, Any]]:
+        """Extraer palabras clave más frecuentes desde el índice invertido"""
+        # Solo se cuentan palabras de más de 3 caracteres (ver KeywordIndex.min_term_length)
+        index = self.keyword_index
+        with self._ingest_lock:
+            sorted_words, total_words = index.top_keywords(
+                10, product_id=product_id, category=category, start=start, unique=unique
+            )
         
         # Retornar top 10 con información adicional
         top_keywords = []
-        for word, freq in sorted_words[:10]:
+        for word, freq in sorted_words:
             # Determinar sentimiento de la palabra
             sentiment = self._analyze_word_sentiment(word)
             
@@ -449,7 +645,7 @@ class SentimentAnalyzer:
                 'word': word,
                 'frequency': freq,
                 'sentiment': sentiment,
-                'percentage': round(freq / len(words) * 100, 2)
+                'percentage': round(freq / total_words * 100, 2) if total_words else 0.0
             })
         
         return top_keywords
@@ -0,0 +1,166 @@
+"""
+Series Temporales de Sentimiento
+Buckets diarios ordenados por fecha con sumas acumuladas para consultas por rango en O(log n)
+"""
+
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Umbrales usados en todo el servicio para clasificar reseñas
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+# Ordinal de 1970-01-01, para convertir datetime64[D] a date.toordinal() sin bucles
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Métricas acumuladas por bucket diario
+BUCKET_FIELDS = ('sentiment_sum', 'review_count', 'rating_sum', 'positive_count', 'negative_count')
+
+
+class SentimentSeries:
+    """Serie diaria de sentimiento de un producto, categoría o del total"""
+
+    def __init__(self, days: Optional[np.ndarray] = None, values: Optional[Dict[str, np.ndarray]] = None):
+        # Días como ordinales (date.toordinal) en orden creciente
+        self.days = days if days is not None else np.empty(0, dtype=np.int64)
+        self.values = values if values is not None else {
+            field: np.empty(0, dtype=np.float64) for field in BUCKET_FIELDS
+        }
+        self._pending: Dict[int, np.ndarray] = {}
+        self._cumulative: Dict[str, np.ndarray] = {}
+        # Ingesta y consultas llegan desde varios hilos; compactar reemplaza los tres arrays
+        self._lock = threading.Lock()
+        self._rebuild_cumulative()
+
+    def __len__(self) -> int:
+        days, _, _ = self._snapshot()
+        return len(days)
+
+    def add(self, day: date, sentiment: float, rating: float):
+        """Añadir una reseña; se integra en los buckets en la siguiente consulta"""
+        with self._lock:
+            bucket = self._pending.setdefault(day.toordinal(), np.zeros(len(BUCKET_FIELDS)))
+            bucket += (
+                sentiment, 1.0, rating,
+                1.0 if sentiment > POSITIVE_THRESHOLD else 0.0,
+                1.0 if sentiment < NEGATIVE_THRESHOLD else 0.0
+            )
+
+    def range_stats(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, float]:
+        """Totales de un rango de fechas (ambos extremos incluidos) en O(log n)"""
+        days, _, cumulative = self._snapshot()
+        lo, hi = self._bounds(days, start, end)
+        return {
+            field: float(cumulative[field][hi] - cumulative[field][lo])
+            for field in BUCKET_FIELDS
+        }
+
+    def average(self, start: Optional[date] = None, end: Optional[date] = None) -> Optional[float]:
+        """Sentimiento promedio de un rango, o None si no hay reseñas"""
+        stats = self.range_stats(start, end)
+        if stats['review_count'] == 0:
+            return None
+        return stats['sentiment_sum'] / stats['review_count']
+
+    def buckets(self, start: Optional[date] = None, end: Optional[date] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Buckets diarios de un rango (vistas, sin copiar)"""
+        days, values, _ = self._snapshot()
+        lo, hi = self._bounds(days, start, end)
+        return days[lo:hi], {field: values[field][lo:hi] for field in BUCKET_FIELDS}
+
+    @property
+    def last_day(self) -> Optional[date]:
+        days, _, _ = self._snapshot()
+        return date.fromordinal(int(days[-1])) if len(days) else None
+
+    @staticmethod
+    def _bounds(days: np.ndarray, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        lo = int(np.searchsorted(days, start.toordinal(), side='left')) if start else 0
+        hi = int(np.searchsorted(days, end.toordinal(), side='right')) if end else len(days)
+        return lo, max(lo, hi)
+
+    def _snapshot(self) -> Tuple[np.ndarray, Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """Días, valores y acumulados coherentes entre sí, con lo pendiente ya integrado"""
+        with self._lock:
+            self._compact()
+            return self.days, self.values, self._cumulative
+
+    def _compact(self):
+        """Integrar las reseñas pendientes manteniendo el orden por fecha (con el lock tomado)"""
+        if not self._pending:
+            return
+
+        pending_days = np.fromiter(self._pending.keys(), dtype=np.int64, count=len(self._pending))
+        pending_values = np.vstack(list(self._pending.values()))
+        self._pending = {}
+
+        all_days = np.concatenate([self.days, pending_days])
+        order = np.argsort(all_days, kind='stable')
+        all_days = all_days[order]
+        unique_days, starts = np.unique(all_days, return_index=True)
+
+        values = {}
+        for i, field in enumerate(BUCKET_FIELDS):
+            merged = np.concatenate([self.values[field], pending_values[:, i]])[order]
+            values[field] = np.add.reduceat(merged, starts)
+
+        self.days = unique_days
+        self.values = values
+        self._rebuild_cumulative()
+
+    def _rebuild_cumulative(self):
+        self._cumulative = {
+            field: np.concatenate([[0.0], np.cumsum(self.values[field])])
+            for field in BUCKET_FIELDS
+        }
+
+
+class SentimentTimeSeriesStore:
+    """Colección de series diarias indexadas por ámbito: ('product', id), ('category', c) o ('all', None)"""
+
+    def __init__(self):
+        self.series: Dict[Hashable, SentimentSeries] = defaultdict(SentimentSeries)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[SentimentSeries]:
+        return self.series.get(key)
+
+    def keys(self, kind: str) -> Iterable[Hashable]:
+        with self._lock:
+            return [key for key in self.series if key[0] == kind]
+
+    def add(self, product_id: str, category: str, review_date, sentiment: float, rating: float):
+        """Registrar una reseña en todas las series a las que pertenece"""
+        day = review_date.date() if hasattr(review_date, 'date') else review_date
+        for key in (('product', product_id), ('category', category), ('all', None)):
+            with self._lock:
+                series = self.series[key]
+            series.add(day, sentiment, rating)
+
+    def build(self, reviews: pd.DataFrame):
+        """Construir todas las series a partir de un DataFrame de reseñas en una sola pasada"""
+        frame = pd.DataFrame({
+            'product_id': reviews['product_id'].values,
+            'category': reviews['category'].values,
+            'day': reviews['review_date'].values.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL,
+            'sentiment_sum': reviews['sentiment_score'].values,
+            'review_count': 1.0,
+            'rating_sum': reviews['rating'].values.astype(float),
+            'positive_count': (reviews['sentiment_score'].values > POSITIVE_THRESHOLD).astype(float),
+            'negative_count': (reviews['sentiment_score'].values < NEGATIVE_THRESHOLD).astype(float),
+        })
+        frame['all'] = 'all'
+
+        for kind, column in (('product', 'product_id'), ('category', 'category'), ('all', 'all')):
+            grouped = frame.groupby([column, 'day'], sort=True)[list(BUCKET_FIELDS)].sum()
+            for scope, buckets in grouped.groupby(level=0, sort=False):
+                key = (kind, None if kind == 'all' else scope)
+                self.series[key] = SentimentSeries(
+                    days=buckets.index.get_level_values('day').to_numpy(dtype=np.int64),
+                    values={field: buckets[field].to_numpy(dtype=np.float64) for field in BUCKET_FIELDS}
+                )
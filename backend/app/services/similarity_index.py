@@ -0,0 +1,203 @@
+"""
+Índice de Productos Similares
+Matriz TF-IDF dispersa normalizada y lista precalculada de vecinos por producto
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import KMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from services.ann_index import IVFIndex
+
+
+class SimilarityIndex:
+    """Vecinos por similitud de contenido con actualización incremental"""
+
+    def __init__(self, vectorizer: TfidfVectorizer, n_neighbors: int = 10,
+                 block_size: int = 1024, refit_ratio: float = 0.2,
+                 clustering_model: Optional[KMeans] = None, ann_threshold: int = 5000,
+                 n_components: int = 128, n_probe: int = 8):
+        self.vectorizer = vectorizer
+        self.n_neighbors = n_neighbors
+        self.block_size = block_size
+        # Fracción del catálogo modificada que fuerza reajustar el vocabulario y el IDF
+        self.refit_ratio = refit_ratio
+
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.documents: List[str] = []
+        self.matrix = sparse.csr_matrix((0, 0))
+
+        # Posiciones y similitudes de los vecinos de cada fila (-1 = hueco sin vecino)
+        self.neighbor_positions = np.empty((0, n_neighbors), dtype=np.int64)
+        self.neighbor_scores = np.empty((0, n_neighbors), dtype=np.float64)
+
+        # Con catálogos grandes un índice IVF sobre embeddings SVD elige las particiones
+        # a explorar y solo sus productos se puntúan con la similitud TF-IDF exacta
+        self.clustering_model = clustering_model
+        self.ann_threshold = ann_threshold
+        self.n_components = n_components
+        self.n_probe = n_probe
+        self.svd: Optional[TruncatedSVD] = None
+        self.ann: Optional[IVFIndex] = None
+
+        self._updates_since_fit = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def fit(self, product_ids: Sequence[str], documents: Sequence[str], precompute_neighbors: bool = True):
+        """Ajustar TF-IDF y calcular los vecinos de todo el catálogo
+
+        Sin precompute_neighbors solo se construyen la matriz y el índice IVF: query funciona,
+        neighbors no (útil para medir la búsqueda sobre catálogos grandes).
+        """
+        self.ids = list(product_ids)
+        self.positions = {product_id: i for i, product_id in enumerate(self.ids)}
+        self.documents = list(documents)
+        self.matrix = self.vectorizer.fit_transform(self.documents).tocsr()
+        self._updates_since_fit = 0
+        self._build_ann()
+
+        n = len(self.ids)
+        self.neighbor_positions = np.full((n, self.n_neighbors), -1, dtype=np.int64)
+        self.neighbor_scores = np.zeros((n, self.n_neighbors))
+        if precompute_neighbors:
+            self._recompute_rows(np.arange(n))
+
+    def upsert(self, product_ids: Sequence[str], documents: Sequence[str]):
+        """Añadir o actualizar productos recalculando solo las listas afectadas"""
+        if not self.ids or self._updates_since_fit + len(product_ids) > self.refit_ratio * len(self.ids):
+            merged = dict(zip(self.ids, self.documents))
+            merged.update(zip(product_ids, documents))
+            self.fit(list(merged.keys()), list(merged.values()))
+            return
+
+        changed = []
+        new_rows = []
+        for product_id, document in zip(product_ids, documents):
+            if product_id in self.positions:
+                self.documents[self.positions[product_id]] = document
+            else:
+                self.positions[product_id] = len(self.ids)
+                self.ids.append(product_id)
+                self.documents.append(document)
+                new_rows.append(self.positions[product_id])
+            changed.append(self.positions[product_id])
+        changed = np.unique(changed)
+        self._updates_since_fit += len(changed)
+
+        # Vectorizar con el vocabulario vigente y reemplazar las filas modificadas
+        if new_rows:
+            padding = sparse.csr_matrix((len(new_rows), self.matrix.shape[1]))
+            self.matrix = sparse.vstack([self.matrix, padding]).tocsr()
+            self.neighbor_positions = np.vstack([
+                self.neighbor_positions, np.full((len(new_rows), self.n_neighbors), -1, dtype=np.int64)
+            ])
+            self.neighbor_scores = np.vstack([self.neighbor_scores, np.zeros((len(new_rows), self.n_neighbors))])
+
+        lil = self.matrix.tolil()
+        lil[changed] = self.vectorizer.transform([self.documents[i] for i in changed])
+        self.matrix = lil.tocsr()
+        if self.ann is not None:
+            self.ann.update(changed, self.svd.transform(self.matrix[changed]))
+
+        # Otras filas cambian si un producto modificado estaba en su lista o ahora la supera
+        similarities = cosine_similarity(self.matrix[changed], self.matrix)
+        kth_scores = np.where(self.neighbor_positions[:, -1] >= 0, self.neighbor_scores[:, -1], 0.0)
+        affected = np.isin(self.neighbor_positions, changed).any(axis=1)
+        affected |= (similarities > kth_scores).any(axis=0)
+        affected[changed] = True
+
+        self._recompute_rows(np.flatnonzero(affected))
+
+    def neighbors(self, product_id: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Vecinos precalculados de un producto, del más al menos similar"""
+        position = self.positions[product_id]
+        result = []
+        for neighbor, score in zip(self.neighbor_positions[position, :limit],
+                                   self.neighbor_scores[position, :limit]):
+            if neighbor < 0:
+                break
+            result.append((self.ids[neighbor], float(score)))
+        return result
+
+    def query(self, product_id: str, k: int, n_probe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Buscar en el momento los k productos más similares, sin limitarse a la lista precalculada"""
+        position = self.positions[product_id]
+        candidates, scores = self._candidates(position, k, n_probe)
+        return [(self.ids[i], float(score)) for i, score in zip(candidates, scores) if score > 0]
+
+    def _build_ann(self):
+        """Crear el índice IVF si el catálogo supera el umbral de búsqueda exacta"""
+        n, n_features = self.matrix.shape
+        if self.clustering_model is None or n < self.ann_threshold or n_features < 2:
+            self.svd, self.ann = None, None
+            return
+
+        self.svd = TruncatedSVD(n_components=min(self.n_components, n_features - 1), random_state=42)
+        embeddings = self.svd.fit_transform(self.matrix)
+        self.ann = IVFIndex(self.clustering_model, n_probe=self.n_probe)
+        self.ann.build(embeddings)
+
+    def _candidates(self, position: int, k: int, n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Vecinos de una fila: aproximados con el índice IVF o exactos sin él"""
+        if self.ann is None:
+            similarities = cosine_similarity(self.matrix[position], self.matrix)[0]
+            similarities[position] = -np.inf
+            k = min(k, len(similarities) - 1)
+            if k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top], kind='stable')]
+            return top, similarities[top]
+
+        # Puntuar con TF-IDF exacto solo los productos de las particiones más cercanas;
+        # las filas ya están normalizadas (L2) y el producto escalar es el coseno
+        pool = self.ann.probe(self.ann.vectors[position], n_probe=n_probe, exclude=position)
+        exact = (self.matrix[pool] @ self.matrix[position].T).toarray().ravel()
+        k = min(k, len(pool))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        top = np.argpartition(-exact, k - 1)[:k]
+        top = top[np.argsort(-exact[top], kind='stable')]
+        return pool[top], exact[top]
+
+    def _recompute_rows(self, rows: Iterable[int]):
+        """Recalcular por bloques las listas de vecinos de las filas indicadas"""
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(self.ids)
+        k = min(self.n_neighbors, n - 1)
+        if k <= 0:
+            return
+
+        if self.ann is not None:
+            for row in rows:
+                candidates, scores = self._candidates(row, k)
+                keep = scores > 0
+                self.neighbor_positions[row] = -1
+                self.neighbor_scores[row] = 0.0
+                self.neighbor_positions[row, :keep.sum()] = candidates[keep]
+                self.neighbor_scores[row, :keep.sum()] = scores[keep]
+            return
+
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            similarities = cosine_similarity(self.matrix[block], self.matrix)
+            similarities[np.arange(len(block)), block] = -np.inf  # Excluir el propio producto
+
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            # Productos sin términos en común no cuentan como vecinos
+            self.neighbor_positions[block, :k] = np.where(top_scores > 0, top, -1)
+            self.neighbor_scores[block, :k] = np.where(top_scores > 0, top_scores, 0.0)
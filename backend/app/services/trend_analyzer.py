@@ -21,17 +21,21 @@ from models.trend_models import (
     TrendDirection,
     SalesMetrics
 )
+from services.feature_store import ProductFeatureStore
+from utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
 class TrendAnalyzer:
     """Analizador de tendencias con algoritmos de IA"""
     
-    def __init__(self):
+    def __init__(self, feature_store: Optional[ProductFeatureStore] = None):
         self.scaler = StandardScaler()
         self.trend_model = RandomForestRegressor(n_estimators=100, random_state=42)
         self.clustering_model = KMeans(n_clusters=5, random_state=42)
         self.sample_data = self._generate_sample_data()
+        # Las puntuaciones calculadas se publican aquí para el resto de servicios
+        self.feature_store = feature_store
         
     def _generate_sample_data(self) -> pd.DataFrame:
         """Generar datos de ejemplo para demostración"""
@@ -88,7 +92,7 @@ class TrendAnalyzer:
                 
                 data.append({
                     'date': date,
-                    'product_id': f'prod_{i:03d}',
+                    'product_id': f'prod_{i + 1:03d}',
                     'product_name': product,
                     'category': category,
                     'sales': max(0, sales),
@@ -147,6 +151,13 @@ class TrendAnalyzer:
                     'last_updated': datetime.now().isoformat()
                 })
             
+            if self.feature_store is not None and trends:
+                self.feature_store.write(
+                    'trend_score',
+                    [trend['product_id'] for trend in trends],
+                    [trend['trend_score'] / 100 for trend in trends]
+                )
+            
             # Ordenar por puntuación de tendencia y limitar resultados
             trends.sort(key=lambda x: x['trend_score'], reverse=True)
             return trends[:limit]
@@ -155,6 +166,10 @@ class TrendAnalyzer:
             logger.error(f"Error obteniendo tendencias actuales: {e}")
             raise
     
+    async def refresh_features(self):
+        """Recalcular las tendencias de todos los productos y publicarlas en el almacén de features"""
+        await self.get_current_trends(limit=self.sample_data['product_id'].nunique())
+    
     async def analyze_custom_trends(self, request: TrendAnalysisRequest) -> TrendAnalysisResponse:
         """Análisis personalizado de tendencias"""
         try:
@@ -230,19 +245,7 @@ class TrendAnalyzer:
                                category: Optional[str] = None) -> SalesMetrics:
         """Obtener métricas de ventas"""
         try:
-            data = self.sample_data.copy()
-            
-            # Aplicar filtros
-            if start_date:
-                start = datetime.strptime(start_date, "%Y-%m-%d")
-                data = data[data['date'] >= start]
-            
-            if end_date:
-                end = datetime.strptime(end_date, "%Y-%m-%d")
-                data = data[data['date'] <= end]
-            
-            if category:
-                data = data[data['category'] == category]
+            data = self._filter_sales(start_date, end_date, category)
             
             if data.empty:
                 raise ValueError("No hay datos disponibles para los filtros especificados")
@@ -308,6 +311,38 @@ class TrendAnalyzer:
             logger.error(f"Error obteniendo métricas de ventas: {e}")
             raise
     
+    def _filter_sales(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                      category: Optional[str] = None) -> pd.DataFrame:
+        """Filas de ventas diarias dentro del rango de fechas y la categoría indicados"""
+        mask = np.ones(len(self.sample_data), dtype=bool)
+        if start_date:
+            mask &= (self.sample_data['date'] >= datetime.strptime(start_date, "%Y-%m-%d")).to_numpy()
+        if end_date:
+            mask &= (self.sample_data['date'] <= datetime.strptime(end_date, "%Y-%m-%d")).to_numpy()
+        if category:
+            mask &= (self.sample_data['category'] == category).to_numpy()
+        return self.sample_data[mask]
+    
+    async def get_sales_series(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                               category: Optional[str] = None) -> pd.DataFrame:
+        """Serie diaria de ventas por producto, en forma de tabla para exportación masiva"""
+        return self._filter_sales(start_date, end_date, category).reset_index(drop=True)
+    
+    async def get_trends_report_frame(self, include_predictions: bool = True, days_ahead: int = 30) -> pd.DataFrame:
+        """Tabla del reporte de tendencias: una fila por producto con sus métricas y predicción"""
+        trends = await self.get_current_trends(limit=self.sample_data['product_id'].nunique())
+        frame = pd.DataFrame(trends)
+        if frame.empty:
+            return frame
+        frame['current_trend'] = [TrendDirection(direction).value for direction in frame['current_trend']]
+        
+        if include_predictions:
+            predictions = pd.DataFrame(await self._generate_predictions(self.sample_data, days_ahead))
+            if not predictions.empty:
+                predictions = predictions[['product_id', 'predicted_growth', 'confidence_level', 'predicted_sales']]
+                frame = frame.merge(predictions, on='product_id', how='left')
+        return frame
+    
     async def generate_trends_report(self, format: str = "json", include_predictions: bool = True) -> Dict[str, Any]:
         """Generar reporte completo de tendencias"""
         try:
@@ -423,6 +458,7 @@ class TrendAnalyzer:
             logger.error(f"Error generando reporte de competencia: {e}")
             raise
     
+    @timed("TrendAnalyzer._calculate_trend")
     def _calculate_trend(self, values: np.ndarray) -> float:
         """Calcular tendencia usando regresión lineal"""
         if len(values) < 2:
@@ -0,0 +1,108 @@
+"""
+Memoización de resultados en memoria
+Entradas con TTL, invalidación por versión de datos y un lock por clave para que
+peticiones concurrentes idénticas esperen al primer cálculo en vez de repetirlo
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Caché LRU con caducidad por entrada y protección contra estampidas"""
+
+    def __init__(self, name: str, ttl_seconds: float = 300.0, max_entries: int = 1024):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version: Optional[Hashable] = None
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._expirations = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                             version: Optional[Hashable] = None) -> Any:
+        """Valor cacheado de key o, si no hay uno vigente, el resultado de compute()"""
+        if version != self.version:
+            # Los datos cambiaron: ninguna entrada anterior es válida
+            self.invalidate()
+            self.version = version
+
+        found, value = self._lookup(key)
+        if found:
+            self._hits += 1
+            return value
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        waited = lock.locked()
+        try:
+            async with lock:
+                # Quien esperaba el lock encuentra el valor que calculó el primero
+                found, value = self._lookup(key)
+                if found:
+                    self._coalesced += 1
+                    return value
+
+                self._misses += 1
+                value = await compute()
+                if self.version == version:
+                    self._store(key, value)
+                return value
+        finally:
+            if not waited and not lock.locked() and self._locks.get(key) is lock:
+                del self._locks[key]
+
+    def invalidate(self):
+        """Descartar todas las entradas"""
+        if self._entries:
+            self._invalidations += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._coalesced + self._misses
+        return {
+            'name': self.name,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'version': self.version,
+            'hits': self._hits,
+            'coalesced': self._coalesced,
+            'misses': self._misses,
+            'hit_rate': round((self._hits + self._coalesced) / lookups, 4) if lookups else 0.0,
+            'expirations': self._expirations,
+            'evictions': self._evictions,
+            'invalidations': self._invalidations,
+        }
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._expirations += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
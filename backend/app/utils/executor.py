@@ -0,0 +1,339 @@
+"""
+Ejecución de trabajo CPU-bound fuera del event loop
+Pools acotados con límite de cola para aplicar backpressure: hilos para analítica ligera,
+procesos para el entrenamiento de modelos, límites de concurrencia y timeouts por ruta
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from utils.metrics import REGISTRY
+from utils.profiling import current_profile, run_profiled
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorOverloadedError(RuntimeError):
+    """El pool alcanzó su límite de trabajos en ejecución y en cola"""
+
+
+class ExecutionTimeoutError(TimeoutError):
+    """El trabajo no terminó dentro del tiempo máximo de su ruta"""
+
+
+def _call(func: Callable, args: tuple, kwargs: dict) -> Any:
+    """Ejecutar una función en el hilo del pool; las corrutinas sin awaits reales usan su propio loop"""
+    if inspect.iscoroutinefunction(func):
+        return asyncio.run(func(*args, **kwargs))
+    return func(*args, **kwargs)
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict, collect_metrics: bool = False,
+                profile: Optional[Tuple[str, float]] = None
+                ) -> Tuple[float, float, bool, Any, Optional[dict], Optional[Dict[str, int]]]:
+    """_call con marcas de inicio y fin (reloj de pared: comparable entre procesos)
+
+    Devuelve (inicio, fin, ok, resultado o excepción, métricas, pilas): los errores también
+    vuelven como valor para no perder lo medido hasta el fallo. En un proceso del pool,
+    collect_metrics devuelve las medidas de los métodos instrumentados para sumarlas al
+    registro del proceso principal. Con profile (modo e intervalo de una sesión de perfilado)
+    devuelve también las pilas colapsadas de la llamada.
+    """
+    started = time.time()
+    ok, stacks = True, None
+    try:
+        if profile is None:
+            value = _call(func, args, kwargs)
+        else:
+            value, stacks = run_profiled(functools.partial(_call, func, args, kwargs), *profile)
+    except Exception as e:
+        ok, value = False, e
+    metrics = REGISTRY.drain() if collect_metrics else None
+    return started, time.time(), ok, value, metrics, stacks
+
+
+class LatencyStats:
+    """Contadores y muestras recientes de tiempo en cola y de ejecución"""
+
+    def __init__(self, samples: int = 1024):
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._queue_times: Deque[float] = deque(maxlen=samples)
+        self._run_times: Deque[float] = deque(maxlen=samples)
+
+    def record(self, queue_seconds: float, run_seconds: float, failed: bool = False):
+        self._queue_times.append(queue_seconds)
+        self._run_times.append(run_seconds)
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'queue_ms': self._percentiles(self._queue_times),
+            'run_ms': self._percentiles(self._run_times),
+        }
+
+    @staticmethod
+    def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+        if not samples:
+            return {'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        ordered = sorted(samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]  # noqa: E731
+        return {
+            'avg': round(1000 * sum(ordered) / len(ordered), 2),
+            'p50': round(1000 * pick(0.50), 2),
+            'p95': round(1000 * pick(0.95), 2),
+            'max': round(1000 * ordered[-1], 2),
+        }
+
+
+class BoundedExecutor:
+    """Pool de hilos o de procesos que rechaza trabajo nuevo cuando la cola está llena"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de pool desconocido: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        # _release corre en el hilo del worker o en el de gestión del pool de procesos
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._restarts = 0
+        self.latency = LatencyStats()
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def executor(self) -> Executor:
+        # Los procesos se crean en el primer uso (y de nuevo si el pool se rompe); "spawn" evita
+        # heredar hilos y locks del servidor
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=f"asgard-{self.name}"
+                    )
+            return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Ejecutar func en el pool o lanzar ExecutorOverloadedError si no hay capacidad"""
+        result, _, _ = await self.run_timed(func, *args, **kwargs)
+        return result
+
+    async def run_timed(self, func: Callable, *args, **kwargs) -> Tuple[Any, float, float]:
+        """Como run, devolviendo además los segundos en cola y en ejecución"""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                self.latency.rejected += 1
+                raise ExecutorOverloadedError(
+                    f"Pool '{self.name}' saturado ({self._in_flight} trabajos en curso)"
+                )
+            self._in_flight += 1
+
+        # La capacidad se libera cuando el trabajo termina de verdad, no cuando quien espera
+        # se rinde por timeout: un hilo o proceso no se puede interrumpir a mitad de trabajo
+        submitted = time.time()
+        session = current_profile.get()
+        call = (_timed_call, func, args, kwargs, self.kind == "process",
+                session.profile if session is not None else None)
+        executor = self.executor
+        try:
+            try:
+                future = executor.submit(*call)
+            except BrokenProcessPool:
+                # El pool murió sin trabajos de esta llamada: se reintenta una vez en uno nuevo
+                self._discard(executor)
+                executor = self.executor
+                future = executor.submit(*call)
+        except BaseException as e:
+            with self._lock:
+                self._in_flight -= 1
+            if isinstance(e, BrokenProcessPool):
+                self._discard(executor)
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            started, finished, ok, value, _, stacks = await asyncio.wrap_future(future)
+        except Exception as e:
+            self.latency.record(0.0, time.time() - submitted, failed=True)
+            if isinstance(e, BrokenProcessPool):
+                self._discard(executor)
+            raise
+        if stacks:
+            session.add(self.name, stacks)
+        queue_seconds, run_seconds = max(0.0, started - submitted), finished - started
+        self.latency.record(queue_seconds, run_seconds, failed=not ok)
+        if not ok:
+            raise value
+        return value, queue_seconds, run_seconds
+
+    def _discard(self, executor: Executor):
+        """Olvidar un pool de procesos roto (murió un worker): la siguiente llamada crea otro
+
+        Solo fallan los trabajos que estaban en el pool roto.
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._restarts += 1
+        logger.error(f"Pool '{self.name}' roto: se recreará en el siguiente trabajo")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future):
+        # Las medidas del worker se suman aquí y no en quien espera: también llegan cuando
+        # el trabajo falla o cuando quien espera ya se rindió por timeout
+        failed = future.cancelled() or future.exception() is not None
+        if not failed:
+            _, _, ok, _, metrics, _ = future.result()
+            REGISTRY.merge(metrics)
+            failed = not ok
+        with self._lock:
+            self._in_flight -= 1
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight, completed, failed, rejected, restarts = (
+                self._in_flight, self._completed, self._failed, self._rejected, self._restarts
+            )
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'in_flight': in_flight,
+            'queued': max(0, in_flight - self.max_workers),
+            'completed': completed,
+            'failed': failed,
+            'rejected': rejected,
+            'restarts': restarts,
+            'latency': self.latency.summary(),
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class RoutePolicy:
+    """Límite de concurrencia y timeout de una ruta"""
+
+    def __init__(self, max_concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.waiting = 0
+        self.latency = LatencyStats()
+
+
+class ExecutionLayer:
+    """Punto único para despachar trabajo de los handlers a los pools por tipo de carga"""
+
+    def __init__(self, pools: Dict[str, BoundedExecutor], default_timeout: Optional[float] = 30.0):
+        self.pools = pools
+        self.default_timeout = default_timeout
+        self.routes: Dict[str, RoutePolicy] = {}
+
+    def configure_route(self, route: str, max_concurrency: Optional[int] = None,
+                        timeout: Optional[float] = None):
+        self.routes[route] = RoutePolicy(max_concurrency, timeout)
+
+    async def run(self, pool: str, func: Callable, *args, route: Optional[str] = None, **kwargs) -> Any:
+        """Ejecutar func en el pool indicado respetando el límite y el timeout de la ruta
+
+        Lanza ExecutorOverloadedError si el pool está lleno (503) y ExecutionTimeoutError si
+        el trabajo, incluida la espera por el límite de la ruta, excede el timeout (504).
+        """
+        policy = self.routes.get(route) if route else None
+        if policy is None:
+            policy = self.routes.setdefault(route or pool, RoutePolicy())
+        timeout = policy.timeout if policy.timeout is not None else self.default_timeout
+
+        submitted = time.time()
+        try:
+            return await asyncio.wait_for(self._dispatch(pool, policy, submitted, func, args, kwargs), timeout)
+        except asyncio.TimeoutError:
+            policy.latency.timeouts += 1
+            self.pools[pool].latency.timeouts += 1
+            logger.warning(f"Timeout de {timeout}s en la ruta {route or pool}")
+            raise ExecutionTimeoutError(
+                f"La operación no terminó en {timeout} segundos"
+            ) from None
+        except ExecutorOverloadedError as e:
+            policy.latency.rejected += 1
+            logger.warning(f"Trabajo rechazado en la ruta {route or pool}: {e}")
+            raise
+
+    async def _dispatch(self, pool: str, policy: RoutePolicy, submitted: float,
+                        func: Callable, args: tuple, kwargs: dict) -> Any:
+        if policy.semaphore is None:
+            result, queue_seconds, run_seconds = await self.pools[pool].run_timed(func, *args, **kwargs)
+            policy.latency.record(queue_seconds, run_seconds)
+            return result
+
+        policy.waiting += 1
+        try:
+            await policy.semaphore.acquire()
+        finally:
+            policy.waiting -= 1
+        try:
+            # La espera por el límite de la ruta cuenta como tiempo en cola
+            route_wait = time.time() - submitted
+            result, queue_seconds, run_seconds = await self.pools[pool].run_timed(func, *args, **kwargs)
+            policy.latency.record(route_wait + queue_seconds, run_seconds)
+            return result
+        finally:
+            policy.semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pools': {name: pool.stats() for name, pool in self.pools.items()},
+            'routes': {
+                route: {
+                    'max_concurrency': policy.max_concurrency,
+                    'timeout': policy.timeout if policy.timeout is not None else self.default_timeout,
+                    'waiting': policy.waiting,
+                    **policy.latency.summary(),
+                }
+                for route, policy in self.routes.items()
+            },
+        }
+
+    def shutdown(self, wait: bool = True):
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
@@ -0,0 +1,298 @@
+"""
+Trabajos asíncronos para análisis pesados
+POST crea un trabajo y responde de inmediato con su id; el cálculo corre en los pools de la
+capa de ejecución y el estado, el progreso y el resultado se guardan en SQLite, de donde el
+cliente los consulta más tarde sin mantener la conexión HTTP abierta
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.executor import ExecutionLayer, ExecutorOverloadedError
+from utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Estados de un trabajo; los tres últimos son definitivos
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+_COLUMNS = ('id', 'kind', 'params', 'status', 'progress', 'message', 'error',
+            'created_at', 'started_at', 'finished_at', 'expires_at')
+
+
+class JobStore:
+    """Tabla de trabajos en SQLite; una conexión compartida protegida por un lock"""
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                error TEXT,
+                result BLOB,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                expires_at REAL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def create(self, kind: str, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, params, status, message, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, dumps(params).decode(), QUEUED, 'En cola', time.time())
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        """Resultado ya serializado a JSON, tal como se guardó"""
+        with self._lock:
+            row = self._db.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE (expires_at IS NULL OR expires_at > ?)"
+        args: tuple = (time.time(),)
+        if status:
+            query += " AND status = ?"
+            args += (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(query, (*args, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self, statuses: tuple) -> int:
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            return self._db.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})", statuses
+            ).fetchone()[0]
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+
+    def delete_expired(self, now: Optional[float] = None) -> int:
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now or time.time(),)
+            ).rowcount
+
+    def fail_unfinished(self, message: str, ttl_seconds: float) -> int:
+        """Marcar como fallidos los trabajos que quedaron a medias (p. ej. tras un reinicio)"""
+        now = time.time()
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, message = ?, finished_at = ?, expires_at = ? "
+                "WHERE status IN (?, ?)",
+                (FAILED, message, message, now, now + ttl_seconds, QUEUED, RUNNING)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _to_dict(row: tuple) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        job['params'] = json.loads(job['params'])
+        return job
+
+
+class JobProgress:
+    """Informe de progreso que el trabajo escribe directamente en la tabla
+
+    Se envía junto a los argumentos, también a procesos del pool: solo guarda la ruta de la base
+    de datos y abre una conexión propia en cada escritura, limitadas a una cada min_interval
+    segundos. Con una base en memoria no hay forma de compartirla y no se informa nada.
+    """
+
+    def __init__(self, path: str, job_id: str, min_interval: float = 0.5):
+        self.path = path
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._last = 0.0
+
+    def __call__(self, fraction: float, message: Optional[str] = None):
+        now = time.monotonic()
+        if self.path == ':memory:' or now - self._last < self.min_interval:
+            return
+        self._last = now
+        fields = {'progress': round(min(max(fraction, 0.0), 1.0), 4)}
+        if message:
+            fields['message'] = message
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        try:
+            with sqlite3.connect(self.path, timeout=1.0) as db:
+                # Solo mientras siga en ejecución: no pisar un estado final ya escrito
+                db.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ?",
+                           (*fields.values(), self.job_id, RUNNING))
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar el progreso del trabajo {self.job_id}: {e}")
+
+
+class JobKind:
+    """Tipo de trabajo: pool donde corre y cómo convertir los parámetros en argumentos
+
+    Con reports_progress la función recibe un JobProgress en el argumento progress y lo llama
+    con la fracción completada; el resto de trabajos solo pasan de 0 a 1 al terminar.
+    """
+
+    def __init__(self, pool: str, func: Callable, build_args: Callable[[Dict[str, Any]], tuple],
+                 description: str = "", reports_progress: bool = False):
+        self.pool = pool
+        self.func = func
+        self.build_args = build_args
+        self.description = description
+        self.reports_progress = reports_progress
+
+
+class JobManager:
+    """Crea trabajos, los ejecuta con un límite de concurrencia y expira sus resultados"""
+
+    def __init__(self, store: JobStore, execution: ExecutionLayer, max_concurrent: int = 2,
+                 max_pending: int = 100, ttl_seconds: float = 3600.0, timeout: Optional[float] = 600.0):
+        self.store = store
+        self.execution = execution
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.kinds: Dict[str, JobKind] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, job_kind: JobKind):
+        self.kinds[kind] = job_kind
+        # Ruta propia por tipo: los trabajos no consumen el límite ni el timeout de las rutas HTTP
+        self.execution.configure_route(f"/api/jobs/{kind}", timeout=self.timeout)
+
+    async def start(self, cleanup_interval: float = 60.0):
+        """Recuperar el estado tras un reinicio y lanzar la limpieza periódica de resultados"""
+        interrupted = self.store.fail_unfinished("Interrumpido por un reinicio del servidor", self.ttl_seconds)
+        if interrupted:
+            logger.warning(f"{interrupted} trabajos pendientes marcados como fallidos tras el reinicio")
+        self._cleanup_task = asyncio.ensure_future(self._cleanup_loop(cleanup_interval))
+
+    async def stop(self):
+        tasks = [*self._tasks.values(), *([self._cleanup_task] if self._cleanup_task else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Registrar un trabajo y lanzarlo; ValueError si los parámetros no son válidos"""
+        if kind not in self.kinds:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}. Disponibles: {', '.join(self.kinds)}")
+        args = self.kinds[kind].build_args(params)
+        if self.store.count((QUEUED, RUNNING)) >= self.max_pending:
+            raise ExecutorOverloadedError(f"Hay {self.max_pending} trabajos pendientes; reintentar más tarde")
+
+        job_id = self.store.create(kind, params)
+        task = asyncio.ensure_future(self._run(job_id, self.kinds[kind], args, f"/api/jobs/{kind}"))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is None or (job['expires_at'] is not None and job['expires_at'] <= time.time()):
+            return None
+        return job
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        return self.store.result(job_id) if self.get(job_id) is not None else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancelar un trabajo pendiente (o borrar uno terminado); el trabajo ya enviado a un pool
+        termina igualmente, pero su resultado se descarta"""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        return self.store.delete(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Estado del trabajo cuando termine o, como mucho, pasado timeout"""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.wait([task], timeout=timeout)
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'kinds': {kind: job_kind.description for kind, job_kind in self.kinds.items()},
+            'max_concurrent': self.max_concurrent,
+            'max_pending': self.max_pending,
+            'ttl_seconds': self.ttl_seconds,
+            'queued': self.store.count((QUEUED,)),
+            'running': self.store.count((RUNNING,)),
+            'succeeded': self.store.count((SUCCEEDED,)),
+            'failed': self.store.count((FAILED,)),
+        }
+
+    async def _run(self, job_id: str, job_kind: JobKind, args: tuple, route: str):
+        try:
+            async with self._semaphore:
+                self.store.update(job_id, status=RUNNING, progress=0.0, message='En ejecución',
+                                  started_at=time.time())
+                kwargs = {'progress': JobProgress(self.store.path, job_id)} if job_kind.reports_progress else {}
+                result = await self.execution.run(job_kind.pool, job_kind.func, *args, route=route, **kwargs)
+                # Serializar en un hilo: los resultados grandes no deben bloquear el event loop
+                payload = await asyncio.to_thread(dumps, result)
+                finished = time.time()
+                self.store.update(job_id, status=SUCCEEDED, progress=1.0, message='Completado',
+                                  result=payload, finished_at=finished,
+                                  expires_at=finished + self.ttl_seconds)
+        except asyncio.CancelledError:
+            finished = time.time()
+            self.store.update(job_id, status=CANCELLED, message='Cancelado', finished_at=finished,
+                              expires_at=finished + self.ttl_seconds)
+            raise
+        except Exception as e:
+            logger.error(f"Error en el trabajo {job_id}: {e}")
+            finished = time.time()
+            self.store.update(job_id, status=FAILED, message='Fallido', error=str(e),
+                              finished_at=finished, expires_at=finished + self.ttl_seconds)
+
+    async def _cleanup_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            removed = self.store.delete_expired()
+            if removed:
+                logger.info(f"{removed} trabajos expirados eliminados")
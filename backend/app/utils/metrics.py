@@ -0,0 +1,223 @@
+"""
+Métricas en formato de texto de Prometheus
+Histogramas de latencia por ruta y por método de servicio, y valores que se leen en el momento
+del scrape (profundidad de colas, cachés, filas de datos). Las medidas tomadas en procesos del
+pool se devuelven junto con el resultado de cada trabajo y se suman en el proceso principal
+"""
+
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+# Límites en segundos: de operaciones de microsegundos (preprocesado de texto) a entrenamientos
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas; seguro entre hilos"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # etiquetas -> [conteos por bucket (+Inf al final), suma]
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def drain(self) -> Dict[LabelValues, List[Any]]:
+        """Observaciones acumuladas desde la última llamada (y reiniciar)"""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: Dict[LabelValues, List[Any]]):
+        """Sumar observaciones tomadas en otro proceso"""
+        with self._lock:
+            for labels, (counts, total) in series.items():
+                own = self._series.get(labels)
+                if own is None:
+                    self._series[labels] = [list(counts), total]
+                else:
+                    own[0] = [a + b for a, b in zip(own[0], counts)]
+                    own[1] += total
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CollectedMetric:
+    """Gauge o contador cuyo valor se calcula en cada scrape"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[Any], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expuestas en /metrics"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.collected: List[CollectedMetric] = []
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, documentation, labelnames, buckets)
+        return self.histograms[name]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str],
+              collect: Callable[[], Iterable[Tuple[Sequence[Any], float]]]):
+        self.collected.append(CollectedMetric(name, documentation, "gauge", labelnames, collect))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str],
+                collect: Callable[[], Iterable[Tuple[Sequence[Any], float]]]):
+        self.collected.append(CollectedMetric(name, documentation, "counter", labelnames, collect))
+
+    def drain(self) -> Dict[str, Dict[LabelValues, List[Any]]]:
+        return {name: histogram.drain() for name, histogram in self.histograms.items()}
+
+    def merge(self, snapshot: Optional[Dict[str, Dict[LabelValues, List[Any]]]]):
+        for name, series in (snapshot or {}).items():
+            if series and name in self.histograms:
+                self.histograms[name].merge(series)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self.histograms.values():
+            lines.extend(histogram.render())
+        for metric in self.collected:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+METHOD_DURATION = REGISTRY.histogram(
+    "asgard_method_duration_seconds", "Duración de los métodos instrumentados de los servicios", ("method",)
+)
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "asgard_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta",
+    ("method", "route", "status")
+)
+
+
+def route_template(app, scope) -> str:
+    """Plantilla de la ruta (/api/jobs/{job_id}) para no crear una serie por cada id"""
+    for route in getattr(app, 'routes', ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', scope['path'])
+    return 'unmatched'
+
+
+def timed(method: str) -> Callable:
+    """Decorador que registra la duración de cada llamada en asgard_method_duration_seconds"""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    METHOD_DURATION.observe(time.perf_counter() - started, method)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                METHOD_DURATION.observe(time.perf_counter() - started, method)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """Mide la latencia de cada petición HTTP etiquetada con la plantilla de su ruta"""
+
+    def __init__(self, app, routes_app=None, histogram: Histogram = HTTP_REQUEST_DURATION):
+        self.app = app
+        self.routes_app = routes_app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.histogram.observe(
+                time.perf_counter() - started, scope['method'], route_template(self.routes_app, scope),
+                str(status['code'])
+            )
@@ -0,0 +1,131 @@
+"""
+Recursos de NLP con carga diferida
+Evita importar NLTK/TextBlob y descargar corpus al importar los servicios
+"""
+
+import os
+import threading
+import logging
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Directorio con corpus de NLTK empaquetados junto a la aplicación
+NLTK_DATA_DIR = os.getenv(
+    "ASGARD_NLTK_DATA",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "nltk_data")
+)
+
+# Solo se descargan recursos si se habilita explícitamente (evita red en el arranque)
+ALLOW_DOWNLOAD = os.getenv("ASGARD_NLTK_DOWNLOAD", "0") == "1"
+
+# Recursos requeridos: nombre del paquete -> ruta dentro de nltk_data
+NLTK_RESOURCES = {
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+
+# Stop words mínimas usadas si el corpus de NLTK no está disponible sin conexión
+FALLBACK_STOP_WORDS = {
+    'de', 'la', 'que', 'el', 'en', 'los', 'del', 'se', 'las', 'por', 'un', 'para', 'con',
+    'no', 'una', 'su', 'al', 'lo', 'como', 'más', 'pero', 'sus', 'le', 'ya', 'fue', 'este',
+    'muy', 'sin', 'sobre', 'también', 'me', 'hasta', 'hay', 'donde', 'desde', 'todo', 'nos',
+    'durante', 'todos', 'uno', 'les', 'ni', 'contra', 'otros', 'ese', 'eso', 'ante', 'ellos',
+    'esto', 'mis', 'antes', 'algunos', 'qué', 'unos', 'otro', 'otras', 'otra', 'tanto', 'esa',
+    'estos', 'mucho', 'quienes', 'nada', 'muchos', 'cual', 'poco', 'ella', 'estar', 'estas',
+    'algunas', 'algo', 'nosotros', 'mi', 'mí', 'cada', 'aquí', 'son', 'era',
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'any', 'can', 'had', 'her', 'was',
+    'one', 'our', 'out', 'has', 'his', 'how', 'its', 'who', 'did', 'this', 'that', 'with',
+    'have', 'from', 'they', 'will', 'would', 'there', 'their', 'what', 'about', 'which',
+    'when', 'were', 'been', 'into', 'than', 'them', 'very', 'just', 'some', 'also'
+}
+
+class NLPResources:
+    """Contenedor perezoso y thread-safe de stopwords, lematizador y analizador de polaridad"""
+
+    def __init__(self, languages=('spanish', 'english'), allow_download: bool = ALLOW_DOWNLOAD):
+        self.languages = languages
+        self.allow_download = allow_download
+        self._lock = threading.Lock()
+        self._stop_words: Optional[Set[str]] = None
+        self._lemmatize: Optional[Callable[[str], str]] = None
+        self._textblob = None
+        self.status: Dict[str, str] = {}
+
+    @property
+    def stop_words(self) -> Set[str]:
+        if self._stop_words is None:
+            with self._lock:
+                if self._stop_words is None:
+                    self._stop_words = self._load_stop_words()
+        return self._stop_words
+
+    @property
+    def lemmatize(self) -> Callable[[str], str]:
+        if self._lemmatize is None:
+            with self._lock:
+                if self._lemmatize is None:
+                    self._lemmatize = self._load_lemmatizer()
+        return self._lemmatize
+
+    @property
+    def textblob(self):
+        """Clase TextBlob importada bajo demanda"""
+        if self._textblob is None:
+            with self._lock:
+                if self._textblob is None:
+                    from textblob import TextBlob
+                    self._textblob = TextBlob
+                    self.status['textblob'] = 'loaded'
+        return self._textblob
+
+    def preload(self) -> Dict[str, str]:
+        """Cargar todos los recursos (hook de warm-up)"""
+        _ = self.stop_words
+        self.lemmatize('reviews')  # WordNet se carga en la primera llamada
+        _ = self.textblob
+        return dict(self.status)
+
+    def _ensure_resource(self, package: str) -> bool:
+        """Verificar que un recurso de NLTK esté disponible, descargándolo solo si se permite"""
+        import nltk
+
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+        try:
+            nltk.data.find(NLTK_RESOURCES[package])
+            return True
+        except LookupError:
+            if not self.allow_download:
+                return False
+
+        logger.info(f"Descargando recurso NLTK '{package}' en {NLTK_DATA_DIR}")
+        os.makedirs(NLTK_DATA_DIR, exist_ok=True)
+        return bool(nltk.download(package, download_dir=NLTK_DATA_DIR, quiet=True))
+
+    def _load_stop_words(self) -> Set[str]:
+        if not self._ensure_resource('stopwords'):
+            logger.warning("Corpus 'stopwords' de NLTK no disponible; se usa la lista mínima incorporada")
+            self.status['stopwords'] = 'fallback'
+            return set(FALLBACK_STOP_WORDS)
+
+        from nltk.corpus import stopwords
+
+        words = set()
+        for language in self.languages:
+            words.update(stopwords.words(language))
+        self.status['stopwords'] = 'loaded'
+        return words
+
+    def _load_lemmatizer(self) -> Callable[[str], str]:
+        if not self._ensure_resource('wordnet'):
+            logger.warning("Corpus 'wordnet' de NLTK no disponible; se omite la lematización")
+            self.status['wordnet'] = 'missing'
+            return lambda token: token
+
+        from nltk.stem import WordNetLemmatizer
+
+        lemmatizer = WordNetLemmatizer()
+        self.status['wordnet'] = 'loaded'
+        return lemmatizer.lemmatize
@@ -0,0 +1,278 @@
+"""
+Perfilado bajo demanda
+Un administrador arma una sesión para las próximas N peticiones a una ruta (o para una llamada
+concreta a un servicio). El trabajo que esas peticiones despachan a los pools se perfila dentro
+del hilo o proceso que lo ejecuta, con muestreo de pila o con cProfile, y las pilas se guardan
+en formato colapsado (una línea "marco;marco;... peso"), el que leen flamegraph.pl y speedscope.
+Sin sesiones armadas el único coste es comprobar un atributo por petición
+"""
+
+import contextvars
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+SAMPLING, CPROFILE = 'sampling', 'cprofile'
+MODES = (SAMPLING, CPROFILE)
+
+# Unidad del peso de cada pila según el modo
+UNITS = {SAMPLING: 'samples', CPROFILE: 'microseconds'}
+
+# Profundidad máxima al reconstruir pilas a partir de cProfile
+MAX_DEPTH = 64
+
+# Sesión que perfila el trabajo despachado en el contexto actual (la petición en curso)
+current_profile: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def _label(filename: str, line: int, name: str) -> str:
+    if filename == '~':  # funciones nativas: pstats no conoce su archivo
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _sample(thread_id: int, interval: float, stop: threading.Event, stacks: Counter):
+    """Tomar la pila del hilo perfilado cada interval segundos hasta que stop se active"""
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        # Solo los marcos por debajo de run_profiled: lo de arriba es la maquinaria del pool
+        while frame is not None and frame.f_code is not run_profiled.__code__:
+            code = frame.f_code
+            stack.append(_label(code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        if stack:
+            stacks[';'.join(reversed(stack))] += 1
+
+
+def _collapse_cprofile(profile: cProfile.Profile) -> Dict[str, int]:
+    """Pilas aproximadas a partir de cProfile
+
+    cProfile solo guarda pares llamador-llamado; la pila de cada función se reconstruye
+    subiendo por el llamador con más tiempo acumulado, y su peso es el tiempo propio.
+    """
+    stats = pstats.Stats(profile).stats
+    stacks: Dict[str, int] = {}
+    for func, (_, _, own_time, _, callers) in stats.items():
+        weight = int(own_time * 1e6)
+        if weight <= 0 or '_lsprof' in func[2]:
+            continue
+        chain, seen = [func], {func}
+        while callers and len(chain) < MAX_DEPTH:
+            parent = max(callers, key=lambda caller: callers[caller][3])
+            if parent in seen:
+                break
+            chain.append(parent)
+            seen.add(parent)
+            callers = stats[parent][4] if parent in stats else {}
+        key = ';'.join(_label(*frame) for frame in reversed(chain))
+        stacks[key] = stacks.get(key, 0) + weight
+    return stacks
+
+
+def run_profiled(call: Callable[[], Any], mode: str, interval: float) -> Tuple[Any, Dict[str, int]]:
+    """Ejecutar call perfilándolo en el hilo actual; devuelve el resultado y las pilas colapsadas"""
+    if mode == CPROFILE:
+        profile = cProfile.Profile()
+        result = profile.runcall(call)
+        return result, _collapse_cprofile(profile)
+
+    stacks: Counter = Counter()
+    stop = threading.Event()
+    sampler = threading.Thread(
+        target=_sample, args=(threading.get_ident(), interval, stop, stacks),
+        name="asgard-profiler", daemon=True
+    )
+    sampler.start()
+    try:
+        result = call()
+    finally:
+        stop.set()
+        sampler.join()
+    return result, dict(stacks)
+
+
+class ProfileSession:
+    """Pilas acumuladas de las peticiones perfiladas de una ruta"""
+
+    def __init__(self, route: str, requests: int, mode: str, interval: float):
+        self.id = uuid.uuid4().hex
+        self.route = route
+        self.requests = requests
+        self.mode = mode
+        self.interval = interval
+        self.claimed = 0
+        self.status = 'active'
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.path: Optional[str] = None
+        self.stacks: Counter = Counter()
+        self.log: List[Dict[str, Any]] = []
+
+    @property
+    def profile(self) -> Tuple[str, float]:
+        """Modo e intervalo, lo que necesita el hilo o proceso que ejecuta el trabajo"""
+        return self.mode, self.interval
+
+    def add(self, root: str, stacks: Dict[str, int]):
+        for stack, weight in stacks.items():
+            self.stacks[f"{root};{stack}"] += weight
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {weight}\n" for stack, weight in sorted(self.stacks.items()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'route': self.route,
+            'mode': self.mode,
+            'unit': UNITS[self.mode],
+            'interval': self.interval if self.mode == SAMPLING else None,
+            'requests': self.requests,
+            'completed': len(self.log),
+            'status': self.status,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'stacks': len(self.stacks),
+            'total_weight': sum(self.stacks.values()),
+            'path': self.path,
+            'log': self.log,
+        }
+
+
+class Profiler:
+    """Sesiones de perfilado; como mucho una activa por ruta"""
+
+    def __init__(self, directory: str, max_sessions: int = 20):
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, ProfileSession]" = OrderedDict()
+        self._armed: Dict[str, ProfileSession] = {}
+
+    @property
+    def armed(self) -> bool:
+        return bool(self._armed)
+
+    def create(self, route: str, requests: int = 1, mode: str = SAMPLING, interval: float = 0.005,
+               arm: bool = True) -> ProfileSession:
+        """Nueva sesión; con arm, la reclaman las próximas peticiones a route"""
+        if mode not in MODES:
+            raise ValueError(f"Modo de perfilado desconocido: {mode}. Use {' o '.join(MODES)}")
+        if requests < 1:
+            raise ValueError("requests debe ser al menos 1")
+        if arm and route in self._armed:
+            raise ValueError(f"Ya hay una sesión activa para {route}: {self._armed[route].id}")
+
+        session = ProfileSession(route, requests, mode, interval)
+        self.sessions[session.id] = session
+        if arm:
+            self._armed[route] = session
+        while len(self.sessions) > self.max_sessions:
+            oldest = next((s for s in self.sessions.values() if s.status != 'active'), None)
+            if oldest is None:
+                break
+            del self.sessions[oldest.id]
+        return session
+
+    def claim(self, route: str) -> Optional[ProfileSession]:
+        """Sesión que debe perfilar una petición a route, si quedan peticiones por cubrir"""
+        session = self._armed.get(route)
+        if session is None or session.claimed >= session.requests:
+            return None
+        session.claimed += 1
+        return session
+
+    def complete(self, session: ProfileSession, seconds: float, status: int):
+        session.log.append({'status': status, 'duration_ms': round(1000 * seconds, 2)})
+        if len(session.log) >= session.requests:
+            self.finish(session)
+
+    def finish(self, session: ProfileSession, status: str = 'finished'):
+        """Desarmar la sesión y guardar sus pilas en disco"""
+        if session.status != 'active':
+            return
+        if self._armed.get(session.route) is session:
+            del self._armed[session.route]
+        session.status = status
+        session.finished_at = time.time()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{session.id}.folded")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(session.collapsed())
+            session.path = path
+        except OSError as e:
+            logger.error(f"No se pudo guardar el perfil {session.id}: {e}")
+
+    def stop(self, session_id: str) -> Optional[ProfileSession]:
+        """Terminar una sesión antes de tiempo con lo que haya recogido"""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            self.finish(session, 'stopped')
+        return session
+
+    def get(self, session_id: str) -> Optional[ProfileSession]:
+        return self.sessions.get(session_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [session.to_dict() for session in reversed(self.sessions.values())]
+
+    async def run(self, session: ProfileSession, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecutar call perfilando el trabajo que despache a los pools"""
+        token = current_profile.set(session)
+        started, status = time.perf_counter(), 200
+        try:
+            return await call()
+        except Exception:
+            status = 500
+            raise
+        finally:
+            current_profile.reset(token)
+            self.complete(session, time.perf_counter() - started, status)
+
+
+class ProfilingMiddleware:
+    """Marca las peticiones reclamadas por una sesión para que sus trabajos se perfilen"""
+
+    def __init__(self, app, profiler: Profiler, routes_app=None):
+        self.app = app
+        self.profiler = profiler
+        self.routes_app = routes_app
+
+    async def __call__(self, scope, receive, send):
+        if not self.profiler.armed or scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.claim(route_template(self.routes_app, scope))
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        token = current_profile.set(session)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            self.profiler.complete(session, time.perf_counter() - started, status['code'])
@@ -0,0 +1,281 @@
+"""
+Caché de respuestas HTTP
+Middleware ASGI que guarda las respuestas GET de rutas deterministas, con claves por ruta,
+query canónica y versión de los datos que lee cada ruta, LRU en memoria acotado por bytes,
+nivel opcional en disco, TTL por ruta y validación condicional con ETag / 304
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras de la respuesta original que no se guardan (se recalculan al servir)
+_SKIPPED_HEADERS = {b'content-length', b'etag', b'x-cache', b'date', b'server'}
+
+
+class CachedResponse:
+    """Respuesta completa guardada en caché"""
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes,
+                 expires_at: float, version: Hashable, route: Optional[str] = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+        self.version = version
+        self.route = route
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+
+class ResponseCache:
+    """LRU en memoria acotado por bytes con un segundo nivel opcional en disco"""
+
+    def __init__(self, route_ttls: Dict[str, float], version_provider: Callable[[str], Hashable],
+                 exclude: Iterable[str] = (), max_bytes: int = 64 * 1024 * 1024,
+                 max_entry_bytes: int = 4 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 max_disk_entries: int = 10000, vary_headers: Iterable[str] = ('accept', 'origin')):
+        # Prefijos de ruta -> TTL en segundos; gana el prefijo más largo. Origin forma parte de
+        # la clave porque las cabeceras CORS de la respuesta dependen de él
+        self.route_ttls = sorted(route_ttls.items(), key=lambda item: len(item[0]), reverse=True)
+        self._ttls = dict(route_ttls)
+        self.exclude = set(exclude)
+        # Recibe el prefijo configurado y devuelve la versión de los datos que lee esa ruta:
+        # una escritura solo invalida las rutas que dependen de ella
+        self.version_provider = version_provider
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.vary_headers = [header.encode() for header in vary_headers]
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._versions: Dict[str, Hashable] = {}
+        self._stats = {
+            'hits': 0, 'disk_hits': 0, 'misses': 0, 'not_modified': 0,
+            'stores': 0, 'evictions': 0, 'invalidations': 0, 'uncacheable': 0
+        }
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def route_for(self, path: str) -> Optional[str]:
+        """Prefijo configurado que cubre la ruta (None si no se cachea)"""
+        if path in self.exclude:
+            return None
+        for prefix, _ in self.route_ttls:
+            if path == prefix or path.startswith(prefix.rstrip('/') + '/'):
+                return prefix
+        return None
+
+    def ttl_for(self, path: str) -> Optional[float]:
+        route = self.route_for(path)
+        return self._ttls[route] if route is not None else None
+
+    def key(self, path: str, query_string: bytes, headers: List[Tuple[bytes, bytes]]) -> Tuple[str, Hashable]:
+        """Clave canónica (ruta, parámetros ordenados, cabeceras que varían y versión de los datos)
+        y la versión con la que se calculó"""
+        params = sorted(parse_qsl(query_string.decode('latin-1'), keep_blank_values=True))
+        request_headers = dict(headers)
+        varying = [(name.decode(), request_headers.get(name, b'').decode('latin-1')) for name in self.vary_headers]
+        version = self.current_version(self.route_for(path))
+        raw = repr((path, urlencode(params), varying, version))
+        return hashlib.sha256(raw.encode()).hexdigest(), version
+
+    def current_version(self, route: str) -> Hashable:
+        version = self.version_provider(route)
+        if route in self._versions and version != self._versions[route]:
+            # Los datos de la ruta cambiaron: sus entradas en memoria ya no son alcanzables
+            stale = [key for key, entry in self._entries.items() if entry.route == route]
+            if stale:
+                self._stats['invalidations'] += 1
+            for key in stale:
+                self._remove(key)
+        self._versions[route] = version
+        return version
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.time():
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+        if entry is not None:
+            self._remove(key)
+
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if (entry is not None and entry.expires_at > time.time()
+                    and getattr(entry, 'route', None) in self._versions
+                    and entry.version == self._versions[entry.route]):
+                self._stats['disk_hits'] += 1
+                self._store_memory(key, entry)
+                return entry
+
+        self._stats['misses'] += 1
+        return None
+
+    async def put(self, key: str, entry: CachedResponse):
+        if entry.size > self.max_entry_bytes:
+            self._stats['uncacheable'] += 1
+            return
+        self._stats['stores'] += 1
+        self._store_memory(key, entry)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, entry)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.entry'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def record_not_modified(self):
+        self._stats['not_modified'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses']
+        return {
+            **self._stats,
+            'hit_rate': round((self._stats['hits'] + self._stats['disk_hits']) / lookups, 4) if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'disk_dir': self.disk_dir,
+            'routes': dict(self.route_ttls),
+            'versions': dict(self._versions),
+        }
+
+    def _store_memory(self, key: str, entry: CachedResponse):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats['evictions'] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.entry")
+
+    def _read_disk(self, key: str) -> Optional[CachedResponse]:
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    def _write_disk(self, key: str, entry: CachedResponse):
+        path = self._disk_path(key)
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+            self._prune_disk()
+        except OSError as e:
+            logger.warning(f"No se pudo escribir la entrada de caché en disco: {e}")
+
+    def _prune_disk(self):
+        """Borrar las entradas más antiguas cuando el directorio supera el máximo"""
+        files = [
+            os.path.join(self.disk_dir, name)
+            for name in os.listdir(self.disk_dir) if name.endswith('.entry')
+        ]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class ResponseCacheMiddleware:
+    """Sirve desde la caché las respuestas GET de las rutas configuradas"""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            await self.app(scope, receive, send)
+            return
+
+        route = self.cache.route_for(scope['path'])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        ttl = self.cache.ttl_for(scope['path'])
+
+        headers = scope.get('headers', [])
+        key, version = self.cache.key(scope['path'], scope.get('query_string', b''), headers)
+        if_none_match = dict(headers).get(b'if-none-match', b'').decode('latin-1')
+
+        entry = await self.cache.get(key)
+        if entry is not None:
+            await self._send_entry(send, entry, if_none_match, b'HIT')
+            return
+
+        # Se acumula la respuesta completa: el ETag depende del cuerpo
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message['type'] == 'http.response.start':
+                start.update(message)
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, capture)
+
+        body = b''.join(chunks)
+        response_headers = [
+            (name, value) for name, value in start.get('headers', [])
+            if name.lower() not in _SKIPPED_HEADERS
+        ]
+        entry = CachedResponse(start.get('status', 500), response_headers, body, time.time() + ttl, version, route)
+        # Solo se guardan respuestas correctas cuyos datos no cambiaron durante el cálculo
+        if entry.status == 200 and version == self.cache.current_version(route):
+            await self.cache.put(key, entry)
+        await self._send_entry(send, entry, if_none_match, b'MISS')
+
+    async def _send_entry(self, send, entry: CachedResponse, if_none_match: str, state: bytes):
+        headers = [*entry.headers, (b'x-cache', state)]
+        if entry.status == 200:
+            max_age = max(0, int(entry.expires_at - time.time()))
+            headers += [(b'etag', entry.etag.encode()), (b'cache-control', f"max-age={max_age}".encode())]
+
+        if entry.status == 200 and if_none_match and self._matches(if_none_match, entry.etag):
+            self.cache.record_not_modified()
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        headers.append((b'content-length', str(len(entry.body)).encode()))
+        await send({'type': 'http.response.start', 'status': entry.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': entry.body})
+
+    @staticmethod
+    def _matches(if_none_match: str, etag: str) -> bool:
+        candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,72 @@
+"""
+Serialización rápida de respuestas JSON
+Las rutas con cargas grandes devuelven FastJSONResponse: el resultado del servicio se serializa
+directamente (con orjson si está instalado) sin que FastAPI lo revalide contra response_model,
+y los escalares y arrays de NumPy, fechas de pandas y modelos Pydantic se convierten sin pasos
+intermedios
+"""
+
+import json
+import math
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json con el mismo manejo de tipos
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+def _default(value: Any) -> Any:
+    """Tipos que ni json ni orjson serializan por sí mismos"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (pd.Series, pd.Index)):
+        return value.tolist()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Tipo no serializable a JSON: {type(value).__name__}")
+
+
+def _sanitize(value: Any) -> Any:
+    """NaN e infinito como null también en el camino sin orjson (JSON estándar no los admite)"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _sanitize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_sanitize(item) for item in value]
+    return value
+
+
+def dumps(content: Any) -> bytes:
+    """Serializar content a JSON en UTF-8"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+    def default(value: Any) -> Any:
+        return _sanitize(_default(value))
+
+    return json.dumps(
+        _sanitize(content), default=default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Respuesta JSON que serializa el resultado del servicio tal cual, sin revalidarlo"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
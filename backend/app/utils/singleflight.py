@@ -0,0 +1,52 @@
+"""
+Coalescencia de peticiones (single-flight)
+Peticiones concurrentes idénticas comparten un único cálculo en curso en lugar de repetirlo;
+a diferencia de una caché, el resultado no se conserva una vez entregado
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Un cálculo en curso por clave; quien llega mientras tanto espera el mismo resultado"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._failures = 0
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Resultado de compute() para key, compartido con las llamadas concurrentes de la misma key"""
+        self._calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self._executions += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        else:
+            self._coalesced += 1
+
+        # shield: si un cliente se desconecta, el cálculo sigue para los demás que esperan
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            self._failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'calls': self._calls,
+            'executions': self._executions,
+            'coalesced': self._coalesced,
+            'coalesced_ratio': round(self._coalesced / self._calls, 4) if self._calls else 0.0,
+            'failures': self._failures,
+            'in_flight': len(self._in_flight),
+        }
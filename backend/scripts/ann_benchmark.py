@@ -0,0 +1,93 @@
+"""
+Comparar la búsqueda aproximada (IVF) de productos similares con la fuerza bruta
+Genera un catálogo sintético, mide recall@k y consultas por segundo para varios n_probe
+
+Uso (desde backend/):
+    python scripts/ann_benchmark.py --products 200000 --queries 500 --k 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from services.similarity_index import SimilarityIndex  # noqa: E402
+
+
+def synthetic_catalog(n_products: int, n_topics: int = 100, words_per_topic: int = 10,
+                      seed: int = 42) -> list:
+    """Textos de productos agrupados por temas, con algo de ruido entre temas"""
+    rng = np.random.RandomState(seed)
+    vocabulary = np.array([f"term{i}" for i in range(n_topics * words_per_topic)])
+    topics = rng.randint(0, n_topics, n_products)
+
+    documents = []
+    for topic in topics:
+        own = rng.randint(0, words_per_topic, 8) + topic * words_per_topic
+        noise = rng.randint(0, len(vocabulary), 2)
+        documents.append(" ".join(vocabulary[np.concatenate([own, noise])]))
+    return documents
+
+
+def exact_kth_scores(matrix, queries: np.ndarray, k: int, block: int = 64) -> np.ndarray:
+    """Similitud del k-ésimo vecino exacto de cada consulta (coseno TF-IDF)"""
+    kth = []
+    for start in range(0, len(queries), block):
+        rows = queries[start:start + block]
+        similarities = cosine_similarity(matrix[rows], matrix)
+        similarities[np.arange(len(rows)), rows] = -np.inf
+        kth.extend(-np.partition(-similarities, k - 1, axis=1)[:, k - 1])
+    return np.array(kth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", type=str, default="1,2,4,8,16,32")
+    args = parser.parse_args()
+
+    documents = synthetic_catalog(args.products)
+    index = SimilarityIndex(
+        TfidfVectorizer(max_features=1000, stop_words='english'),
+        clustering_model=KMeans(n_clusters=8, random_state=42),
+        ann_threshold=0
+    )
+
+    # Solo se construyen la matriz y el índice IVF; las listas de vecinos no hacen falta aquí
+    start = time.perf_counter()
+    product_ids = [f"prod_{i:06d}" for i in range(args.products)]
+    index.fit(product_ids, documents, precompute_neighbors=False)
+    build_seconds = time.perf_counter() - start
+
+    queries = np.random.RandomState(0).choice(args.products, args.queries, replace=False)
+
+    start = time.perf_counter()
+    kth_scores = exact_kth_scores(index.matrix, queries, args.k)
+    brute_qps = len(queries) / (time.perf_counter() - start)
+
+    print(f"productos: {args.products}  listas IVF: {len(index.ann.lists)}  "
+          f"construcción: {build_seconds:.1f}s")
+    print(f"{'método':>14} {'recall@' + str(args.k):>10} {'QPS':>10}")
+    print(f"{'fuerza bruta':>14} {1.0:>10.3f} {brute_qps:>10.1f}")
+
+    for n_probe in (int(value) for value in args.probes.split(",")):
+        start = time.perf_counter()
+        found = [np.array([score for _, score in index.query(product_ids[row], args.k, n_probe)])
+                 for row in queries]
+        qps = len(queries) / (time.perf_counter() - start)
+        # Con empates cuenta como acierto cualquier vecino tan similar como el k-ésimo exacto
+        recall = np.mean([np.sum(scores >= kth - 1e-9) / args.k for scores, kth in zip(found, kth_scores)])
+        print(f"{'n_probe=' + str(n_probe):>14} {recall:>10.3f} {qps:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Benchmarks de los caminos críticos de los servicios a varias escalas de datos sintéticos
+Cada escala multiplica el número de productos (1x = los datos de ejemplo de cada servicio) con
+copias perturbadas de los productos originales. Cada benchmark se ejecuta varias veces tras una
+pasada de calentamiento; los resultados se guardan en JSON y, si se indica una línea base, se
+marcan como regresión los que superen su mediana en más del umbral
+
+Uso (desde backend/):
+    python scripts/benchmarks.py --scales 1,10,100 --output benchmark_results.json
+    python scripts/benchmarks.py --save-baseline      # línea base de esta máquina
+    python scripts/benchmarks.py --baseline scripts/benchmark_baseline.json --threshold 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from services.feature_store import ProductFeatureStore  # noqa: E402
+from services.prediction_engine import PredictionEngine  # noqa: E402
+from services.recommendation_system import RecommendationSystem  # noqa: E402
+from services.sentiment_analyzer import SentimentAnalyzer  # noqa: E402
+from services.trend_analyzer import TrendAnalyzer  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Textos del lote de scoring por cada 1x de escala
+BATCH_TEXTS_PER_SCALE = 50
+
+
+def scale_history(frame: pd.DataFrame, factor: int, seed: int = 42) -> pd.DataFrame:
+    """Histórico con factor veces más productos: copias con ventas perturbadas e ids nuevos"""
+    if factor <= 1:
+        return frame
+    rng = np.random.default_rng(seed)
+    copies = [frame]
+    for copy in range(1, factor):
+        clone = frame.copy()
+        clone['product_id'] = clone['product_id'] + f"_x{copy:03d}"
+        if 'product_name' in clone:
+            clone['product_name'] = clone['product_name'] + f" #{copy}"
+        # Un multiplicador por producto para que cada copia tenga su propio nivel de ventas
+        multipliers = clone['product_id'].map(
+            {product_id: rng.uniform(0.7, 1.3) for product_id in clone['product_id'].unique()}
+        )
+        for column in ('sales', 'search_volume'):
+            if column in clone:
+                clone[column] = (clone[column] * multipliers).astype(frame[column].dtype)
+        copies.append(clone)
+    return pd.concat(copies, ignore_index=True)
+
+
+def scale_catalog(recommendation_system: RecommendationSystem, factor: int, seed: int = 42):
+    """Añadir al catálogo factor - 1 copias de cada producto con precio y rating perturbados"""
+    if factor <= 1:
+        return
+    rng = np.random.default_rng(seed)
+    originals = recommendation_system.sample_data.to_dict('records')
+    products = []
+    for copy in range(1, factor):
+        for product in originals:
+            products.append({
+                **product,
+                'id': f"{product['id']}_x{copy:03d}",
+                'name': f"{product['name']} #{copy}",
+                'price': round(float(product['price']) * rng.uniform(0.8, 1.2), 2),
+                'rating': round(min(5.0, float(product['rating']) * rng.uniform(0.9, 1.1)), 1),
+                'sales_volume': int(rng.integers(100, 1000)),
+                'trend_score': float(rng.uniform(0.3, 0.9)),
+            })
+    recommendation_system.upsert_products(products)
+
+
+class Benchmark:
+    """Un camino crítico: cómo llamarlo con los servicios de una escala y hasta qué escala medirlo"""
+
+    def __init__(self, name: str, call: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 max_scale: Optional[int] = None, warm_up: bool = True):
+        self.name = name
+        self.call = call
+        self.max_scale = max_scale
+        self.warm_up = warm_up
+
+
+BENCHMARKS = [
+    Benchmark("TrendAnalyzer.get_current_trends",
+              lambda s: s['trends'].get_current_trends(limit=10)),
+    Benchmark("TrendAnalyzer.get_sales_metrics",
+              lambda s: s['trends'].get_sales_metrics()),
+    Benchmark("TrendAnalyzer.generate_trends_report",
+              lambda s: s['trends'].generate_trends_report()),
+    # Entrena tres modelos por producto: a 100x una sola pasada tarda decenas de minutos
+    Benchmark("PredictionEngine.predict_trends",
+              lambda s: s['predictions'].predict_trends(30), max_scale=10, warm_up=False),
+    Benchmark("PredictionEngine.predict_demand",
+              lambda s: s['predictions'].predict_demand("prod_001", 30), warm_up=False),
+    Benchmark("SentimentAnalyzer.analyze_text_sentiment",
+              lambda s: s['sentiment'].analyze_text_sentiment(s['texts'][0])),
+    Benchmark("SentimentAnalyzer.analyze_texts_sentiment",
+              lambda s: s['sentiment'].analyze_texts_sentiment(s['texts'])),
+    Benchmark("RecommendationSystem.get_product_recommendations",
+              lambda s: s['recommendations'].get_product_recommendations(limit=10)),
+    Benchmark("RecommendationSystem.get_promotion_strategies",
+              lambda s: s['recommendations'].get_promotion_strategies()),
+]
+
+
+async def build_services(scale: int) -> Dict[str, Any]:
+    """Servicios con los datos de ejemplo multiplicados por scale"""
+    feature_store = ProductFeatureStore()
+    trends = TrendAnalyzer(feature_store=feature_store)
+    predictions = PredictionEngine(feature_store=feature_store)
+    sentiment = SentimentAnalyzer()
+    recommendations = RecommendationSystem(feature_store=feature_store)
+
+    trends.sample_data = scale_history(trends.sample_data, scale)
+    predictions.sample_data = scale_history(predictions.sample_data, scale)
+    scale_catalog(recommendations, scale)
+    sentiment.warm_up()
+    await trends.refresh_features()
+
+    # Textos distintos: el scoring por lotes analiza una sola vez los repetidos
+    reviews = sentiment.sample_reviews['review_text'].tolist()
+    texts = [f"{reviews[i % len(reviews)]} #{i}" for i in range(BATCH_TEXTS_PER_SCALE * scale)]
+
+    return {
+        'trends': trends,
+        'predictions': predictions,
+        'sentiment': sentiment,
+        'recommendations': recommendations,
+        'texts': texts,
+        'size': {
+            'products': int(trends.sample_data['product_id'].nunique()),
+            'sales_rows': len(trends.sample_data),
+            'prediction_rows': len(predictions.sample_data),
+            'catalog_products': len(recommendations.sample_data),
+            'batch_texts': len(texts),
+        },
+    }
+
+
+async def measure(benchmark: Benchmark, services: Dict[str, Any], repeats: int,
+                  max_seconds: float) -> Dict[str, Any]:
+    """Tiempos en milisegundos: hasta repeats ejecuciones o max_seconds, al menos una"""
+    if benchmark.warm_up:
+        await benchmark.call(services)
+
+    samples: List[float] = []
+    budget_started = time.perf_counter()
+    while len(samples) < repeats:
+        started = time.perf_counter()
+        await benchmark.call(services)
+        samples.append(1000 * (time.perf_counter() - started))
+        if time.perf_counter() - budget_started > max_seconds:
+            break
+
+    return {
+        'runs': len(samples),
+        'median_ms': round(statistics.median(samples), 3),
+        'min_ms': round(min(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'stdev_ms': round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Datos de la máquina y versiones: una línea base solo es comparable en el mismo entorno"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Cociente de medianas frente a la línea base para cada benchmark medido en ambas"""
+    rows = []
+    for key, current in results['results'].items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous or 'median_ms' not in current or 'median_ms' not in previous:
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else float('inf')
+        status = 'regression' if ratio > 1 + threshold else 'improvement' if ratio < 1 - threshold else 'ok'
+        rows.append({'key': key, 'baseline_ms': previous['median_ms'], 'current_ms': current['median_ms'],
+                     'ratio': round(ratio, 3), 'status': status})
+    return rows
+
+
+async def run(scales: List[int], selected: Optional[List[str]], repeats: int, max_seconds: float,
+              all_scales: bool) -> Dict[str, Any]:
+    benchmarks = [b for b in BENCHMARKS if not selected or any(name in b.name for name in selected)]
+    results: Dict[str, Any] = {}
+    sizes: Dict[str, Any] = {}
+
+    for scale in scales:
+        started = time.perf_counter()
+        services = await build_services(scale)
+        sizes[f"{scale}x"] = services['size']
+        print(f"\nEscala {scale}x: {services['size']} (preparada en {time.perf_counter() - started:.1f} s)")
+
+        for benchmark in benchmarks:
+            key = f"{benchmark.name}[{scale}x]"
+            if benchmark.max_scale is not None and scale > benchmark.max_scale and not all_scales:
+                results[key] = {'skipped': f"escala mayor que {benchmark.max_scale}x (usar --all-scales)"}
+                print(f"  {benchmark.name:<50} omitido")
+                continue
+            timing = await measure(benchmark, services, repeats, max_seconds)
+            results[key] = {'benchmark': benchmark.name, 'scale': scale, **timing}
+            print(f"  {benchmark.name:<50}{timing['median_ms']:>12.2f} ms  (n={timing['runs']}, "
+                  f"min {timing['min_ms']:.2f}, σ {timing['stdev_ms']:.2f})")
+
+    return {'environment': environment(), 'repeats': repeats, 'sizes': sizes, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", default="1,10,100", help="Multiplicadores del número de productos")
+    parser.add_argument("--only", action="append", help="Ejecutar solo los benchmarks cuyo nombre contenga este texto")
+    parser.add_argument("--repeats", type=int, default=5, help="Ejecuciones medidas por benchmark")
+    parser.add_argument("--max-seconds", type=float, default=20.0,
+                        help="Tiempo máximo de medición por benchmark (al menos una ejecución)")
+    parser.add_argument("--all-scales", action="store_true", help="No omitir los benchmarks más lentos a gran escala")
+    parser.add_argument("--output", default="benchmark_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Línea base con la que comparar")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Aumento relativo de la mediana que cuenta como regresión")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como línea base")
+    args = parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(",") if scale.strip()]
+    results = asyncio.run(run(scales, args.only, args.repeats, args.max_seconds, args.all_scales))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"Sin línea base en {args.baseline}; crearla con --save-baseline")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.threshold)
+    if baseline.get('environment', {}).get('platform') != results['environment']['platform']:
+        print("Aviso: la línea base se midió en otra plataforma; los cocientes pueden no ser comparables")
+
+    print(f"\n{'benchmark':<62}{'base ms':>12}{'actual ms':>12}{'cociente':>10}  estado")
+    for row in rows:
+        print(f"{row['key']:<62}{row['baseline_ms']:>12.2f}{row['current_ms']:>12.2f}{row['ratio']:>10.3f}  {row['status']}")
+
+    regressions = [row for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {100 * args.threshold:.0f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
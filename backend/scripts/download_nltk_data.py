@@ -0,0 +1,27 @@
+"""
+Empaquetar los corpus de NLTK usados por el analizador de sentimientos
+Los descarga en app/data/nltk_data para que el servicio funcione sin red
+
+Uso (desde backend/):
+    python scripts/download_nltk_data.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import nltk  # noqa: E402
+
+from utils.nlp_resources import NLTK_DATA_DIR, NLTK_RESOURCES  # noqa: E402
+
+
+def main():
+    os.makedirs(NLTK_DATA_DIR, exist_ok=True)
+    for package in NLTK_RESOURCES:
+        ok = nltk.download(package, download_dir=NLTK_DATA_DIR, quiet=True)
+        print(f"{package}: {'ok' if ok else 'error'} -> {NLTK_DATA_DIR}")
+
+
+if __name__ == "__main__":
+    main()
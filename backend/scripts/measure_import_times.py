@@ -0,0 +1,76 @@
+"""
+Medir el tiempo de importación de cada módulo de servicio
+Cada módulo se importa en un proceso limpio con `python -X importtime`
+
+Uso (desde backend/):
+    python scripts/measure_import_times.py
+"""
+
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+SERVICE_MODULES = [
+    "services.trend_analyzer",
+    "services.sentiment_analyzer",
+    "services.prediction_engine",
+    "services.recommendation_system",
+]
+
+
+def measure(module: str) -> dict:
+    """Importar un módulo en un subproceso y devolver tiempos en milisegundos"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {"module": module, "error": result.stderr.strip().splitlines()[-1]}
+
+    total_us = 0
+    self_us = 0
+    heaviest = []
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        own, cumulative, raw_name = fields[0].strip(), fields[1].strip(), fields[2]
+        if not own.isdigit():
+            continue
+        name = raw_name.strip()
+        # importtime sangra dos espacios por nivel; un import de primer nivel lleva un solo espacio
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name == module:
+                total_us, self_us = int(cumulative), int(own)
+                heaviest = children
+            # Las líneas de un import aparecen antes que la suya: empezar de nuevo tras cada una
+            children = []
+        elif depth == 1:  # dependencias directas del import de primer nivel que sigue
+            children.append((int(cumulative), name))
+
+    heaviest.sort(reverse=True)
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "self_ms": round(self_us / 1000, 1),
+        "top_dependencies": [(name, round(us / 1000, 1)) for us, name in heaviest[:3]],
+    }
+
+
+def main():
+    print(f"{'módulo':40} {'total (ms)':>12} {'propio (ms)':>12}  dependencias más pesadas")
+    for module in SERVICE_MODULES:
+        info = measure(module)
+        if "error" in info:
+            print(f"{module:40} {'error':>12}  {info['error']}")
+            continue
+        deps = ", ".join(f"{name} {ms}ms" for name, ms in info["top_dependencies"])
+        print(f"{module:40} {info['total_ms']:>12} {info['self_ms']:>12}  {deps}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Medir qué parte de la latencia de las rutas analíticas se va en serializar la respuesta
+Para cada ruta se calcula la carga una vez con el servicio y se compara el camino estándar
+de FastAPI (validación contra response_model + jsonable_encoder + json.dumps) con
+FastJSONResponse (serialización directa, orjson si está instalado)
+
+Uso (desde backend/):
+    python scripts/serialization_benchmark.py --iterations 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from models.trend_models import SalesMetrics, SentimentAnalysis  # noqa: E402
+from services.prediction_engine import PredictionEngine  # noqa: E402
+from services.sentiment_analyzer import SentimentAnalyzer  # noqa: E402
+from services.trend_analyzer import TrendAnalyzer  # noqa: E402
+from utils import responses  # noqa: E402
+
+
+def standard_render(adapter: TypeAdapter, payload: Any) -> bytes:
+    """Lo que hace FastAPI con un resultado y un response_model antes de enviarlo"""
+    validated = adapter.validate_python(payload)
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def median_ms(render, iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        render()
+        samples.append(time.perf_counter() - started)
+    return 1000 * statistics.median(samples)
+
+
+async def build_payloads() -> Dict[str, Dict[str, Any]]:
+    """Carga real de cada ruta y el tiempo que tardó el servicio en calcularla"""
+    trend_analyzer = TrendAnalyzer()
+    sentiment_analyzer = SentimentAnalyzer()
+    prediction_engine = PredictionEngine()
+    products = int(trend_analyzer.sample_data['product_id'].nunique())
+
+    routes = {
+        "/api/trends/current": (List[Dict[str, Any]], lambda: trend_analyzer.get_current_trends(limit=products)),
+        "/api/trends/prediction": (List[Dict[str, Any]], lambda: prediction_engine.predict_trends(30)),
+        "/api/metrics/sales": (SalesMetrics, lambda: trend_analyzer.get_sales_metrics()),
+        "/api/metrics/sentiment": (List[SentimentAnalysis], lambda: sentiment_analyzer.get_sentiment_metrics(limit=1000)),
+        "/api/sentiment/trends": (Dict[str, Any], lambda: sentiment_analyzer.get_sentiment_trends(days=365)),
+        "/api/reports/trends": (Dict[str, Any], lambda: trend_analyzer.generate_trends_report()),
+    }
+
+    payloads = {}
+    for route, (model, compute) in routes.items():
+        started = time.perf_counter()
+        payload = await compute()
+        payloads[route] = {
+            'model': model,
+            'payload': payload,
+            'compute_ms': 1000 * (time.perf_counter() - started),
+        }
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    payloads = asyncio.run(build_payloads())
+    print(f"Serializador rápido: {'orjson' if responses.orjson is not None else 'json (orjson no instalado)'}")
+    print(f"{'ruta':<26}{'bytes':>9}{'cálculo ms':>12}{'estándar ms':>13}{'rápido ms':>11}"
+          f"{'% estándar':>12}{'% rápido':>10}")
+
+    for route, entry in payloads.items():
+        payload, compute_ms = entry['payload'], entry['compute_ms']
+        adapter = TypeAdapter(entry['model'])
+
+        fast_ms = median_ms(lambda: responses.dumps(payload), args.iterations)
+        size = len(responses.dumps(payload))
+        try:
+            standard_ms = median_ms(lambda: standard_render(adapter, payload), args.iterations)
+            standard_share = f"{100 * standard_ms / (compute_ms + standard_ms):.1f}"
+            standard = f"{standard_ms:.3f}"
+        except (TypeError, ValueError) as e:
+            # El camino estándar no sabe serializar algunos tipos de NumPy
+            standard, standard_share = "error", "-"
+            print(f"  {route}: el camino estándar falla ({type(e).__name__}: {str(e).splitlines()[0][:60]})")
+
+        fast_share = 100 * fast_ms / (compute_ms + fast_ms)
+        print(f"{route:<26}{size:>9}{compute_ms:>12.1f}{standard:>13}{fast_ms:>11.3f}"
+              f"{standard_share:>12}{fast_share:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()